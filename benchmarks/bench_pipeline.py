@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de la partie Python du pipeline build/flash
+Les outils (cargo, elf2uf2-rs, probe-rs, espflash) sont remplaces par des
+scripts factices et le lecteur RPI-RP2 par un dossier temporaire: ni carte
+ni toolchain ne sont necessaires. Resultats en JSON, compares a une
+reference enregistree (--save-baseline)
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+RESULTS_VERSION = 1
+
+FLASH_BASE = 0x10000000
+UF2_SIZES = [64 * 1024, 256 * 1024, 1024 * 1024, 2 * 1024 * 1024]
+UF2_INSPECT_SIZE = 16 * 1024 * 1024
+# Arborescence target/ simulee pour find_elf_file
+TARGET_TREE_DEPS = 4000
+TARGET_TREE_BUILD_DIRS = 200
+PROCESS_LINES = 200000
+# Dep-info simule pour l'empreinte de compilation (gros graphe de crates)
+DEP_INFO_FILES = 3000
+DEP_INFO_CRATES = 150
+REGRESSION_THRESHOLD = 0.2
+MIN_SAMPLE_TIME = 0.05
+
+FAKE_TOOLS = {
+    # cargo metadata echoue comme hors ligne: l'index du projet lit alors les Cargo.toml
+    "cargo": """#!/bin/sh
+case "$1" in
+    --version) echo "cargo 1.90.0 (fake)";;
+    metadata) echo "error: no network (fake)" >&2; exit 101;;
+    *) echo "   Compiling fake v0.1.0"; echo "    Finished release";;
+esac
+""",
+    "elf2uf2-rs": """#!/bin/sh
+[ "$1" = "--version" ] && { echo "elf2uf2-rs 2.1.1 (fake)"; exit 0; }
+cp "$1" "${2:-$1.uf2}"
+""",
+    "probe-rs": """#!/bin/sh
+[ "$1" = "--version" ] && { echo "probe-rs 0.24.0 (fake)"; exit 0; }
+echo "      Erasing ✔ 100%"; echo "  Programming ✔ 100%"; echo "     Finished in 0.01s"
+""",
+    "espflash": """#!/bin/sh
+[ "$1" = "--version" ] && { echo "espflash 3.3.0 (fake)"; exit 0; }
+echo "[INFO] Serial port: fake"; echo "[INFO] Connecting..."
+i=0; while [ $i -lt 20 ]; do echo "[00:00:00] ########## $i/20 segment 0x10000"; i=$((i + 1)); done
+echo "[INFO] Flashing has completed!"
+""",
+}
+
+
+def write_test_elf(path, size, seed=0):
+    """Ecrit un ELF ARM 32 bits minimal: un segment PT_LOAD de `size` octets en flash."""
+    data = random.Random(seed).randbytes(size)
+    header = struct.pack("<16sHHIIIIIHHHHHH", b"\x7fELF\x01\x01\x01" + bytes(9),
+                         2, 40, 1, FLASH_BASE, 52, 0, 0x5000200, 52, 32, 1, 40, 0, 0)
+    program_header = struct.pack("<8I", 1, 84, FLASH_BASE, FLASH_BASE, size, size, 5, 4)
+    with open(path, "wb") as f:
+        f.write(header + program_header + data)
+
+
+def make_project(root, name, rust_targets, elf_size=256 * 1024, tree=False):
+    """Projet cargo factice avec un ELF compile pour chaque triple (et un gros target/ si `tree`)."""
+    project = Path(root) / name
+    (project / "src").mkdir(parents=True)
+    (project / "Cargo.toml").write_text(f'[package]\nname = "{name}"\nversion = "0.1.0"\nedition = "2021"\n')
+    (project / "src" / "main.rs").write_text("fn main() {}\n")
+    for rust_target in rust_targets:
+        for profile in ("debug", "release"):
+            profile_dir = project / "target" / rust_target / profile
+            (profile_dir / "deps").mkdir(parents=True)
+            write_test_elf(profile_dir / name, elf_size)
+            if not tree:
+                continue
+            for i in range(TARGET_TREE_DEPS):
+                (profile_dir / "deps" / f"libcrate{i}-{i:016x}.rlib").touch()
+            for i in range(TARGET_TREE_BUILD_DIRS):
+                build_dir = profile_dir / "build" / f"crate{i}-{i:016x}" / "out"
+                build_dir.mkdir(parents=True)
+                (build_dir / "generated.rs").touch()
+    return project
+
+
+def measure(function, repeat, warmup=1):
+    """Duree par appel de `function`: mediane et meilleure de `repeat` mesures, apres `warmup` tours.
+
+    Comme timeit, chaque mesure enchaine assez d'appels pour durer au moins
+    MIN_SAMPLE_TIME: les operations de quelques millisecondes restent stables.
+    """
+    for _ in range(warmup):
+        function()
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_SAMPLE_TIME:
+            break
+        number *= 2 if elapsed * 10 >= MIN_SAMPLE_TIME else 10
+    durations = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        durations.append((time.perf_counter() - started) / number)
+    return {"seconds": statistics.median(durations), "min": min(durations), "runs": repeat, "loops": number}
+
+
+def bench_uf2(results, repeat, workdir):
+    import uf2conv
+    for size in UF2_SIZES:
+        data = random.Random(size).randbytes(size)
+        result = measure(lambda: uf2conv.convert_to_uf2(data), repeat)
+        result["throughput_mb_s"] = size / result["seconds"] / 1e6
+        results[f"uf2.convert_to_uf2.{size // 1024}K"] = result
+
+    # Inspection d'une image de 16 Mo (taille maximale de la flash RP2040)
+    image = uf2conv.convert_to_uf2(random.Random(0).randbytes(UF2_INSPECT_SIZE))
+    results[f"uf2.verify_uf2.{UF2_INSPECT_SIZE // 1024}K"] = measure(lambda: uf2conv.verify_uf2(image), repeat)
+    merged = Path(workdir) / "uf2-merged.uf2"
+    results[f"uf2.merge_uf2.{UF2_INSPECT_SIZE // 1024}K"] = measure(
+        lambda: uf2conv.merge_uf2([(image, None)], str(merged)), repeat)
+
+    elf_file = Path(workdir) / "uf2-bench.elf"
+    write_test_elf(elf_file, UF2_SIZES[-1])
+    output = Path(workdir) / "uf2-bench.uf2"
+    result = measure(lambda: uf2conv.convert_elf_to_uf2(str(elf_file), str(output)), repeat)
+    result["throughput_mb_s"] = UF2_SIZES[-1] / result["seconds"] / 1e6
+    results[f"uf2.convert_elf_to_uf2.{UF2_SIZES[-1] // 1024}K"] = result
+
+
+def bench_find_elf(results, repeat, workdir):
+    import main
+    rust_target = main.TARGETS["pico"]["rust_target"]
+    project = make_project(workdir, "bigtree", [rust_target], tree=True)
+
+    def cold():
+        # Ni cache memoire ni index sur disque: premier appel d'une session
+        main._project_index_cache.clear()
+        for path in main.PROJECT_INDEX_DIR.glob("*.json"):
+            path.unlink()
+        assert main.find_elf_file(str(project), rust_target)
+
+    results["find_elf_file.cold"] = measure(cold, repeat)
+    results["find_elf_file.warm"] = measure(lambda: main.find_elf_file(str(project), rust_target), repeat)
+
+
+def bench_fingerprint(results, repeat, workdir):
+    """Verification a chaud de l'empreinte (build sans modification): dep-info de DEP_INFO_FILES fichiers."""
+    import main
+    rust_target = main.TARGETS["pico"]["rust_target"]
+    project = make_project(workdir, "depinfo", [rust_target])
+    registry = Path(workdir) / "registry"
+    sources = []
+    for crate in range(DEP_INFO_CRATES):
+        crate_dir = registry / f"crate{crate}" / "src"
+        crate_dir.mkdir(parents=True)
+        for i in range(DEP_INFO_FILES // DEP_INFO_CRATES):
+            source = crate_dir / f"module{i}.rs"
+            source.write_text(f"// {crate}/{i}\n")
+            sources.append(str(source))
+    release_dir = project / "target" / rust_target / "release"
+    (release_dir / "depinfo.d").write_text(f"{release_dir / 'depinfo'}: {' '.join(sources)}\n")
+    for crate in range(DEP_INFO_CRATES):
+        crate_sources = sources[crate::DEP_INFO_CRATES]
+        (release_dir / "deps" / f"crate{crate}-{crate:016x}.d").write_text(
+            f"deps/libcrate{crate}.rlib: {' '.join(crate_sources)}\n\n"
+            + "".join(f"{source}:\n" for source in crate_sources)
+            + f"\n# env-dep:CARGO_PKG_NAME=crate{crate}\n# env-dep:CRATE{crate}_FEATURE\n")
+    elf_file = str(release_dir / "depinfo")
+    _, fingerprint, manifest = main.check_build_fingerprint(str(project), rust_target)
+    main.record_build_fingerprint(str(project), rust_target, fingerprint, manifest, elf_file)
+
+    def warm():
+        assert main.check_build_fingerprint(str(project), rust_target)[0] == elf_file
+
+    results["fingerprint.warm"] = measure(warm, repeat)
+
+
+def bench_run_command(results, repeat, workdir):
+    import main
+    script = ("import sys\n"
+              f"line = 'I (123) app: sensor=0042 status=ok ' + 'x' * 40 + '\\n'\n"
+              f"sys.stdout.write(line * {PROCESS_LINES})\n")
+    command = [sys.executable, "-c", script]
+
+    def run(prefix=None):
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            assert main.run_command(command, workdir, prefix=prefix)["ok"]
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    for name, prefix in (("plain", None), ("prefixed", "[bench]")):
+        result = measure(lambda: run(prefix), repeat)
+        result["lines_per_s"] = PROCESS_LINES / result["seconds"]
+        results[f"run_command.{name}"] = result
+
+
+def bench_flash(results, repeat, workdir, env):
+    """Latence de bout en bout de `main.py flash` (processus complet, outils factices)."""
+    import main
+    project = make_project(workdir, "flashfw", [config["rust_target"] for config in main.TARGETS.values()],
+                           elf_size=512 * 1024)
+    drive = Path(workdir) / "RPI-RP2"
+    drive.mkdir()
+    (drive / "INFO_UF2.TXT").write_text("UF2 Bootloader v3.0\nModel: Raspberry Pi RP2\nBoard-ID: RPI-RP2\n")
+    commands = {
+        "pico": ["flash", "--target", "pico", "--devices", str(drive)],
+        "esp32c3": ["flash", "--target", "esp32c3", "--port", str(Path(workdir) / "ttyFAKE0")],
+    }
+    for target_name, arguments in commands.items():
+        command = [sys.executable, str(ROOT / "main.py"), *arguments, "--project-path", str(project)]
+
+        def run():
+            completed = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            if completed.returncode != 0:
+                raise RuntimeError(f"{' '.join(arguments)}: {completed.stderr.decode(errors='replace')}")
+
+        results[f"flash.e2e.{target_name}"] = measure(run, repeat)
+
+
+def compare(results, baseline, threshold):
+    """Compare les meilleures durees a la reference; retourne {nom: {ratio, regression}}.
+
+    Le minimum est moins sensible que la mediane a la charge de la machine.
+    """
+    comparison = {}
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference or not reference.get("min"):
+            continue
+        ratio = result["min"] / reference["min"]
+        comparison[name] = {"baseline_min": reference["min"], "ratio": ratio,
+                            "regression": ratio > 1 + threshold}
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline build/flash (outils factices).")
+    parser.add_argument("--only", nargs="+", choices=["uf2", "find_elf", "fingerprint", "run_command", "flash"],
+                        help="Ne lancer que ces groupes de benchmarks.")
+    parser.add_argument("--repeat", type=int, default=5, help="Mesures par benchmark.")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Resultats de reference (JSON).")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer ces resultats comme reference.")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Ralentissement tolere avant de signaler une regression (0.2 = 20%%).")
+    parser.add_argument("--output", help="Ecrire le JSON dans ce fichier plutot que sur la sortie standard.")
+    args = parser.parse_args()
+    groups = args.only or ["uf2", "find_elf", "fingerprint", "run_command", "flash"]
+
+    with tempfile.TemporaryDirectory(prefix="rust-embedded-bench-") as workdir:
+        # Outils factices en tete du PATH et caches isoles, avant d'importer main
+        fake_bin = Path(workdir) / "bin"
+        fake_bin.mkdir()
+        for name, content in FAKE_TOOLS.items():
+            (fake_bin / name).write_text(content)
+            (fake_bin / name).chmod(0o755)
+        os.environ["PATH"] = f"{fake_bin}{os.pathsep}{os.environ.get('PATH', '')}"
+        os.environ["XDG_CACHE_HOME"] = str(Path(workdir) / "cache")
+        sys.path.insert(0, str(ROOT))
+
+        results = {}
+        for group in groups:
+            print(f"⏱️  {group}...", file=sys.stderr, flush=True)
+            if group == "uf2":
+                bench_uf2(results, args.repeat, workdir)
+            elif group == "find_elf":
+                bench_find_elf(results, args.repeat, workdir)
+            elif group == "fingerprint":
+                bench_fingerprint(results, args.repeat, workdir)
+            elif group == "run_command":
+                bench_run_command(results, args.repeat, workdir)
+            else:
+                bench_flash(results, args.repeat, workdir, dict(os.environ))
+
+    report = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    regressions = []
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"💾 Reference enregistree: {baseline_path}", file=sys.stderr)
+    elif baseline_path.exists():
+        report["comparison"] = compare(results, json.loads(baseline_path.read_text()), args.threshold)
+        for name, entry in sorted(report["comparison"].items()):
+            marker = "❌" if entry["regression"] else "✅"
+            print(f"{marker} {name:<34} {results[name]['min'] * 1000:9.3f} ms  x{entry['ratio']:.2f}",
+                  file=sys.stderr)
+            if entry["regression"]:
+                regressions.append(name)
+    else:
+        print(f"ℹ️  Pas de reference ({baseline_path}): lancez avec --save-baseline", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) de plus de {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Decodeur de logs defmt (v0.3) en pur Python
+La table des formats vient de la section .defmt de l'ELF; les trames sont
+encodees en rzCOBS (defaut de defmt-rtt/defmt-serial) ou brutes
+"""
+import json
+import operator
+import re
+import struct
+
+from elffile import ElfFile
+
+DEFMT_SECTION = ".defmt"
+
+LEVELS = {
+    "defmt_trace": "TRACE",
+    "defmt_debug": "DEBUG",
+    "defmt_info": "INFO",
+    "defmt_warn": "WARN",
+    "defmt_error": "ERROR",
+    "defmt_println": "",
+}
+
+# Types de taille fixe: format struct (petit boutiste)
+_FIXED = {
+    "u8": struct.Struct("<B"), "u16": struct.Struct("<H"), "u32": struct.Struct("<I"),
+    "u64": struct.Struct("<Q"), "i8": struct.Struct("<b"), "i16": struct.Struct("<h"),
+    "i32": struct.Struct("<i"), "i64": struct.Struct("<q"), "f32": struct.Struct("<f"),
+    "f64": struct.Struct("<d"), "bool": struct.Struct("<B"), "char": struct.Struct("<I"),
+}
+
+# {index=type:indication}, les accolades doublees etant echappees
+_PARAM = re.compile(r"\{\{|\}\}|\{(\d*)(?:=([^:}]*))?(?::([^}]*))?\}")
+_INT_HINT = re.compile(r"#?0?\d*[xXbo]")
+
+
+class DefmtError(Exception):
+    """Trame invalide ou format absent de la table."""
+
+
+class _TruncatedFrame(DefmtError):
+    """La trame s'arrete avant la fin de ses arguments."""
+
+
+def read_table(elf_file):
+    """Lit la table des formats defmt d'un ELF: {"formats": {id: [tag, format]}, "timestamp": format}.
+
+    Chaque instruction de log est un symbole de `.defmt` dont le nom est un
+    objet JSON et l'adresse l'identifiant envoye sur le fil. Le resultat est
+    serialisable en JSON (cle en texte) pour etre mis en cache.
+    """
+    with ElfFile(elf_file) as elf:
+        index = next((i for i, section in enumerate(elf.sections) if section.name == DEFMT_SECTION), None)
+        if index is None:
+            raise DefmtError(f"Section {DEFMT_SECTION} absente (defmt non utilise ?): {elf_file}")
+        formats = {}
+        timestamp = None
+        for symbol in elf.symbols():
+            if symbol.shndx != index or not symbol.name.startswith("{"):
+                continue
+            try:
+                entry = json.loads(symbol.name)
+            except ValueError:
+                continue
+            if entry.get("tag") == "defmt_timestamp":
+                timestamp = entry.get("data")
+            formats[str(symbol.value)] = [entry.get("tag", ""), entry.get("data", "")]
+    return {"formats": formats, "timestamp": timestamp}
+
+
+def _group_getter(x):
+    """Reconstitue un groupe rzCOBS de 7 octets a partir de ses octets non nuls suivis d'un zero."""
+    clear = [position for position in range(7) if not x & (1 << position)]
+    indexes = [clear.index(position) if position in clear else len(clear) for position in range(7)]
+    return len(clear), operator.itemgetter(*indexes)
+
+
+# Un groupe par valeur possible de l'octet de controle (0x01 a 0x7f)
+_RZCOBS_GROUPS = [None] + [_group_getter(x) for x in range(1, 0x80)]
+
+
+def rzcobs_decode(frame):
+    """Decode une trame rzCOBS (sans le 0x00 final), lue de la fin vers le debut.
+
+    Le resultat peut se terminer par quelques zeros de bourrage, ignores par
+    le decodage des arguments.
+    """
+    pieces = []
+    i = len(frame)
+    while i > 0:
+        i -= 1
+        x = frame[i]
+        if x == 0xFF:
+            # 134 octets non nuls
+            if i < 134:
+                raise _TruncatedFrame("Trame rzCOBS tronquee")
+            pieces.append(frame[i - 134:i])
+            i -= 134
+        elif x & 0x80:
+            # 7 + n octets non nuls suivis d'un zero
+            n = (x & 0x7F) + 7
+            if i < n:
+                raise _TruncatedFrame("Trame rzCOBS tronquee")
+            pieces.append(frame[i - n:i] + b"\x00")
+            i -= n
+        elif x:
+            # Groupe de 7 octets: un bit a 1 marque un zero
+            count, getter = _RZCOBS_GROUPS[x]
+            if i < count:
+                raise _TruncatedFrame("Trame rzCOBS tronquee")
+            pieces.append(bytes(getter(frame[i - count:i] + b"\x00")))
+            i -= count
+        else:
+            raise DefmtError("Octet nul dans une trame rzCOBS")
+    pieces.reverse()
+    return b"".join(pieces)
+
+
+def _parse_format(text):
+    """Decoupe un format en segments: texte ou (index, type, indication)."""
+    segments = []
+    implicit = 0
+    last = 0
+    for match in _PARAM.finditer(text):
+        if match.start() > last:
+            segments.append(text[last:match.start()])
+        last = match.end()
+        token = match.group(0)
+        if token in ("{{", "}}"):
+            segments.append(token[0])
+            continue
+        position, kind, hint = match.groups()
+        if position:
+            index = int(position)
+        else:
+            index = implicit
+            implicit += 1
+        segments.append((index, kind or "?", hint or ""))
+    if last < len(text):
+        segments.append(text[last:])
+    return segments
+
+
+def _compile(text):
+    """Segments d'un format et types de ses arguments, dans l'ordre d'encodage."""
+    segments = _parse_format(text)
+    params = {}
+    for segment in segments:
+        if isinstance(segment, tuple):
+            params.setdefault(segment[0], segment[1])
+    return segments, [params[i] for i in sorted(params)]
+
+
+def _split_variants(text):
+    """Variantes d'un enum derive ("A|B({=u8})"), '|' hors accolades."""
+    variants, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            variants.append(text[start:i])
+            start = i + 1
+    variants.append(text[start:])
+    return variants
+
+
+def _render(value, hint):
+    if not hint and type(value) is int:
+        return str(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        if hint == "us":
+            return f"{value / 1e6:.6f}"
+        if hint == "ms":
+            return f"{value / 1e3:.3f}"
+        if hint and _INT_HINT.fullmatch(hint):
+            return format(value, hint)
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        if hint == "a":
+            return "b\"" + "".join(chr(b) if 32 <= b < 127 else f"\\x{b:02x}" for b in value) + "\""
+        return "[" + ", ".join(_render(b, hint) for b in value) + "]"
+    if isinstance(value, list):
+        return "[" + ", ".join(value) + "]"
+    if isinstance(value, str) and hint == "?":
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class DefmtDecoder:
+    """Decode un flux d'octets defmt en lignes (horodatage, niveau, message).
+
+    Les formats sont analyses une seule fois, a leur premiere apparition.
+    `feed` accepte des blocs de taille quelconque et retourne toutes les
+    trames completes qu'ils contiennent.
+    """
+
+    def __init__(self, table, encoding="rzcobs"):
+        if encoding not in ("rzcobs", "raw"):
+            raise ValueError(f"Encodage defmt inconnu: {encoding}")
+        self.encoding = encoding
+        self.errors = 0
+        self._formats = {int(key): value for key, value in table["formats"].items()}
+        self._parsed = {}
+        self._timestamp = _compile(table["timestamp"]) if table.get("timestamp") else None
+        self._pending = b""
+
+    def _format(self, index):
+        """(tag, texte, segments, types, variantes) du format `index`, analyse a la premiere utilisation."""
+        parsed = self._parsed.get(index)
+        if parsed is None:
+            if index not in self._formats:
+                raise DefmtError(f"Index de format inconnu: {index} (ELF different du firmware ?)")
+            tag, text = self._formats[index]
+            variants = _split_variants(text) if tag == "defmt_derived" else [text]
+            variants = [_compile(variant) for variant in variants] if len(variants) > 1 else None
+            parsed = (tag, text, *_compile(text), variants)
+            self._parsed[index] = parsed
+        return parsed
+
+    def _read(self, data, pos, kind):
+        """Lit un argument de type `kind` a `pos`; retourne (valeur, nouvelle position)."""
+        fixed = _FIXED.get(kind)
+        if fixed is not None:
+            end = pos + fixed.size
+            if end > len(data):
+                raise _TruncatedFrame("Trame tronquee")
+            value = fixed.unpack_from(data, pos)[0]
+            if kind == "bool":
+                value = bool(value)
+            elif kind == "char":
+                # Trame corrompue: chr() leverait OverflowError, et un substitut
+                # n'est pas un char Rust
+                if value > 0x10FFFF or 0xD800 <= value <= 0xDFFF:
+                    raise DefmtError(f"Caractere invalide: {value:#x}")
+                value = chr(value)
+            return value, end
+        if kind in ("u128", "i128"):
+            if pos + 16 > len(data):
+                raise _TruncatedFrame("Trame tronquee")
+            return int.from_bytes(data[pos:pos + 16], "little", signed=kind == "i128"), pos + 16
+        if kind in ("usize", "isize"):
+            value, pos = self._leb128(data, pos)
+            if kind == "isize":
+                value = (value >> 1) ^ -(value & 1)
+            return value, pos
+        if kind in ("str", "[u8]"):
+            length, pos = self._leb128(data, pos)
+            if pos + length > len(data):
+                raise _TruncatedFrame("Trame tronquee")
+            raw = data[pos:pos + length]
+            return (raw.decode("utf-8", errors="replace") if kind == "str" else raw), pos + length
+        if kind == "istr":
+            index, pos = self._read(data, pos, "u16")
+            return self._format(index)[1], pos
+        if kind.startswith("[u8;"):
+            try:
+                length = int(kind[4:-1])
+            except ValueError:
+                length = -1
+            if length < 0:
+                raise DefmtError(f"Type defmt non supporte: {kind}")
+            if pos + length > len(data):
+                raise _TruncatedFrame("Trame tronquee")
+            return data[pos:pos + length], pos + length
+        if kind in ("?", ""):
+            return self._nested(data, pos)
+        if kind == "[?]":
+            length, pos = self._leb128(data, pos)
+            values = []
+            for _ in range(length):
+                value, pos = self._nested(data, pos)
+                values.append(value)
+            return values, pos
+        if kind in ("__internal_Debug", "__internal_Display"):
+            # Texte produit par core::fmt sur la cible, termine par 0xFF
+            end = data.find(b"\xff", pos)
+            if end < 0:
+                raise _TruncatedFrame("Trame tronquee")
+            return data[pos:end].decode("utf-8", errors="replace"), end + 1
+        raise DefmtError(f"Type defmt non supporte: {kind}")
+
+    def _leb128(self, data, pos):
+        value = shift = 0
+        while True:
+            if pos >= len(data):
+                raise _TruncatedFrame("Trame tronquee")
+            byte = data[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, pos
+            shift += 7
+
+    def _args(self, data, pos, kinds):
+        values = []
+        for kind in kinds:
+            value, pos = self._read(data, pos, kind)
+            values.append(value)
+        return values, pos
+
+    def _expand(self, segments, values):
+        parts = []
+        for segment in segments:
+            if isinstance(segment, tuple):
+                index, _, hint = segment
+                parts.append(_render(values[index], hint) if index < len(values) else "?")
+            else:
+                parts.append(segment)
+        return "".join(parts)
+
+    def _nested(self, data, pos):
+        """Valeur `{}`/`{=?}`: index de son propre format puis ses arguments."""
+        index, pos = self._read(data, pos, "u16")
+        _, _, segments, kinds, variants = self._format(index)
+        if variants:
+            # Enum derive: discriminant puis arguments de la variante
+            discriminant, pos = self._read(data, pos, "u8" if len(variants) <= 256 else "u16")
+            if discriminant >= len(variants):
+                raise DefmtError(f"Variante inconnue: {discriminant}")
+            segments, kinds = variants[discriminant]
+        values, pos = self._args(data, pos, kinds)
+        return self._expand(segments, values), pos
+
+    def decode_frame(self, frame, pos=0):
+        """Decode une trame: retourne (horodatage, niveau, message, position de fin)."""
+        index, pos = self._read(frame, pos, "u16")
+        timestamp = ""
+        if self._timestamp is not None:
+            segments, kinds = self._timestamp
+            values, pos = self._args(frame, pos, kinds)
+            timestamp = self._expand(segments, values)
+        tag, _, segments, kinds, _ = self._format(index)
+        values, pos = self._args(frame, pos, kinds)
+        return timestamp, LEVELS.get(tag, tag), self._expand(segments, values), pos
+
+    def feed(self, data):
+        """Ajoute des octets recus et retourne les messages decodes [(horodatage, niveau, message)].
+
+        Une trame invalide est comptee dans `errors` et ignoree: en rzCOBS le
+        decodage repart a la trame suivante.
+        """
+        data = self._pending + bytes(data)
+        messages = []
+        if self.encoding == "rzcobs":
+            frames = data.split(b"\x00")
+            self._pending = frames.pop()
+            for frame in frames:
+                if not frame:
+                    continue
+                try:
+                    messages.append(self.decode_frame(rzcobs_decode(frame))[:3])
+                except DefmtError:
+                    self.errors += 1
+            return messages
+
+        # Encodage brut: pas de delimiteur, une trame incomplete attend la suite
+        pos = 0
+        while pos < len(data):
+            try:
+                timestamp, level, message, end = self.decode_frame(data, pos)
+            except _TruncatedFrame:
+                break
+            except DefmtError:
+                # Desynchronise: impossible de retrouver le debut de la trame suivante
+                self.errors += 1
+                pos = len(data)
+                break
+            messages.append((timestamp, level, message))
+            pos = end
+        self._pending = data[pos:]
+        return messages
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Lecteur ELF minimal en pur Python - segments et sections via mmap
+Suffisant pour les firmwares thumbv6m (RP2040) et riscv32 (ESP32-C3)
+"""
+import mmap
+import os
+import struct
+from collections import namedtuple
+
+ELF_MAGIC = b"\x7fELF"
+
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+PT_LOAD = 1
+
+SHT_SYMTAB = 2
+SHT_NOBITS = 8
+
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+STT_NOTYPE = 0
+STT_OBJECT = 1
+STT_FUNC = 2
+
+ProgramHeader = namedtuple("ProgramHeader", "type offset vaddr paddr filesz memsz flags align")
+Section = namedtuple("Section", "name type flags addr offset size link info entsize")
+Symbol = namedtuple("Symbol", "name value size type bind shndx")
+
+# Formats des structures selon la classe ELF (32 ou 64 bits)
+_LAYOUTS = {
+    ELFCLASS32: {
+        "header": "16sHHIIIIIHHHHHH",
+        "phdr": "IIIIIIII",
+        "phdr_fields": ("type", "offset", "vaddr", "paddr", "filesz", "memsz", "flags", "align"),
+        "shdr": "IIIIIIIIII",
+        "sym": "IIIBBH",
+        "sym_fields": (0, 1, 2, 3, 5),
+    },
+    ELFCLASS64: {
+        "header": "16sHHIQQQIHHHHHH",
+        "phdr": "IIQQQQQQ",
+        "phdr_fields": ("type", "flags", "offset", "vaddr", "paddr", "filesz", "memsz", "align"),
+        "shdr": "IIQQQQIIQQ",
+        "sym": "IBBHQQ",
+        "sym_fields": (0, 4, 5, 1, 3),
+    },
+}
+
+
+class ElfError(Exception):
+    """Fichier absent, tronque ou qui n'est pas un ELF."""
+
+
+class ElfFile:
+    """Vue en lecture seule d'un fichier ELF projete en memoire."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < 52:
+                raise ElfError(f"Fichier trop petit pour etre un ELF: {self.path}")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self._map)
+
+        try:
+            ident = bytes(self.data[:16])
+            if ident[:4] != ELF_MAGIC:
+                raise ElfError(f"Signature ELF absente: {self.path}")
+            self.elf_class = ident[4]
+            if self.elf_class not in _LAYOUTS or ident[5] not in (ELFDATA2LSB, ELFDATA2MSB):
+                raise ElfError(f"Classe ELF non supportee: {self.path}")
+            self.endian = "<" if ident[5] == ELFDATA2LSB else ">"
+            self._layout = _LAYOUTS[self.elf_class]
+
+            (_, self.e_type, self.machine, _, self.entry, self._phoff, self._shoff, self.flags,
+             _, self._phentsize, self._phnum, self._shentsize, self._shnum,
+             self._shstrndx) = self._unpack(self._layout["header"], 0)
+
+            self.segments = self._read_segments()
+            self.sections = self._read_sections()
+        except BaseException:
+            # Ne pas laisser la projection ouverte sur un ELF invalide
+            self.close()
+            raise
+
+    def _unpack(self, fmt, offset):
+        fmt = self.endian + fmt
+        end = offset + struct.calcsize(fmt)
+        if end > len(self.data):
+            raise ElfError(f"ELF tronque (offset {offset:#x}): {self.path}")
+        return struct.unpack_from(fmt, self.data, offset)
+
+    def _read_segments(self):
+        fields = self._layout["phdr_fields"]
+        segments = []
+        for i in range(self._phnum):
+            values = dict(zip(fields, self._unpack(self._layout["phdr"], self._phoff + i * self._phentsize)))
+            segments.append(ProgramHeader(**values))
+        return segments
+
+    def _read_sections(self):
+        raw = [self._unpack(self._layout["shdr"], self._shoff + i * self._shentsize)
+               for i in range(self._shnum)]
+        if not raw:
+            return []
+        strtab = raw[self._shstrndx] if self._shstrndx < len(raw) else None
+        sections = []
+        for name_off, sh_type, flags, addr, offset, size, link, info, _, entsize in raw:
+            name = self.read_string(strtab[4] + name_off) if strtab else ""
+            sections.append(Section(name, sh_type, flags, addr, offset, size, link, info, entsize))
+        return sections
+
+    def read_string(self, offset):
+        """Lit une chaine terminee par NUL a l'offset donne."""
+        end = self._map.find(b"\x00", offset)
+        if end < 0:
+            end = len(self.data)
+        return bytes(self.data[offset:end]).decode("utf-8", errors="replace")
+
+    def section(self, name):
+        """Retourne la section nommee `name` ou None."""
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def section_data(self, section):
+        """Retourne le contenu d'une section (memoryview, vide pour .bss)."""
+        if section.type == SHT_NOBITS:
+            return memoryview(b"")
+        return self.data[section.offset:section.offset + section.size]
+
+    def load_address(self, section):
+        """Adresse de chargement (LMA) d'une section: differente de `addr` pour `.data`."""
+        for seg in self.segments:
+            if (seg.type == PT_LOAD and seg.filesz and section.type != SHT_NOBITS
+                    and seg.offset <= section.offset < seg.offset + seg.filesz):
+                return seg.paddr + (section.offset - seg.offset)
+        return section.addr
+
+    def symbols(self, types=(STT_FUNC, STT_OBJECT), sized=True):
+        """Itere sur les symboles de `.symtab` qui ont une taille, dans les types demandes.
+        
+        La table est decodee d'un bloc (struct.iter_unpack) et seuls les noms
+        des symboles retenus sont lus: rapide meme sur un ELF de debug. Avec
+        `sized=False`, les symboles de taille nulle sont aussi retournes
+        (marqueurs `$d`/`$t`, bornes definies par le script de liens).
+        """
+        symtab = next((section for section in self.sections if section.type == SHT_SYMTAB), None)
+        if symtab is None or not symtab.entsize:
+            return
+        if symtab.link >= len(self.sections):
+            raise ElfError(f"Table des noms de symboles absente: {self.path}")
+        strtab_offset = self.sections[symtab.link].offset
+        
+        fmt = self.endian + self._layout["sym"]
+        entsize = struct.calcsize(fmt)
+        count = min(symtab.size, len(self.data) - symtab.offset) // symtab.entsize
+        data = self.data[symtab.offset:symtab.offset + count * entsize]
+        name_i, value_i, size_i, info_i, shndx_i = self._layout["sym_fields"]
+        for entry in struct.iter_unpack(fmt, data):
+            size = entry[size_i]
+            info = entry[info_i]
+            if (sized and not size) or (info & 0xf) not in types:
+                continue
+            yield Symbol(self.read_string(strtab_offset + entry[name_i]), entry[value_i], size,
+                         info & 0xf, info >> 4, entry[shndx_i])
+
+    def load_segments(self):
+        """Retourne les segments PT_LOAD a charger en flash: [(adresse, memoryview)].
+
+        L'adresse physique (LMA) est utilisee : pour `.data` elle pointe vers
+        la copie en flash et non vers la RAM. Les segments sans contenu dans
+        le fichier (`.bss`, `.uninit`) sont ignores.
+        """
+        loads = []
+        for seg in self.segments:
+            if seg.type != PT_LOAD or seg.filesz == 0:
+                continue
+            if seg.offset + seg.filesz > len(self.data):
+                raise ElfError(f"Segment hors du fichier (offset {seg.offset:#x}): {self.path}")
+            loads.append((seg.paddr, self.data[seg.offset:seg.offset + seg.filesz]))
+        loads.sort(key=lambda item: item[0])
+        return loads
+
+    def close(self):
+        if self._map is None:
+            return
+        self.data.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # Des vues sur le contenu sont encore utilisees, le GC fermera
+            pass
+        self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_elf_file(path):
+    """Indique si `path` commence par la signature ELF."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(4) == ELF_MAGIC
+    except OSError:
+        return False
@@ -1,11 +1,52 @@
 import argparse
-import subprocess
+import asyncio
+import codecs
+import collections
+import contextlib
+import functools
 import sys
 import json
 import os
 import shutil
+import hashlib
+import tarfile
+import threading
+import io
+import socketserver
+import ctypes
+import select
+import signal
+import struct
+import subprocess
+import time
+import glob
+import gzip
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
+import uf2conv
+import defmtdecoder
+import stackusage
+from elffile import SHF_ALLOC, SHT_NOBITS, ElfError, ElfFile
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11: pas de budget lu depuis Cargo.toml
+    tomllib = None
+try:
+    import termios
+except ImportError:  # Windows: port serie ouvert sans configuration
+    termios = None
+try:
+    import fcntl
+except ImportError:  # Windows: statistiques du cache rustc sans verrou
+    fcntl = None
+try:
+    import resource
+except ImportError:  # Windows: pas de temps CPU des sous-processus dans la trace
+    resource = None
+
 # --- Configuration des Cibles ---
 # On definit ici les informations specifiques a chaque carte
 TARGETS = {
@@ -20,510 +61,4992 @@ TARGETS = {
         "rust_target": "riscv32imc-unknown-none-elf",
         "flasher": "espflash",
         "chip": "esp32c3",
-        "template": "esp32c3_template"
+        "template": "esp32c3_template",
+        # Options de espflash: baud None = debit par defaut, port None = detection
+        "flash_options": {"baud": None, "flash_mode": "dio", "flash_freq": None, "port": None},
+        # Debit de la sortie esp-println (ignore par l'USB-JTAG integre)
+        "monitor_baud": 115200,
     },
 }
 
+# Format du manifeste des pages flashees (flash --delta)
+FLASH_MANIFEST_VERSION = 1
+
+# Empreinte des sources: une compilation est inutile si aucun de ces
+# fichiers (ni src/**) n'a change pour la target demandee, dans le projet,
+# les membres du workspace et les dependances locales, ni aucun fichier du
+# dep-info de la compilation precedente
+BUILD_MANIFEST_VERSION = 2
+BUILD_FINGERPRINT_FILES = ["Cargo.toml", "Cargo.lock", ".cargo/config.toml", "memory.x", "build.rs"]
+# Fichiers de configuration lus par cargo dans le projet et chaque dossier parent
+BUILD_CONFIG_FILES = [".cargo/config.toml", ".cargo/config", "rust-toolchain.toml", "rust-toolchain"]
+# Variables d'environnement qui changent le binaire sans toucher aux sources
+# (en plus de celles lues par env!/option_env!, relevees dans le dep-info)
+BUILD_FINGERPRINT_ENV = ["RUSTFLAGS", "CARGO_ENCODED_RUSTFLAGS", "RUSTC", "RUSTC_WRAPPER", "RUSTC_BOOTSTRAP",
+                         "DEFMT_LOG"]
+BUILD_FINGERPRINT_ENV_PREFIXES = ("CARGO_BUILD_", "CARGO_PROFILE_", "CARGO_TARGET_")
+
+# Historique des temps de compilation (build --profile-build, build-report)
+BUILD_HISTORY_VERSION = 1
+BUILD_HISTORY_MAX = 200
+BUILD_BASELINE_SIZE = 5
+BUILD_REPORT_TOP = 10
+# Une crate est signalee si elle ralentit d'au moins 25% et d'au moins une seconde
+BUILD_REGRESSION_RATIO = 0.25
+BUILD_REGRESSION_MIN_SECONDS = 1.0
+
+# Analyse de taille (action size): instantane du build precedent et affichage
+SIZE_SNAPSHOT_VERSION = 1
+SIZE_SNAPSHOT_SYMBOLS = 500
+SIZE_TOP_SYMBOLS = 15
+SIZE_TOP_CRATES = 10
+SIZE_TOP_CHANGES = 10
+
+# Analyse de pile (action analyze-stack): flags du build nightly et affichage
+STACK_SIZES_RUSTFLAGS = ["-Z", "emit-stack-sizes"]
+STACK_TOP_ROOTS = 10
+STACK_PATH_LIMIT = 8
+STACK_FLAG_LABELS = {"recursion": "recursion", "indirect": "appel indirect", "external": "appel hors du firmware"}
+
+# Les versions sont figees pour que le cache local des outils (cle: outil,
+# version, host, rustc) reste valide et reproductible hors ligne
 TOOLS = {
     "elf2uf2-rs": {
-        "install_command": ["cargo", "install", "elf2uf2-rs", "--locked"],
+        "version": "2.1.1",
+        "binaries": ["elf2uf2-rs"],
+        "install_command": ["cargo", "install", "elf2uf2-rs", "--locked", "--version", "2.1.1"],
         "check_command": ["elf2uf2-rs", "--help"]
     },
     "probe-rs": {
-        "install_command": ["cargo", "install", "probe-rs-tools", "--locked"],
+        "version": "0.24.0",
+        "binaries": ["probe-rs", "cargo-flash", "cargo-embed"],
+        "install_command": ["cargo", "install", "probe-rs-tools", "--locked", "--version", "0.24.0"],
         "check_command": ["probe-rs", "--version"]
     },
     "espflash": {
-        "install_command": ["cargo", "install", "espflash"],
+        "version": "3.3.0",
+        "binaries": ["espflash"],
+        "install_command": ["cargo", "install", "espflash", "--version", "3.3.0"],
         "check_command": ["espflash", "--version"]
     }
 }
 
-def run_command(command, project_path):
-    """Execute une commande en temps reel et affiche sa sortie."""
-    print(f"🚀 Execution de : {' '.join(command)}")
+# Cache local partage par les differentes actions (inventaire des outils, ...)
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "rust-embedded-ide"
+TOOLCHAIN_CACHE_FILE = CACHE_DIR / "toolchain.json"
+TOOL_PROBE_TIMEOUT = 30
+# Dossier de build partage par les `cargo install` (crates communes compilees une fois)
+INSTALL_TARGET_DIR = CACHE_DIR / "cargo-install-target"
+# Cache des binaires d'outils deja compiles (reinstallation hors ligne)
+TOOL_CACHE_DIR = CACHE_DIR / "tools"
+# Objets du cache adresses par leur sha256 (entrees importees: rien d'autre n'est accepte)
+TOOL_DIGEST_PATTERN = re.compile(r"[0-9a-f]{64}")
+# Index des projets (membres du workspace, binaires, dossier de build)
+PROJECT_INDEX_DIR = CACHE_DIR / "projects"
+PROJECT_INDEX_VERSION = 1
+BUILD_HISTORY_DIR = CACHE_DIR / "build-timings"
+# Cache des compilations rustc (RUSTC_WRAPPER), partage entre projets
+RUSTC_CACHE_DIR = CACHE_DIR / "rustc"
+RUSTC_CACHE_VERSION = 2
+RUSTC_CACHE_MAX_SIZE = 4 * 1024 * 1024 * 1024
+# Apres une eviction, le cache redescend a 80% de sa taille maximale
+RUSTC_CACHE_EVICT_RATIO = 0.8
+RUSTC_CACHE_TARGET_TOKEN = "${RUST_EMBEDDED_TARGET_DIR}"
+# Fichiers cherches dans les dossiers -L pour une bibliotheque native `-l nom`
+RUSTC_NATIVE_LIBRARY_NAMES = ["lib{}.a", "{}.lib", "lib{}.so", "lib{}.dylib", "{}.dll"]
+# Variables CARGO_* propres a la machine ou au build en cours, sans effet sur le resultat
+RUSTC_CACHE_IGNORED_ENV = {"CARGO_MAKEFLAGS", "CARGO_TARGET_DIR", "CARGO_HOME", "CARGO_BUILD_JOBS"}
+# Options de rustc suivies d'une valeur dans l'argument suivant
+RUSTC_VALUE_OPTIONS = {"--crate-name", "--crate-type", "--emit", "--out-dir", "-C", "--codegen", "--extern", "-L",
+                       "-l", "--target", "--cfg", "--check-cfg", "--cap-lints", "--error-format", "--json",
+                       "--edition", "-A", "-W", "-D", "-F", "--sysroot", "--remap-path-prefix",
+                       "--diagnostic-width", "--color", "-Z", "--env-set"}
+# Tables des formats defmt, par empreinte de l'ELF
+DEFMT_CACHE_DIR = CACHE_DIR / "defmt"
+DEFMT_TABLE_VERSION = 1
+DEFMT_READ_SIZE = 1024 * 1024
+# Telechargement et precompilation des dependances en arriere-plan apres create
+PREFETCH_STATE_VERSION = 1
+PREFETCH_FOLLOW_INTERVAL = 0.2
+# Descripteur du verrou deja tenu, transmis par create au processus de prefetch
+PREFETCH_LOCK_FD_ENV = "RUST_EMBEDDED_PREFETCH_LOCK_FD"
+
+# Detection des cartes: lecteurs BOOTSEL du RP2040 et ports serie des ESP32
+PICO_UF2_LABEL = "RPI-RP2"
+PICO_UF2_FSTYPES = {"vfat", "msdos"}
+MOUNTINFO_FILE = "/proc/self/mountinfo"
+# Attente du lecteur BOOTSEL, puis de son demontage (redemarrage du Pico)
+BOOTSEL_WAIT_TIMEOUT = 15
+BOOTSEL_REBOOT_TIMEOUT = 10
+BOOTSEL_POLL_INTERVAL = 0.5
+# Hors Linux (pas de mountinfo): chemins usuels des lecteurs BOOTSEL
+PICO_UF2_MOUNT_PATTERNS = [
+    "/media/*/RPI-RP2*",     # Linux (udisks)
+    "/run/media/*/RPI-RP2*", # Linux (udisks2)
+    "/Volumes/RPI-RP2*",     # macOS
+]
+ESP_SERIAL_PORT_PATTERNS = ["/dev/ttyACM*", "/dev/ttyUSB*", "/dev/cu.usbmodem*", "/dev/cu.usbserial*"]
+# Espressif (USB-JTAG integre), Silicon Labs CP210x, WCH CH340, FTDI
+ESP_USB_VENDORS = {"303a", "10c4", "1a86", "0403"}
+# flash --auto-baud: debits essayes, du plus rapide au plus lent
+ESP_AUTO_BAUD_RATES = [2000000, 1500000, 921600, 460800, 230400, 115200]
+# Erreurs espflash de liaison serie (les seules qu'un debit plus lent peut corriger)
+ESP_LINK_ERROR_PATTERN = re.compile(
+    r"connect|timed? ?out|slip|invalid (response|packet)|error while using serial port|serial port error"
+    r"|checksum|md5|broken pipe",
+    re.IGNORECASE)
+ESP_FLASH_CACHE_VERSION = 1
+
+# Moniteur serie: grands blocs lus sans bloquer, tampon borne, logs gzip tournants
+MONITOR_READ_SIZE = 64 * 1024
+MONITOR_BUFFER_SIZE = 8 * 1024 * 1024
+MONITOR_FLUSH_INTERVAL = 0.05
+MONITOR_RECONNECT_INTERVAL = 0.5
+MONITOR_LOG_MAX_BYTES = 16 * 1024 * 1024
+MONITOR_LOG_KEEP = 20
+MONITOR_TAIL_LINES = 50
+MONITOR_ANSI_PATTERN = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]")
+
+# Mode watch: regroupement des sauvegardes et frequence de scrutation
+WATCH_DEBOUNCE = 0.3
+WATCH_POLL_INTERVAL = 0.5
+
+# inotify (Linux): struct inotify_event et masques utilises par le mode watch
+INOTIFY_EVENT = struct.Struct("iIII")
+INOTIFY_IN_MODIFY = 0x00000002
+INOTIFY_IN_CLOSE_WRITE = 0x00000008
+INOTIFY_IN_MOVED_FROM = 0x00000040
+INOTIFY_IN_MOVED_TO = 0x00000080
+INOTIFY_IN_CREATE = 0x00000100
+INOTIFY_IN_DELETE = 0x00000200
+INOTIFY_IN_ISDIR = 0x40000000
+INOTIFY_MASK = (INOTIFY_IN_MODIFY | INOTIFY_IN_CLOSE_WRITE | INOTIFY_IN_MOVED_FROM
+                | INOTIFY_IN_MOVED_TO | INOTIFY_IN_CREATE | INOTIFY_IN_DELETE)
+
+# Mode serve (JSON-RPC 2.0): codes d'erreur et nombre de requetes simultanees
+RPC_PARSE_ERROR = -32700
+RPC_INVALID_REQUEST = -32600
+RPC_METHOD_NOT_FOUND = -32601
+RPC_INVALID_PARAMS = -32602
+RPC_REQUEST_CANCELLED = -32800
+RPC_ACTION_FAILED = -32000
+RPC_MAX_WORKERS = 8
+
+# Moteur de processus: lecture par blocs, ecritures regroupees, sortie gardee bornee
+PROCESS_READ_SIZE = 64 * 1024
+PROCESS_WRITE_BATCH = 16 * 1024
+PROCESS_FLUSH_INTERVAL = 0.05
+PROCESS_OUTPUT_LIMIT = 256 * 1024
+PROCESS_KILL_GRACE = 5
+# Conversions (objcopy, elf2uf2-rs): ne doivent jamais bloquer un flashage
+CONVERT_TIMEOUT = 120
+
+# Ecritures des commandes concurrentes (une ligne n'est jamais coupee)
+_output_lock = threading.Lock()
+
+# Requete serve traitee par le thread courant
+_rpc_context = threading.local()
+
+# Inventaire de la toolchain deja calcule dans ce processus (installations et
+# requetes serve concurrentes: lu et invalide sous verrou)
+_toolchain_inventory = None
+_toolchain_inventory_lock = threading.RLock()
+# Caches memoire revalides par date de fichier (index des projets, manifestes)
+_project_index_cache = {}
+_build_manifest_cache = {}
+# Trace des etapes (--trace), None quand elle est desactivee
+_tracer = None
+
+def _children_cpu_time():
+    """Temps CPU (utilisateur + systeme) des sous-processus termines."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class Tracer:
+    """Spans imbriques exportes au format Chrome trace-event (chrome://tracing, Perfetto).
     
-    try:
-        # L'argument `cwd` est crucial pour executer la commande dans le bon dossier
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            encoding='utf-8',
-            cwd=project_path
-        )
+    Chaque span garde sa duree reelle et son temps CPU: celui du thread pour
+    une etape Python, celui des sous-processus pour une commande (omis si
+    d'autres commandes tournaient en meme temps: il ne serait pas attribuable).
+    Les commandes concurrentes d'un meme thread sont placees sur des pistes
+    distinctes pour rester lisibles.
+    """
 
-        # Affiche la sortie ligne par ligne en temps reel
-        while True:
-            output = process.stdout.readline()
-            if output == '' and process.poll() is not None:
-                break
-            if output:
-                print(output.strip(), flush=True)
+    def __init__(self, path):
+        self.path = path
+        self.events = []
+        self.self_times = collections.Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tids = {}
+        self._origin = time.perf_counter()
+        self._cpu_origin = time.process_time() + _children_cpu_time()
 
-        # Verifie si la commande a reussi
-        if process.returncode != 0:
-            print(f"❌ Erreur lors de l'execution de la commande (code: {process.returncode})", file=sys.stderr)
-            sys.exit(process.returncode)
-        
-        print("✅ Commande terminee avec succes.")
-        return True
-        
-    except FileNotFoundError as e:
-        tool_name = command[0]
-        print(f"❌ Erreur: L'outil '{tool_name}' n'est pas installe.", file=sys.stderr)
-        print(f"", file=sys.stderr)
-        
-        if tool_name == "probe-rs":
-            print(f"💡 Pour installer probe-rs (outil de flashage Pico):", file=sys.stderr)
-            print(f"   cargo install probe-rs-tools --locked", file=sys.stderr)
-            print(f"   ou utilisez: python3 {sys.argv[0]} install-tools --target pico", file=sys.stderr)
-        elif tool_name == "espflash":
-            print(f"💡 Pour installer espflash (outil de flashage ESP32-C3):", file=sys.stderr)
-            print(f"   cargo install espflash", file=sys.stderr)
-            print(f"   ou utilisez: python3 {sys.argv[0]} install-tools --target esp32c3", file=sys.stderr)
-        elif tool_name == "cargo":
-            print(f"💡 Pour installer Rust et Cargo:", file=sys.stderr)
-            print(f"   curl --proto '=https' --tlsv1.2 -sSf https://sh.rustup.rs | sh", file=sys.stderr)
-        elif tool_name == "rustup":
-            print(f"💡 Pour installer rustup:", file=sys.stderr)
-            print(f"   curl --proto '=https' --tlsv1.2 -sSf https://sh.rustup.rs | sh", file=sys.stderr)
+    def _tid(self, lane=0):
+        key = (threading.get_ident(), lane)
+        tid = self._tids.get(key)
+        if tid is None:
+            name = threading.current_thread().name + (f" #{lane}" if lane else "")
+            with self._lock:
+                tid = self._tids[key] = len(self._tids) + 1
+                self.events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                                    "args": {"name": name}})
+        return tid
+
+    def begin(self, process=False):
+        """Ouvre un span; retourne le jeton a passer a end()."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        token = {"start": time.perf_counter(), "parent": stack[-1] if stack else None, "children": 0.0,
+                 "process": process, "lane": 0}
+        if process:
+            # Les commandes d'un run_steps tournent en parallele dans le meme thread
+            lanes = self._local.__dict__.setdefault("lanes", {})
+            while token["lane"] in lanes:
+                token["lane"] += 1
+            token["shared"] = bool(lanes)
+            for other in lanes.values():
+                other["shared"] = True
+            lanes[token["lane"]] = token
+            token["cpu"] = _children_cpu_time()
         else:
-            print(f"💡 Installez {tool_name} et assurez-vous qu'il soit dans votre PATH.", file=sys.stderr)
-            
-        print(f"", file=sys.stderr)
-        print(f"🔧 Pour configurer automatiquement tout l'environnement:", file=sys.stderr)
-        print(f"   python3 {sys.argv[0]} setup", file=sys.stderr)
-        sys.exit(1)
+            token["cpu"] = time.thread_time()
+            stack.append(token)
+        return token
+
+    def end(self, token, name, category, args=None):
+        wall = time.perf_counter() - token["start"]
+        if token["process"]:
+            cpu = None if token["shared"] else _children_cpu_time() - token["cpu"]
+            del self._local.lanes[token["lane"]]
+        else:
+            cpu = time.thread_time() - token["cpu"]
+            stack = self._local.stack
+            if stack and stack[-1] is token:
+                stack.pop()
+        if token["parent"] is not None:
+            token["parent"]["children"] += wall
+        event = {"name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": self._tid(token["lane"]),
+                 "ts": round((token["start"] - self._origin) * 1e6, 1), "dur": round(wall * 1e6, 1),
+                 "args": dict(args or {})}
+        if cpu is not None:
+            event["args"]["cpu_ms"] = round(cpu * 1000, 3)
+        with self._lock:
+            self.events.append(event)
+            self.self_times[name] += max(0.0, wall - token["children"])
 
+    def save(self):
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms",
+                       "otherData": {"argv": sys.argv}}, f)
 
-def find_elf_file(project_path, rust_target):
-    """Trouve le fichier .elf compile dans le dossier target."""
-    # Lire le nom du projet depuis Cargo.toml
-    cargo_toml_path = Path(project_path) / "Cargo.toml"
-    project_name = None
+    def summary(self):
+        """Resume d'une ligne: duree totale, CPU et etapes les plus longues (temps propre)."""
+        wall = time.perf_counter() - self._origin
+        cpu = time.process_time() + _children_cpu_time() - self._cpu_origin
+        top = [f"{name} {seconds:.2f} s" for name, seconds in self.self_times.most_common(5) if seconds >= 0.005]
+        return f"⏱️  Trace: {wall:.2f} s (CPU {cpu:.2f} s) | {', '.join(top) or '-'} → {self.path}"
+
+def start_trace(path):
+    """Active la trace des etapes; elle sera ecrite dans `path` par finish_trace."""
+    global _tracer
+    _tracer = Tracer(path)
+
+def finish_trace():
+    """Ecrit la trace en cours et affiche son resume."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return
+    try:
+        tracer.save()
+    except OSError as e:
+        _print_line(f"⚠️ Trace non enregistree: {e}", sys.stderr)
+        return
+    _print_line(tracer.summary(), sys.stderr)
+
+@contextlib.contextmanager
+def trace_span(name, category="step", **args):
+    """Span autour d'un bloc (sans effet si la trace est desactivee)."""
+    tracer = _tracer
+    if tracer is None:
+        yield
+        return
+    token = tracer.begin()
+    try:
+        yield
+    finally:
+        tracer.end(token, name, category, args)
+
+def traced(function):
+    """Decorateur: un span par appel quand la trace est active, un simple test sinon."""
+    name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        tracer = _tracer
+        if tracer is None:
+            return function(*args, **kwargs)
+        token = tracer.begin()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            tracer.end(token, name, "step")
+    return wrapper
+
+def _trace_process_name(command):
+    """Nom du span d'une commande: l'executable et sa sous-commande (`cargo build`)."""
+    name = os.path.basename(command[0])
+    if len(command) > 1 and re.fullmatch(r"[a-z][a-z0-9-]*", command[1]):
+        name += f" {command[1]}"
+    return name
+
+def _command_step(command, cwd=None, **options):
+    """Decrit une etape du moteur de processus (voir run_steps)."""
+    return {"command": list(command), "cwd": cwd, **options}
+
+class _OutputSink:
+    """Sortie d'une commande: ecritures regroupees, fin de sortie gardee en memoire.
     
-    if cargo_toml_path.exists():
+    Seuls les `output_limit` derniers caracteres sont gardes (None: toute la
+    sortie, pour une commande dont on analyse le resultat); `truncated`
+    indique que le debut a ete perdu.
+    """
+
+    def __init__(self, echo=True, prefix=None, line_filter=None, output_limit=PROCESS_OUTPUT_LIMIT):
+        self.echo = echo
+        self.prefix = prefix
+        self.line_filter = line_filter
+        self.output_limit = output_limit
+        self.truncated = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._tail = collections.deque()
+        self._tail_size = 0
+        self._pending = []
+        self._pending_size = 0
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def feed(self, data, final=False):
+        text = self._decoder.decode(data, final)
+        if text:
+            self._tail.append(text)
+            self._tail_size += len(text)
+            while (self.output_limit is not None and self._tail_size > self.output_limit
+                   and len(self._tail) > 1):
+                self._tail_size -= len(self._tail.popleft())
+                self.truncated = True
+        if not self.echo:
+            return
+        if text:
+            self._pending.append(text)
+            self._pending_size += len(text)
+        if (final or self._pending_size >= PROCESS_WRITE_BATCH
+                or time.monotonic() - self._last_flush >= PROCESS_FLUSH_INTERVAL):
+            self.flush(final)
+        elif self._pending and self._timer is None:
+            # Sortie trop petite pour un envoi immediat: elle part au plus tard dans
+            # PROCESS_FLUSH_INTERVAL, meme si la commande se tait
+            self._timer = asyncio.get_running_loop().call_later(PROCESS_FLUSH_INTERVAL, self.flush)
+
+    def flush(self, final=False):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._last_flush = time.monotonic()
+        text = "".join(self._pending)
+        rest = ""
+        if self.prefix or self.line_filter:
+            # Seules les lignes completes sont filtrees et prefixees, le debut de
+            # ligne attend la suite
+            lines = text.split("\n")
+            rest = lines.pop()
+            if rest and (final or len(rest) >= PROCESS_WRITE_BATCH):
+                lines.append(rest)
+                rest = ""
+            if self.line_filter:
+                lines = [line for line in map(self.line_filter, lines) if line is not None]
+            label = f"{self.prefix} " if self.prefix else ""
+            text = "".join(f"{label}{line.rstrip()}\n" for line in lines)
+        self._pending = [rest] if rest else []
+        self._pending_size = len(rest)
+        if text:
+            with _output_lock:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+
+    @property
+    def output(self):
+        return "".join(self._tail)
+
+async def _stop_process(process):
+    """Termine une commande et ses sous-processus (SIGTERM, puis SIGKILL apres un delai)."""
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            process.terminate()
+    except ProcessLookupError:
+        pass
+    try:
+        await asyncio.wait_for(process.wait(), PROCESS_KILL_GRACE)
+    except asyncio.TimeoutError:
         try:
-            with open(cargo_toml_path, 'r') as f:
-                for line in f:
-                    if line.startswith('name = '):
-                        project_name = line.split('=')[1].strip().strip('"\'')
-                        break
-        except Exception:
+            if os.name == "posix":
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
             pass
+        await process.wait()
+
+async def _pump_output(process, sink):
+    while True:
+        data = await process.stdout.read(PROCESS_READ_SIZE)
+        if not data:
+            break
+        sink.feed(data)
+    return await process.wait()
+
+async def _run_step(step, handle, semaphore):
+    """Execute une etape et retourne son resultat (jamais d'exception pour un echec de la commande)."""
+    result = {
+        "command": step["command"],
+        "returncode": None,
+        "ok": False,
+        "output": "",
+        "truncated": False,
+        "duration": 0.0,
+        "timed_out": False,
+        "cancelled": False,
+        "not_found": False,
+        "error": None,
+    }
+    sink = _OutputSink(step.get("echo", True), step.get("prefix"), step.get("line_filter"),
+                       step.get("output_limit", PROCESS_OUTPUT_LIMIT))
+    process = None
+    tracer, trace = _tracer, None
+    started = time.monotonic()
+    try:
+        async with semaphore:
+            if handle.cancelled:
+                raise asyncio.CancelledError()
+            started = time.monotonic()
+            trace = tracer.begin(process=True) if tracer else None
+            options = {"pass_fds": step["pass_fds"]} if step.get("pass_fds") else {}
+            process = await asyncio.create_subprocess_exec(
+                *step["command"],
+                cwd=step.get("cwd"),
+                env=step.get("env"),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT if step.get("stderr", True) else asyncio.subprocess.DEVNULL,
+                # Groupe de processus dedie: un arret tue aussi les rustc/runners lances
+                start_new_session=(os.name == "posix"),
+                **options
+            )
+            result["returncode"] = await asyncio.wait_for(_pump_output(process, sink), step.get("timeout"))
+    except asyncio.TimeoutError:
+        result["timed_out"] = True
+        result["error"] = f"delai de {step.get('timeout')} s depasse"
+    except asyncio.CancelledError:
+        result["cancelled"] = True
+        result["error"] = "commande annulee"
+    except OSError as e:
+        result["not_found"] = isinstance(e, FileNotFoundError)
+        result["error"] = str(e)
+    finally:
+        if process is not None:
+            await _stop_process(process)
+            if result["returncode"] is None:
+                result["returncode"] = process.returncode
+        if trace is not None:
+            tracer.end(trace, _trace_process_name(step["command"]), "process",
+                        {"command": " ".join(step["command"]), "returncode": result["returncode"]})
+        sink.feed(b"", final=True)
+    
+    result["ok"] = result["error"] is None and result["returncode"] == 0
+    result["output"] = sink.output
+    result["truncated"] = sink.truncated
+    result["duration"] = time.monotonic() - started
+    return result
+
+class CommandHandle:
+    """Execution du moteur de processus, annulable depuis n'importe quel thread."""
+
+    def __init__(self):
+        self.results = None
+        self._loop = None
+        self._tasks = []
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Arrete toutes les commandes en cours (et celles pas encore lancees)."""
+        self._cancelled.set()
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._cancel_tasks)
+            except RuntimeError:
+                # Boucle deja fermee: l'execution est terminee
+                pass
+
+    def _cancel_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Attend la fin de l'execution; retourne la liste des resultats (None si pas finie)."""
+        self._done.wait(timeout)
+        return self.results
+
+    async def run(self, steps, limit=None):
+        self._loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(limit or max(1, len(steps)))
+        self._tasks = [asyncio.ensure_future(_run_step(step, self, semaphore)) for step in steps]
+        register_command(self)
+        if self.cancelled:
+            self._cancel_tasks()
+        try:
+            if self._tasks:
+                await asyncio.wait(self._tasks)
+            self.results = [task.result() for task in self._tasks]
+            return self.results
+        finally:
+            self._done.set()
+
+def run_steps(steps, limit=None):
+    """Execute des commandes independantes en parallele (au plus `limit` a la fois).
+    
+    Chaque etape est un dict: command, cwd, env, timeout (secondes), prefix
+    (prefixe des lignes affichees), line_filter (ligne -> texte affiche ou
+    None), echo (False pour seulement capturer la sortie), stderr (False pour
+    l'ignorer), pass_fds, output_limit (caracteres de sortie gardes, None
+    sans limite). Retourne les resultats dans l'ordre des etapes.
+    """
+    return asyncio.run(CommandHandle().run(steps, limit))
+
+def start_command(step):
+    """Lance une etape en arriere-plan; retourne son CommandHandle."""
+    handle = CommandHandle()
+    request = getattr(_rpc_context, "request", None)
+
+    def runner():
+        _rpc_context.request = request
+        asyncio.run(handle.run([step]))
+
+    threading.Thread(target=runner, daemon=True).start()
+    return handle
+
+def capture_command(command, cwd=None, timeout=None, env=None, stderr=True, pass_fds=(),
+                    output_limit=PROCESS_OUTPUT_LIMIT):
+    """Execute une commande sans afficher sa sortie; retourne son resultat (sortie dans `output`).
+    
+    `output_limit=None` garde toute la sortie (document JSON a analyser).
+    """
+    return run_steps([_command_step(command, cwd, timeout=timeout, env=env, echo=False, stderr=stderr,
+                                    pass_fds=pass_fds, output_limit=output_limit)])[0]
+
+def print_missing_tool_help(tool_name):
+    """Explique comment installer un outil absent du PATH."""
+    print(f"❌ Erreur: L'outil '{tool_name}' n'est pas installe.", file=sys.stderr)
+    print(f"", file=sys.stderr)
+    
+    if tool_name == "probe-rs":
+        print(f"💡 Pour installer probe-rs (outil de flashage Pico):", file=sys.stderr)
+        print(f"   cargo install probe-rs-tools --locked", file=sys.stderr)
+        print(f"   ou utilisez: python3 {sys.argv[0]} install-tools --target pico", file=sys.stderr)
+    elif tool_name == "espflash":
+        print(f"💡 Pour installer espflash (outil de flashage ESP32-C3):", file=sys.stderr)
+        print(f"   cargo install espflash", file=sys.stderr)
+        print(f"   ou utilisez: python3 {sys.argv[0]} install-tools --target esp32c3", file=sys.stderr)
+    elif tool_name == "cargo":
+        print(f"💡 Pour installer Rust et Cargo:", file=sys.stderr)
+        print(f"   curl --proto '=https' --tlsv1.2 -sSf https://sh.rustup.rs | sh", file=sys.stderr)
+    elif tool_name == "rustup":
+        print(f"💡 Pour installer rustup:", file=sys.stderr)
+        print(f"   curl --proto '=https' --tlsv1.2 -sSf https://sh.rustup.rs | sh", file=sys.stderr)
+    else:
+        print(f"💡 Installez {tool_name} et assurez-vous qu'il soit dans votre PATH.", file=sys.stderr)
+        
+    print(f"", file=sys.stderr)
+    print(f"🔧 Pour configurer automatiquement tout l'environnement:", file=sys.stderr)
+    print(f"   python3 {sys.argv[0]} setup", file=sys.stderr)
+
+def _print_line(text, file=None):
+    """Ecrit une ligne d'un bloc (jamais melangee avec la sortie d'une commande concurrente)."""
+    file = file or sys.stdout
+    with _output_lock:
+        file.write(text + "\n")
+        file.flush()
+
+def run_command(command, project_path, timeout=None, env=None, prefix=None, pass_fds=(), line_filter=None):
+    """Execute une commande en affichant sa sortie en temps reel; retourne son resultat.
+    
+    Le resultat est un dict (ok, returncode, output, duration, timed_out,
+    cancelled, not_found, error): un echec est signale, jamais un sys.exit.
+    """
+    label = f"{prefix} " if prefix else ""
+    _print_line(f"{label}🚀 Execution de : {' '.join(command)}")
+    
+    # `cwd` est crucial pour executer la commande dans le bon dossier
+    result = run_steps([_command_step(command, project_path, timeout=timeout, env=env,
+                                      prefix=prefix, pass_fds=pass_fds, line_filter=line_filter)])[0]
+    
+    if result["not_found"]:
+        print_missing_tool_help(command[0])
+    elif result["timed_out"]:
+        _print_line(f"{label}⏱️  Commande interrompue: {result['error']}", sys.stderr)
+    elif result["cancelled"]:
+        _print_line(f"{label}⏹️  Commande annulee", sys.stderr)
+    elif result["error"]:
+        _print_line(f"{label}❌ Impossible de lancer la commande: {result['error']}", sys.stderr)
+    elif result["returncode"] != 0:
+        _print_line(f"{label}❌ Erreur lors de l'execution de la commande (code: {result['returncode']})", sys.stderr)
+    else:
+        _print_line(f"{label}✅ Commande terminee avec succes.")
+    return result
+
+def _read_toml(path):
+    """Lit un fichier TOML; None s'il est absent ou invalide."""
+    if tomllib is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _path_stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _manifest_binaries(package_dir, manifest):
+    """Binaires d'un paquet: sections [[bin]] plus les binaires automatiques de cargo."""
+    package = manifest.get("package", {})
+    binaries = [entry["name"] for entry in manifest.get("bin", []) if entry.get("name")]
+    if package.get("autobins", True):
+        if (package_dir / "src" / "main.rs").is_file() and package.get("name") not in binaries:
+            binaries.append(package["name"])
+        bin_dir = package_dir / "src" / "bin"
+        if bin_dir.is_dir():
+            for entry in sorted(os.scandir(bin_dir), key=lambda entry: entry.name):
+                if entry.name.endswith(".rs"):
+                    name = entry.name[:-len(".rs")]
+                elif entry.is_dir() and (Path(entry.path) / "main.rs").is_file():
+                    name = entry.name
+                else:
+                    continue
+                if name not in binaries:
+                    binaries.append(name)
+    return binaries
+
+def _toml_package(manifest_path):
+    """Entree d'index d'un paquet lue directement dans son Cargo.toml."""
+    manifest = _read_toml(manifest_path)
+    if not manifest or "package" not in manifest:
+        return None
+    package_dir = Path(manifest_path).parent
+    return {
+        "name": manifest["package"].get("name", package_dir.name),
+        "manifest": str(manifest_path),
+        "dir": str(package_dir),
+        "binaries": _manifest_binaries(package_dir, manifest),
+        "default_run": manifest["package"].get("default-run"),
+    }
+
+def _config_target_dir(workspace_root):
+    """Dossier de build impose par l'environnement ou par .cargo/config.toml (sinon None)."""
+    for variable in ("CARGO_TARGET_DIR", "CARGO_BUILD_TARGET_DIR"):
+        if os.environ.get(variable):
+            return os.path.abspath(os.environ[variable])
+    for directory in [Path(workspace_root), *Path(workspace_root).parents]:
+        config = _read_toml(directory / ".cargo" / "config.toml") or {}
+        target_dir = config.get("build", {}).get("target-dir")
+        if target_dir:
+            return str((directory / target_dir).resolve())
+    return None
+
+def _find_workspace_root(project_path):
+    """Premier Cargo.toml avec une section [workspace] en remontant depuis le projet."""
+    project_path = Path(project_path).resolve()
+    for directory in [project_path, *project_path.parents]:
+        manifest = _read_toml(directory / "Cargo.toml")
+        if manifest and "workspace" in manifest:
+            return directory, manifest
+    return project_path, _read_toml(project_path / "Cargo.toml") or {}
+
+def _index_from_cargo_metadata(project_path):
+    """Index calcule par `cargo metadata --no-deps` (source de reference), None si cargo echoue."""
+    # Sortie complete: le JSON d'un gros workspace depasse PROCESS_OUTPUT_LIMIT
+    result = capture_command(["cargo", "metadata", "--no-deps", "--offline", "--format-version", "1"],
+                             project_path, timeout=TOOL_PROBE_TIMEOUT, stderr=False, output_limit=None)
+    if not result["ok"]:
+        return None
+    try:
+        metadata = json.loads(result["output"])
+    except ValueError:
+        return None
+    packages = {}
+    for package in metadata.get("packages", []):
+        packages[package["name"]] = {
+            "name": package["name"],
+            "manifest": package["manifest_path"],
+            "dir": str(Path(package["manifest_path"]).parent),
+            "binaries": [target["name"] for target in package.get("targets", []) if "bin" in target.get("kind", [])],
+            "default_run": package.get("default_run"),
+        }
+    return {
+        "workspace_root": metadata["workspace_root"],
+        "target_dir": metadata["target_directory"],
+        "packages": packages,
+    }
+
+def _index_from_toml(project_path):
+    """Index de secours sans cargo: Cargo.toml du workspace et de ses membres."""
+    root, manifest = _find_workspace_root(project_path)
+    manifests = []
+    if "package" in manifest:
+        manifests.append(root / "Cargo.toml")
+    workspace = manifest.get("workspace", {})
+    excluded = {(root / path).resolve() for path in workspace.get("exclude", [])}
+    for pattern in workspace.get("members", []):
+        for member in sorted(glob.glob(str(root / pattern))):
+            member = Path(member).resolve()
+            if member not in excluded and (member / "Cargo.toml").is_file() and member != root:
+                manifests.append(member / "Cargo.toml")
+    if not manifests:
+        manifests.append(Path(project_path).resolve() / "Cargo.toml")
+    
+    packages = {}
+    for manifest_path in manifests:
+        package = _toml_package(manifest_path)
+        if package:
+            packages[package["name"]] = package
+    return {
+        "workspace_root": str(root),
+        "target_dir": _config_target_dir(root) or str(root / "target"),
+        "packages": packages,
+    }
+
+def _index_stamps(index, project_path):
+    """Fichiers dont depend l'index: {chemin: date}, separes en globaux et par paquet."""
+    root = Path(index["workspace_root"])
+    shared = [root / "Cargo.toml", root / "Cargo.lock", root / ".cargo" / "config.toml",
+              Path(project_path).resolve() / ".cargo" / "config.toml"]
+    stamps = {"shared": {str(path): _path_stamp(path) for path in shared},
+              "env": [os.environ.get("CARGO_TARGET_DIR"), os.environ.get("CARGO_BUILD_TARGET_DIR")],
+              "packages": {}}
+    for name, package in index["packages"].items():
+        package_dir = Path(package["dir"])
+        # La date de src/ et src/bin change quand un binaire automatique apparait
+        paths = [Path(package["manifest"]), package_dir / "src", package_dir / "src" / "bin"]
+        stamps["packages"][name] = {str(path): _path_stamp(path) for path in paths}
+    return stamps
+
+def _project_index_file(project_path):
+    key = hashlib.sha256(str(Path(project_path).resolve()).encode()).hexdigest()[:16]
+    return PROJECT_INDEX_DIR / f"{key}.json"
+
+def load_project_index(project_path, refresh=False):
+    """Index du workspace d'un projet: membres, binaires et dossier de build.
     
-    # Fallback au nom du dossier si on ne trouve pas dans Cargo.toml
-    if not project_name:
-        project_name = Path(project_path).name
+    L'index est garde en memoire et sur disque, associe a la date des
+    Cargo.toml, du Cargo.lock et des .cargo/config.toml. Si seul le manifeste
+    d'un membre a change, ce membre est relu sans relancer `cargo metadata`.
+    """
+    key = str(Path(project_path).resolve())
+    index = None if refresh else _project_index_cache.get(key)
+    if index is None and not refresh:
+        try:
+            with open(_project_index_file(key), "r") as f:
+                index = json.load(f)
+            if index.get("version") != PROJECT_INDEX_VERSION:
+                index = None
+        except (OSError, ValueError, AttributeError):
+            index = None
     
-    # Essayer le mode release en premier
-    elf_path = Path(project_path) / "target" / rust_target / "release" / project_name
+    if index is not None:
+        stamps = _index_stamps(index, key)
+        if stamps == index["stamps"]:
+            _project_index_cache[key] = index
+            return index
+        if stamps["shared"] == index["stamps"]["shared"] and stamps["env"] == index["stamps"]["env"]:
+            # Invalidation incrementale: on ne relit que les paquets modifies
+            for name, package_stamps in stamps["packages"].items():
+                if package_stamps != index["stamps"]["packages"].get(name):
+                    package = _toml_package(index["packages"][name]["manifest"])
+                    if package is None or package["name"] != name:
+                        index = None
+                        break
+                    index["packages"][name] = package
+        else:
+            index = None
     
-    if elf_path.exists() and elf_path.is_file():
-        return str(elf_path)
+    if index is None:
+        index = _index_from_cargo_metadata(key) or _index_from_toml(key)
+        index["version"] = PROJECT_INDEX_VERSION
+    index["by_dir"] = {package["dir"]: name for name, package in index["packages"].items()}
+    index["stamps"] = _index_stamps(index, key)
     
-    # Essayons le mode debug si le mode release n'existe pas
-    elf_path = Path(project_path) / "target" / rust_target / "debug" / project_name
+    _project_index_cache[key] = index
+    try:
+        path = _project_index_file(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return index
+
+def project_binaries(project_path):
+    """Binaires compiles pour le projet: ceux du paquet, ou de tout le workspace a sa racine."""
+    index = load_project_index(project_path)
+    name = index["by_dir"].get(str(Path(project_path).resolve()))
+    if name is not None:
+        return list(index["packages"][name]["binaries"])
+    return [binary for package in index["packages"].values() for binary in package["binaries"]]
+
+def cargo_package_name(project_path):
+    """Nom du binaire a flasher pour le projet (`default-run` s'il y en a plusieurs), None si ambigu."""
+    index = load_project_index(project_path)
+    name = index["by_dir"].get(str(Path(project_path).resolve()))
+    default_run = index["packages"][name].get("default_run") if name is not None else None
+    binaries = project_binaries(project_path)
+    if default_run in binaries:
+        return default_run
+    return binaries[0] if len(binaries) == 1 else None
+
+def project_target_dir(project_path):
+    """Dossier de build effectif (CARGO_TARGET_DIR, build.target-dir, ou target/ du workspace)."""
+    return load_project_index(project_path)["target_dir"]
+
+
+@traced
+def find_elf_file(project_path, rust_target):
+    """Trouve l'ELF le plus recent du binaire du projet, tous profils confondus (release, debug...)."""
+    binary = cargo_package_name(project_path)
+    if binary is None:
+        binaries = project_binaries(project_path)
+        if binaries:
+            print(f"❌ Plusieurs binaires dans {project_path}: {', '.join(binaries)}", file=sys.stderr)
+            print("💡 Indiquez le paquet avec --project-path ou `default-run` dans son Cargo.toml", file=sys.stderr)
+        else:
+            print(f"❌ Aucun binaire dans {project_path} (ni src/main.rs, ni [[bin]])", file=sys.stderr)
+        return None
     
-    if elf_path.exists() and elf_path.is_file():
-        return str(elf_path)
+    triple_dir = Path(project_target_dir(project_path)) / rust_target
+    candidates = []
+    try:
+        for entry in os.scandir(triple_dir):
+            if entry.is_dir():
+                try:
+                    stat = os.stat(Path(entry.path) / binary)
+                    candidates.append((stat.st_mtime_ns, str(Path(entry.path) / binary)))
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    if candidates:
+        return max(candidates)[1]
     
     print(f"❌ Impossible de trouver le fichier .elf. Avez-vous compile le projet ?", file=sys.stderr)
-    print(f"🔍 Recherche:", file=sys.stderr)
-    print(f"   - {Path(project_path) / 'target' / rust_target / 'release' / project_name}", file=sys.stderr)
-    print(f"   - {Path(project_path) / 'target' / rust_target / 'debug' / project_name}", file=sys.stderr)
+    print(f"🔍 Recherche: {triple_dir / '<profil>' / binary}", file=sys.stderr)
     return None
 
 
+def _binary_fingerprint(binary):
+    """Identifie un executable par son chemin resolu, sa date et sa taille (sans le lancer)."""
+    path = shutil.which(binary)
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_mtime_ns, stat.st_size]
+
+def _rustup_stamps():
+    """Dates des toolchains rustup: changent a chaque `rustup update` ou `target add`."""
+    rustup_home = Path(os.environ.get("RUSTUP_HOME", Path.home() / ".rustup"))
+    stamps = [os.environ.get("RUSTUP_TOOLCHAIN", "")]
+    for path in [rustup_home / "settings.toml", *sorted(rustup_home.glob("toolchains/*/lib/rustlib"))]:
+        try:
+            stamps.append([str(path), path.stat().st_mtime_ns])
+        except OSError:
+            pass
+    return stamps
+
+def _rust_fingerprint(binary):
+    """Empreinte de cargo/rustc/rustup: ce sont des proxys rustup, on y ajoute l'etat des toolchains."""
+    fingerprint = _binary_fingerprint(binary)
+    if fingerprint is None:
+        return None
+    return fingerprint + _rustup_stamps()
+
+def _toolchain_probes():
+    """Liste des sondes de l'inventaire: {cle: (empreinte, commande)}."""
+    probes = {
+        "cargo": (_rust_fingerprint("cargo"), ["cargo", "--version"]),
+        "rustc": (_rust_fingerprint("rustc"), ["rustc", "-vV"]),
+        "rustup": (_binary_fingerprint("rustup"), ["rustup", "--version"]),
+        "rustup-targets": (_rust_fingerprint("rustup"), ["rustup", "target", "list", "--installed"]),
+    }
+    for tool_name, tool in TOOLS.items():
+        probes[tool_name] = (_binary_fingerprint(tool["check_command"][0]), tool["check_command"])
+    return probes
+
+def _probe_entry(command, result):
+    """Entree d'inventaire tiree du resultat d'une sonde."""
+    if result["error"]:
+        return {"installed": False, "version": None}
+    
+    lines = result["output"].strip().splitlines()
+    entry = {"installed": result["ok"], "version": lines[0] if lines else None}
+    if command[1:] == ["target", "list", "--installed"]:
+        entry["targets"] = [line.strip() for line in lines if line.strip()]
+    for line in lines:
+        if line.startswith("host: "):
+            entry["host"] = line[len("host: "):].strip()
+    return entry
+
+def _load_toolchain_cache():
+    try:
+        with open(TOOLCHAIN_CACHE_FILE, "r") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def _save_toolchain_cache(inventory):
+    """Ecrit le cache de maniere atomique (plusieurs actions peuvent tourner en parallele)."""
+    try:
+        TOOLCHAIN_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = TOOLCHAIN_CACHE_FILE.with_name(f"{TOOLCHAIN_CACHE_FILE.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(inventory, f, indent=2)
+        os.replace(tmp_file, TOOLCHAIN_CACHE_FILE)
+    except OSError:
+        pass
+
+@traced
+def get_toolchain_inventory(refresh=False):
+    """Retourne l'inventaire de la toolchain (outils, versions, targets installees).
+    
+    Les resultats sont caches sur disque et associes a l'empreinte de chaque
+    executable: seules les sondes dont le binaire a change sont relancees, en
+    parallele. Un appel a chaud ne lance aucun processus.
+    """
+    global _toolchain_inventory
+    with _toolchain_inventory_lock:
+        if _toolchain_inventory is not None and not refresh:
+            return _toolchain_inventory
+        
+        cache = {} if refresh else _load_toolchain_cache()
+        inventory = {}
+        stale = {}
+        for key, (fingerprint, command) in _toolchain_probes().items():
+            entry = cache.get(key)
+            if fingerprint is None:
+                # Binaire absent du PATH: inutile de le lancer
+                inventory[key] = {"fingerprint": None, "installed": False, "version": None}
+            elif entry and entry.get("fingerprint") == fingerprint and entry.get("command") == command:
+                inventory[key] = entry
+            else:
+                stale[key] = (fingerprint, command)
+        
+        if stale:
+            keys = list(stale)
+            results = run_steps([_command_step(stale[key][1], timeout=TOOL_PROBE_TIMEOUT, echo=False, stderr=False)
+                                 for key in keys])
+            for key, result in zip(keys, results):
+                fingerprint, command = stale[key]
+                inventory[key] = {"fingerprint": fingerprint, "command": command, **_probe_entry(command, result)}
+        
+        if inventory != cache:
+            _save_toolchain_cache(inventory)
+        _toolchain_inventory = inventory
+        return inventory
+
+def reset_toolchain_inventory():
+    """Oublie l'inventaire en memoire (apres une installation)."""
+    global _toolchain_inventory
+    with _toolchain_inventory_lock:
+        _toolchain_inventory = None
+
+def installed_rust_targets():
+    """Retourne la liste des targets Rust installees (depuis l'inventaire)."""
+    return get_toolchain_inventory()["rustup-targets"].get("targets", [])
+
 def check_tool_installed(tool_name):
     """Verifie si un outil est installe."""
-    try:
-        result = subprocess.run(TOOLS[tool_name]["check_command"], 
-                              capture_output=True, text=True)
-        return result.returncode == 0
-    except FileNotFoundError:
-        return False
+    return get_toolchain_inventory()[tool_name]["installed"]
+
+def print_toolchain_inventory(as_json=False):
+    """Affiche l'inventaire de la toolchain (action doctor)."""
+    inventory = get_toolchain_inventory()
+    if as_json:
+        print(json.dumps(inventory, indent=2))
+        return True
+    
+    print("🩺 Inventaire de la toolchain")
+    for key in ["cargo", "rustc", "rustup", *TOOLS.keys()]:
+        entry = inventory[key]
+        if entry["installed"]:
+            print(f"   ✅ {key:<12} {entry['version'] or ''}")
+            print(f"      {entry['fingerprint'][0]}")
+        else:
+            print(f"   ❌ {key:<12} non installe")
+    
+    print()
+    print("🎯 Targets Rust")
+    targets = installed_rust_targets()
+    for target_name, config in TARGETS.items():
+        if config["rust_target"] in targets:
+            print(f"   ✅ {config['rust_target']} ({target_name})")
+        else:
+            print(f"   ❌ {config['rust_target']} ({target_name}) → python3 {sys.argv[0]} install-target --target {target_name}")
+    
+    missing = [key for key in TOOLS if not inventory[key]["installed"]]
+    if missing:
+        print()
+        print(f"💡 Outils manquants: python3 {sys.argv[0]} install-tools")
+    return True
 
 def install_rust_target(target):
     """Installe une target Rust."""
     print(f"🎯 Installation de la target Rust: {target}")
     command = ["rustup", "target", "add", target]
-    result = subprocess.run(command, capture_output=True, text=True)
+    result = capture_command(command)
     
-    if result.returncode == 0:
+    reset_toolchain_inventory()
+    if result["ok"]:
         print(f"✅ Target {target} installee avec succes")
     else:
         print(f"❌ Erreur lors de l'installation de la target {target}")
-        print(result.stderr)
+        print(result["output"] or result["error"])
+        return False
+    return True
+
+def install_llvm_tools():
+    """Installe llvm-tools-preview (necessaire a cargo objcopy)."""
+    print("📋 Installation de llvm-tools-preview...")
+    llvm_command = ["rustup", "component", "add", "llvm-tools-preview"]
+    result = capture_command(llvm_command)
+    if not result["ok"]:
+        print("⚠️ Impossible d'installer llvm-tools-preview")
         return False
+    reset_toolchain_inventory()
+    print("✅ llvm-tools-preview installe")
     return True
 
-def install_tool(tool_name):
-    """Installe un outil de flashage."""
+@traced
+def install_tool(tool_name, jobs=None, target_dir=None, jobserver=None):
+    """Installe un outil de flashage.
+    
+    `jobs` limite le nombre de compilations paralleles de cargo, `target_dir`
+    permet de partager le dossier de build entre plusieurs outils et
+    `jobserver` (voir create_jobserver) borne les compilations au budget CPU.
+    """
     print(f"🔧 Installation de l'outil: {tool_name}")
     
     if check_tool_installed(tool_name):
         print(f"✅ {tool_name} est deja installe")
         return True
     
-    command = TOOLS[tool_name]["install_command"]
-    result = subprocess.run(command, capture_output=True, text=True)
+    if restore_tool_from_cache(tool_name):
+        reset_toolchain_inventory()
+        print(f"✅ {tool_name} restaure depuis le cache local")
+        return True
+    
+    command = list(TOOLS[tool_name]["install_command"])
+    if jobs and not jobserver:
+        command += ["--jobs", str(jobs)]
+    env = jobserver_env(jobserver, jobs or os.cpu_count() or 1) if jobserver else dict(os.environ)
+    if target_dir:
+        env["CARGO_TARGET_DIR"] = str(target_dir)
+    if jobserver:
+        # Jeton implicite de cargo pris dans le jobserver, comme run_build_job
+        read_fd, write_fd = jobserver
+        token = os.read(read_fd, 1)
+        try:
+            result = capture_command(command, env=env, pass_fds=jobserver)
+        finally:
+            os.write(write_fd, token)
+    else:
+        result = capture_command(command, env=env)
+    reset_toolchain_inventory()
     
-    if result.returncode == 0:
+    if result["ok"]:
         print(f"✅ {tool_name} installe avec succes")
+        publish_tool_to_cache(tool_name)
         return True
     else:
         print(f"❌ Erreur lors de l'installation de {tool_name}")
-        print(result.stderr)
+        print(result["output"] or result["error"])
         return False
 
-def create_project(project_name, target_name, project_path):
-    """Cree un nouveau projet Rust embarque."""
-    print(f"📁 Creation du projet {project_name} pour {target_name}")
+def _cargo_bin_dir():
+    """Dossier ou `cargo install` depose les binaires."""
+    if os.environ.get("CARGO_INSTALL_ROOT"):
+        return Path(os.environ["CARGO_INSTALL_ROOT"]) / "bin"
+    return Path(os.environ.get("CARGO_HOME", Path.home() / ".cargo")) / "bin"
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _place_file(source, dest, mode=None):
+    """Place `source` en `dest` de maniere atomique (lien physique si possible, sinon copie)."""
+    dest = Path(dest)
+    tmp_dest = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        os.link(source, tmp_dest)
+    except OSError:
+        shutil.copyfile(source, tmp_dest)
+    if mode is not None:
+        os.chmod(tmp_dest, mode)
+    os.replace(tmp_dest, dest)
+
+def tool_cache_key(tool_name):
+    """Cle du cache d'un outil: hash de (outil, version, host, rustc), None sans rustc."""
+    rustc = get_toolchain_inventory()["rustc"]
+    if not rustc["installed"] or not rustc.get("host"):
+        return None
+    key = {
+        "tool": tool_name,
+        "version": TOOLS[tool_name]["version"],
+        "host": rustc["host"],
+        "rustc": rustc["version"],
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest(), key
+
+def publish_tool_to_cache(tool_name):
+    """Copie les binaires fraichement installes d'un outil dans le cache local."""
+    cache_key = tool_cache_key(tool_name)
+    if cache_key is None:
+        return False
+    key_hash, key = cache_key
     
-    full_path = Path(project_path) / project_name
+    binaries = {}
+    try:
+        objects_dir = TOOL_CACHE_DIR / "objects"
+        objects_dir.mkdir(parents=True, exist_ok=True)
+        for binary in TOOLS[tool_name]["binaries"]:
+            path = _cargo_bin_dir() / binary
+            if not path.is_file():
+                continue
+            digest = _file_sha256(path)
+            obj = objects_dir / digest
+            if not obj.exists():
+                _place_file(path, obj, 0o755)
+            binaries[binary] = digest
+        if not binaries:
+            return False
+        
+        entries_dir = TOOL_CACHE_DIR / "entries"
+        entries_dir.mkdir(parents=True, exist_ok=True)
+        tmp_entry = entries_dir / f".{key_hash}.{os.getpid()}.tmp"
+        with open(tmp_entry, "w") as f:
+            json.dump({**key, "binaries": binaries}, f, indent=2)
+        os.replace(tmp_entry, entries_dir / f"{key_hash}.json")
+    except OSError as e:
+        print(f"⚠️ Impossible d'ajouter {tool_name} au cache local: {e}")
+        return False
     
-    if full_path.exists():
-        print(f"❌ Le dossier {project_name} existe deja")
+    print(f"📦 {tool_name} ajoute au cache local ({len(binaries)} binaire(s))")
+    return True
+
+def restore_tool_from_cache(tool_name):
+    """Restaure un outil depuis le cache local, sans reseau ni compilation."""
+    cache_key = tool_cache_key(tool_name)
+    if cache_key is None:
         return False
+    key_hash, _ = cache_key
     
-    # Cree le projet Rust de base
-    subprocess.run(["cargo", "init", str(full_path), "--name", project_name], 
-                   cwd=project_path)
+    try:
+        with open(TOOL_CACHE_DIR / "entries" / f"{key_hash}.json", "r") as f:
+            entry = json.load(f)
+        binaries = dict(entry["binaries"])
+    except (OSError, ValueError, KeyError, AttributeError, TypeError):
+        return False
     
-    target_config = TARGETS[target_name]
+    # Une entree peut venir d'une archive importee: ni chemin dans le nom du
+    # binaire, ni objet qui ne soit pas un sha256
+    for binary, digest in binaries.items():
+        if (not isinstance(binary, str) or not isinstance(digest, str) or binary in ("", ".", "..")
+                or binary != Path(binary).name or not TOOL_DIGEST_PATTERN.fullmatch(digest)):
+            print(f"⚠️ Entree de cache invalide ignoree pour {tool_name}")
+            return False
     
-    # Cree le fichier Cargo.toml specifique a l'embarque
-    cargo_toml_content = f"""[package]
-name = "{project_name}"
-version = "0.1.0"
-edition = "2021"
+    objects = {binary: TOOL_CACHE_DIR / "objects" / digest for binary, digest in binaries.items()}
+    if not objects or not all(obj.is_file() for obj in objects.values()):
+        return False
+    
+    bin_dir = _cargo_bin_dir()
+    try:
+        bin_dir.mkdir(parents=True, exist_ok=True)
+        for binary, obj in objects.items():
+            _place_file(obj, bin_dir / binary, 0o755)
+    except OSError as e:
+        print(f"⚠️ Restauration de {tool_name} depuis le cache impossible: {e}")
+        return False
+    return True
 
-[[bin]]
-name = "{project_name}"
-test = false
-bench = false
+def export_tool_cache(archive):
+    """Exporte le cache local des outils dans une archive tar.gz."""
+    if not (TOOL_CACHE_DIR / "entries").is_dir():
+        print("❌ Le cache local des outils est vide", file=sys.stderr)
+        return False
+    with tarfile.open(archive, "w:gz") as tar:
+        tar.add(TOOL_CACHE_DIR, arcname="tools")
+    print(f"✅ Cache des outils exporte: {archive}")
+    return True
 
-[dependencies]
-cortex-m = "0.7"
-cortex-m-rt = "0.7"
-panic-halt = "0.2"
-"""
+def import_tool_cache(archive):
+    """Importe une archive creee par export_tool_cache dans le cache local."""
+    try:
+        tar = tarfile.open(archive, "r:*")
+    except (OSError, tarfile.TarError) as e:
+        print(f"❌ Archive illisible: {e}", file=sys.stderr)
+        return False
     
-    if target_name == "pico":
-        cargo_toml_content += """rp-pico = "0.8"
-embedded-hal = "0.2.5"
-
-[dependencies.rp2040-hal]
-version = "0.9"
-features = ["rt", "critical-section-impl"]
+    imported = 0
+    with tar:
+        for member in tar.getmembers():
+            parts = Path(member.name).parts
+            if (not member.isfile() or len(parts) != 3 or parts[0] != "tools"
+                    or parts[1] not in ("entries", "objects") or parts[2].startswith(".")):
+                continue
+            dest_dir = TOOL_CACHE_DIR / parts[1]
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            tmp_dest = dest_dir / f".{parts[2]}.{os.getpid()}.tmp"
+            with tar.extractfile(member) as src, open(tmp_dest, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            if parts[1] == "objects":
+                # Les objets sont adresses par contenu: on verifie avant d'accepter
+                if _file_sha256(tmp_dest) != parts[2]:
+                    os.unlink(tmp_dest)
+                    print(f"⚠️ Objet corrompu ignore: {parts[2]}")
+                    continue
+                os.chmod(tmp_dest, 0o755)
+            os.replace(tmp_dest, dest_dir / parts[2])
+            imported += 1
+    
+    print(f"✅ {imported} fichier(s) importe(s) dans le cache des outils")
+    return True
 
-# Outils pour la generation UF2
-[dependencies.rp2040-boot2]
-version = "0.3"
-"""
-    elif target_name == "esp32c3":
-        cargo_toml_content += """esp32c3-hal = "0.15"
-esp-backtrace = { version = "0.8", features = ["esp32c3", "exception-handler", "panic-handler", "println"] }
-esp-println = { version = "0.6", features = ["esp32c3"] }
-"""
+def run_job_graph(jobs):
+    """Execute un graphe de jobs en parallele en respectant les dependances.
     
-    with open(full_path / "Cargo.toml", "w") as f:
-        f.write(cargo_toml_content)
+    Chaque job est un dict {"name", "run", "deps"} :
+    - `run()` execute le job et retourne True/False ;
+    - `deps` liste les jobs qui doivent avoir reussi avant le lancement.
+    Le partage du CPU est l'affaire des jobs (jobserver de cargo).
+    Retourne {nom: {"ok": bool, "duration": secondes}}.
+    """
+    pending = {job["name"]: job for job in jobs}
+    results = {}
+    running = {}
     
-    # Cree le fichier .cargo/config.toml
-    cargo_config_dir = full_path / ".cargo"
-    cargo_config_dir.mkdir(exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max(1, len(jobs))) as pool:
+        while pending or running:
+            # Jobs dont une dependance a echoue: abandonnes
+            for name, job in list(pending.items()):
+                failed = [dep for dep in job.get("deps", []) if dep in results and not results[dep]["ok"]]
+                if failed:
+                    print(f"⏭️  {name} ignore ({failed[0]} a echoue)")
+                    results[name] = {"ok": False, "duration": 0.0, "skipped": True}
+                    del pending[name]
+            
+            ready = [job for job in pending.values()
+                     if all(results.get(dep, {}).get("ok") for dep in job.get("deps", []))]
+            for job in ready:
+                del pending[job["name"]]
+                print(f"▶️  {job['name']}")
+                future = pool.submit(job["run"])
+                running[future] = (job, time.monotonic())
+            
+            if not running:
+                if pending:
+                    # Plus rien ne peut progresser (dependance inconnue ou cycle)
+                    for name in list(pending):
+                        results[name] = {"ok": False, "duration": 0.0, "skipped": True}
+                        del pending[name]
+                break
+            
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, started = running.pop(future)
+                try:
+                    ok = bool(future.result())
+                except Exception as e:
+                    print(f"❌ {job['name']}: {e}", file=sys.stderr)
+                    ok = False
+                results[job["name"]] = {"ok": ok, "duration": time.monotonic() - started}
     
-    if target_name == "pico":
-        config_content = f"""[build]
-target = "{target_config['rust_target']}"
+    return {job["name"]: results[job["name"]] for job in jobs}
 
-[target.{target_config['rust_target']}]
-runner = "elf2uf2-rs -d"
-rustflags = [
-    "-C", "link-arg=--nmagic",
-    "-C", "link-arg=-Tlink.x",
-]
-"""
-    else:
-        config_content = f"""[build]
-target = "{target_config['rust_target']}"
+def print_job_summary(results, title):
+    """Affiche la duree et le resultat de chaque job."""
+    print()
+    print(f"⏱️  {title}")
+    width = max((len(name) for name in results), default=0)
+    for name, result in results.items():
+        if result.get("skipped"):
+            status, duration = "⏭️ ", "ignore"
+        else:
+            status = "✅" if result["ok"] else "❌"
+            duration = f"{result['duration']:.1f}s"
+        detail = f"  {result['detail']}" if result.get("detail") else ""
+        print(f"   {status} {name:<{width}}  {duration}{detail}")
 
-[target.{target_config['rust_target']}]
-runner = "probe-rs run --chip {target_config['chip']}"
-"""
+def plan_install_jobs(rust_targets=(), tool_names=(), llvm_tools=False, jobserver=None, budget=None):
+    """Construit le graphe d'installation (targets, llvm-tools, outils cargo).
     
-    with open(cargo_config_dir / "config.toml", "w") as f:
-        f.write(config_content)
+    Les appels rustup modifient la meme toolchain et sont donc chaines entre
+    eux, mais tournent en parallele des compilations. Les `cargo install`
+    partagent INSTALL_TARGET_DIR pour ne compiler qu'une fois les crates
+    communes; cargo verrouillant ce dossier, ils forment un seul job qui les
+    enchaine, chacun disposant de tout le `jobserver` de `budget` jetons.
+    """
+    jobs = []
+    previous_rustup = None
+    installed_targets = installed_rust_targets()
     
-    # Cree un main.rs de base
-    src_dir = full_path / "src"
-    main_rs_content = get_main_template(target_name)
+    def rustup_job(name, run):
+        nonlocal previous_rustup
+        jobs.append({"name": name, "run": run, "deps": [previous_rustup] if previous_rustup else []})
+        previous_rustup = name
     
-    with open(src_dir / "main.rs", "w") as f:
-        f.write(main_rs_content)
+    for target in rust_targets:
+        if target in installed_targets:
+            print(f"✅ Target {target} deja installee")
+            continue
+        rustup_job(f"target {target}", lambda target=target: install_rust_target(target))
+    
+    if llvm_tools:
+        rustup_job("llvm-tools-preview", install_llvm_tools)
+    
+    missing_tools = []
+    for tool_name in tool_names:
+        if check_tool_installed(tool_name):
+            print(f"✅ {tool_name} est deja installe")
+            continue
+        missing_tools.append(tool_name)
+    
+    def install_tools():
+        # Un echec n'empeche pas d'installer les outils suivants
+        results = [install_tool(tool_name, jobs=budget, target_dir=INSTALL_TARGET_DIR, jobserver=jobserver)
+                   for tool_name in missing_tools]
+        return all(results)
+    
+    if missing_tools:
+        jobs.append({"name": f"cargo install {' '.join(missing_tools)}", "run": install_tools})
+    
+    return jobs
+
+def install_all(rust_targets=(), tool_names=(), llvm_tools=False, cpu_budget=None):
+    """Installe targets et outils via le graphe de jobs et affiche les durees."""
+    budget = max(1, cpu_budget or os.cpu_count() or 1)
+    jobserver = create_jobserver(budget)
+    try:
+        jobs = plan_install_jobs(rust_targets, tool_names, llvm_tools, jobserver, budget)
+        if not jobs:
+            print("✅ Rien a installer")
+            return True
+        results = run_job_graph(jobs)
+    finally:
+        os.close(jobserver[0])
+        os.close(jobserver[1])
+    print_job_summary(results, "Recapitulatif des installations")
+    return all(result["ok"] for result in results.values())
+
+def _build_manifest_path(project_path):
+    return Path(project_path) / "target" / "rust-embedded" / "build-fingerprints.json"
+
+def _manifest_view(manifest):
+    """Copie de travail d'un manifeste du cache memoire.
+    
+    Les tables `files` et `dep_info` ne sont jamais modifiees en place
+    (compute_build_fingerprint les remplace): seul `builds` est copie.
+    """
+    return {**manifest, "builds": dict(manifest["builds"])}
+
+def load_build_manifest(project_path):
+    """Charge le manifeste des empreintes de compilation du projet."""
+    path = str(_build_manifest_path(project_path))
+    try:
+        stat = os.stat(path)
+        cached = _build_manifest_cache.get(path)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return _manifest_view(cached[1])
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == BUILD_MANIFEST_VERSION and isinstance(manifest.get("builds"), dict):
+            _build_manifest_cache[path] = ((stat.st_mtime_ns, stat.st_size), manifest)
+            return _manifest_view(manifest)
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {"version": BUILD_MANIFEST_VERSION, "files": {}, "dep_info": {}, "builds": {}}
+
+def save_build_manifest(project_path, manifest):
+    path = _build_manifest_path(project_path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+        # Le prochain chargement n'a pas a relire le JSON qui vient d'etre ecrit
+        stat = os.stat(path)
+        _build_manifest_cache[str(path)] = ((stat.st_mtime_ns, stat.st_size), _manifest_view(manifest))
+    except OSError:
+        pass
+
+def _fingerprint_inputs(project_path):
+    """Liste (relative, triee) des fichiers qui determinent le resultat de la compilation."""
+    root = Path(project_path)
+    files = [name for name in BUILD_FINGERPRINT_FILES if (root / name).is_file()]
+    for dirpath, dirnames, filenames in os.walk(root / "src"):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            files.append(os.path.relpath(os.path.join(dirpath, filename), root))
+    return sorted(files)
+
+def _path_dependency_dirs(package_dir, found):
+    """Ajoute a `found` les dossiers des dependances `path = ...` d'un paquet, recursivement."""
+    manifest = _read_toml(Path(package_dir) / "Cargo.toml") or {}
+    tables = [manifest.get(kind, {}) for kind in ("dependencies", "build-dependencies")]
+    tables.append(manifest.get("workspace", {}).get("dependencies", {}))
+    for platform in manifest.get("target", {}).values():
+        if isinstance(platform, dict):
+            tables += [platform.get(kind, {}) for kind in ("dependencies", "build-dependencies")]
+    for table in tables:
+        if not isinstance(table, dict):
+            continue
+        for spec in table.values():
+            if isinstance(spec, dict) and isinstance(spec.get("path"), str):
+                directory = (Path(package_dir) / spec["path"]).resolve()
+                if directory not in found and (directory / "Cargo.toml").is_file():
+                    found.add(directory)
+                    _path_dependency_dirs(directory, found)
+    return found
+
+def _parse_dep_info(path, elf_dep_info, root):
+    """Contenu utile d'un fichier dep-info: ses dependances (`<binaire>.d` de cargo) ou ses lignes `# env-dep:`."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        if elf_dep_info:
+            line = f.readline()
+            deps = line.rstrip("\n").split(": ", 1)[1] if ": " in line else ""
+            return [os.path.join(root, dep.replace("\\ ", " ")) for dep in re.split(r"(?<!\\) ", deps) if dep]
+        return sorted({line[len("# env-dep:"):].split("=", 1)[0].strip()
+                       for line in f if line.startswith("# env-dep:")})
+
+def _dep_info_inputs(project_path, rust_target, cache):
+    """Fichiers lus par la derniere compilation release et variables suivies par rustc.
+    
+    Les fichiers viennent du dep-info de cargo (`<binaire>.d`: sources de
+    toutes les crates, `include_bytes!`...), les variables des lignes
+    `# env-dep:` des dep-info de rustc (`env!`, `option_env!`, y compris
+    celles definies par un build script). Vide avant la premiere compilation.
+    
+    `cache` ({chemin du .d: [date, taille, contenu]}, voir le manifeste)
+    evite de relire les dep-info inchanges. Retourne (fichiers, variables,
+    cache a jour).
+    """
+    elf_file = release_elf_path(project_path, rust_target)
+    files, variables, current = [], set(), {}
+    if not elf_file:
+        return files, variables, current
+    root = load_project_index(project_path)["workspace_root"]
+    candidates = [(f"{elf_file}.d", True)]
+    try:
+        with os.scandir(os.path.join(os.path.dirname(elf_file), "deps")) as entries:
+            candidates += [(entry.path, False) for entry in entries if entry.name.endswith(".d")]
+    except OSError:
+        pass
+    for path, elf_dep_info in candidates:
+        try:
+            stat = os.stat(path)
+            entry = cache.get(path)
+            if not (entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size):
+                entry = [stat.st_mtime_ns, stat.st_size, _parse_dep_info(path, elf_dep_info, root)]
+        except OSError:
+            continue
+        current[path] = entry
+        if elf_dep_info:
+            files = entry[2]
+        else:
+            variables.update(entry[2])
+    return files, variables, current
+
+def _build_inputs(project_path, rust_target, manifest):
+    """Fichiers et variables d'environnement dont depend le binaire: (chemins absolus tries, noms tries).
+    
+    Couvre les paquets du workspace et les dependances locales (Cargo.toml,
+    build.rs, memory.x, src/**), le Cargo.lock et le Cargo.toml de la racine,
+    la configuration cargo de chaque dossier parent, et tout ce que liste le
+    dep-info de la compilation precedente.
+    """
+    index = load_project_index(project_path)
+    root = Path(index["workspace_root"])
+    project = Path(project_path).resolve()
+    packages = {project, root, *(Path(package["dir"]) for package in index["packages"].values())}
+    for package_dir in list(packages):
+        _path_dependency_dirs(package_dir, packages)
+    
+    files = {os.path.join(root, "Cargo.toml"), os.path.join(root, "Cargo.lock")}
+    for package_dir in packages:
+        files.update(os.path.join(package_dir, relpath) for relpath in _fingerprint_inputs(package_dir))
+    cargo_home = os.environ.get("CARGO_HOME") or os.path.join(Path.home(), ".cargo")
+    for directory in [project, *project.parents]:
+        files.update(os.path.join(directory, name) for name in BUILD_CONFIG_FILES)
+    files.update(os.path.join(cargo_home, name) for name in ("config.toml", "config"))
+    
+    dep_files, variables, manifest["dep_info"] = _dep_info_inputs(project_path, rust_target,
+                                                                  manifest.get("dep_info", {}))
+    files.update(dep_files)
+    variables.update(BUILD_FINGERPRINT_ENV)
+    variables.update(name for name in os.environ if name.startswith(BUILD_FINGERPRINT_ENV_PREFIXES))
+    return sorted(files), sorted(variables)
+
+def compute_build_fingerprint(project_path, rust_target, manifest):
+    """Calcule l'empreinte des sources du projet pour une target.
+    
+    Le hash de chaque fichier est memorise dans `manifest["files"]` avec sa
+    date et sa taille: un fichier inchange n'est pas relu. Retourne le couple
+    (empreinte, True si des hash ont ete recalcules).
+    """
+    known = manifest["files"]
+    current = {}
+    updated = False
+    digest = hashlib.sha256()
+    
+    dep_info = manifest.get("dep_info")
+    files, variables = _build_inputs(project_path, rust_target, manifest)
+    if manifest["dep_info"] != dep_info:
+        updated = True
+    lines = []
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entry = known.get(path)
+        if not (entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size):
+            try:
+                entry = [stat.st_mtime_ns, stat.st_size, _file_sha256(path)]
+            except OSError:
+                continue
+            updated = True
+        current[path] = entry
+        lines.append(f"{path}\0{entry[2]}\n")
+    digest.update("".join(lines).encode())
+    
+    if current.keys() != known.keys():
+        updated = True
+    manifest["files"] = current
+    
+    # Ce qui change le binaire sans toucher aux sources
+    rustc = get_toolchain_inventory()["rustc"].get("version") or ""
+    digest.update(f"{rust_target}\n{rustc}\n".encode())
+    for name in variables:
+        digest.update(f"{name}={os.environ.get(name)}\n".encode())
+    return digest.hexdigest(), updated
+
+@traced
+def check_build_fingerprint(project_path, rust_target):
+    """Verifie si le dernier ELF compile correspond encore aux sources.
+    
+    Retourne (chemin de l'ELF ou None, empreinte actuelle, manifeste).
+    """
+    manifest = load_build_manifest(project_path)
+    fingerprint, updated = compute_build_fingerprint(project_path, rust_target, manifest)
+    if updated:
+        save_build_manifest(project_path, manifest)
+    
+    build = manifest["builds"].get(rust_target)
+    if not build or build.get("fingerprint") != fingerprint:
+        return None, fingerprint, manifest
+    try:
+        stat = os.stat(build["elf"])
+    except OSError:
+        return None, fingerprint, manifest
+    if [stat.st_mtime_ns, stat.st_size] != build.get("elf_stat"):
+        return None, fingerprint, manifest
+    return build["elf"], fingerprint, manifest
+
+def record_build_fingerprint(project_path, rust_target, fingerprint, manifest, elf_file):
+    """Associe l'empreinte des sources a l'ELF qui vient d'etre produit."""
+    if not elf_file:
+        return False
+    try:
+        stat = os.stat(elf_file)
+    except OSError:
+        return False
+    # Relu depuis le disque: une autre target a pu etre enregistree entre-temps
+    current = load_build_manifest(project_path)
+    current["files"] = manifest["files"]
+    current["dep_info"] = manifest.get("dep_info", {})
+    current["builds"][rust_target] = {
+        "fingerprint": fingerprint,
+        "elf": os.path.abspath(elf_file),
+        "elf_stat": [stat.st_mtime_ns, stat.st_size],
+    }
+    save_build_manifest(project_path, current)
+    return True
+
+def release_elf_path(project_path, rust_target):
+    """Chemin de l'ELF produit par `cargo build --release` (sans verifier qu'il existe).
+    
+    None si le projet n'a pas un binaire unique (racine d'un workspace).
+    """
+    binary = cargo_package_name(project_path)
+    if binary is None:
+        return None
+    return str(Path(project_target_dir(project_path)) / rust_target / "release" / binary)
+
+def _rustc_cache_max_size():
+    """Taille maximale du cache rustc (RUST_EMBEDDED_RUSTC_CACHE_SIZE, ex: 8192M)."""
+    try:
+        return _linker_expr(os.environ["RUST_EMBEDDED_RUSTC_CACHE_SIZE"])
+    except (KeyError, ValueError):
+        return RUSTC_CACHE_MAX_SIZE
+
+class _RustcCacheLock:
+    """Verrou inter-processus du cache rustc (les rustc d'un build tournent en parallele)."""
+
+    def __enter__(self):
+        RUSTC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self._file = open(RUSTC_CACHE_DIR / "lock", "a")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+def load_rustc_cache_stats():
+    """Compteurs du cache rustc: hits, misses, uncacheable, evicted, size (octets stockes)."""
+    try:
+        with open(RUSTC_CACHE_DIR / "stats.json", "r") as f:
+            stats = json.load(f)
+    except (OSError, ValueError):
+        stats = None
+    if not isinstance(stats, dict) or stats.get("version") != RUSTC_CACHE_VERSION:
+        stats = {"version": RUSTC_CACHE_VERSION}
+    for counter in ("hits", "misses", "uncacheable", "evicted", "size"):
+        stats.setdefault(counter, 0)
+    return stats
+
+def _update_rustc_cache_stats(counter, stored=0):
+    with _RustcCacheLock():
+        stats = load_rustc_cache_stats()
+        stats[counter] += 1
+        stats["size"] += stored
+        if stats["size"] > _rustc_cache_max_size():
+            evict_rustc_cache(stats)
+        path = RUSTC_CACHE_DIR / "stats.json"
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(stats, f)
+        os.replace(tmp_path, path)
+
+def evict_rustc_cache(stats):
+    """Supprime les entrees les moins recemment utilisees jusqu'a repasser sous la limite.
+    
+    La date d'une entree est celle de sa derniere utilisation; un objet
+    n'est supprime que lorsque plus aucune entree ne le reference.
+    """
+    entries = []
+    references = collections.Counter()
+    for path in (RUSTC_CACHE_DIR / "entries").glob("*.json"):
+        try:
+            with open(path, "r") as f:
+                blobs = list(json.load(f)["files"].values())
+            entries.append((path.stat().st_mtime, path, blobs))
+        except (OSError, ValueError, KeyError):
+            continue
+        references.update(blobs)
+    sizes = {}
+    for path in (RUSTC_CACHE_DIR / "objects").glob("*/*"):
+        try:
+            sizes[path.name] = path.stat().st_size
+        except OSError:
+            continue
+    
+    def remove_blob(blob):
+        try:
+            (RUSTC_CACHE_DIR / "objects" / blob[:2] / blob).unlink()
+        except OSError:
+            pass
+        return sizes.pop(blob, 0)
+    
+    for blob in [blob for blob in sizes if not references[blob]]:
+        remove_blob(blob)
+    total = sum(sizes.values())
+    target = _rustc_cache_max_size() * RUSTC_CACHE_EVICT_RATIO
+    for _, path, blobs in sorted(entries, key=lambda entry: entry[0]):
+        if total <= target:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        stats["evicted"] += 1
+        for blob in blobs:
+            references[blob] -= 1
+            if not references[blob]:
+                total -= remove_blob(blob)
+    stats["size"] = total
+
+def _rustc_cache_plan(args):
+    """Analyse une ligne de commande rustc; retourne ce qu'il faut mettre en cache, ou None.
+    
+    Seules les bibliotheques (lib, rlib) compilees par cargo dans un dossier
+    `--out-dir`, sans compilation incrementale, sont mises en cache: c'est le
+    cas des dependances (HAL, PAC, cortex-m...), pas des binaires du projet.
+    """
+    options = {"--crate-name": None, "--out-dir": None, "--crate-type": [], "--emit": [], "extra": "",
+               "externs": [], "sources": []}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg.startswith("@") or arg in ("-", "-o") or arg.startswith("--print"):
+            return None
+        flag, value = arg, None
+        if arg.startswith("--") and "=" in arg:
+            flag, value = arg.split("=", 1)
+        elif arg in RUSTC_VALUE_OPTIONS:
+            if i + 1 >= len(args):
+                return None
+            value = args[i + 1]
+            i += 1
+        elif arg[:2] in ("-C", "-L") and len(arg) > 2:
+            flag, value = arg[:2], arg[2:]
+        elif not arg.startswith("-"):
+            options["sources"].append(arg)
+        i += 1
+        
+        if flag in ("--crate-name", "--out-dir"):
+            options[flag] = value
+        elif flag in ("--crate-type", "--emit"):
+            options[flag] += value.split(",")
+        elif flag in ("-C", "--codegen"):
+            if value.startswith("incremental"):
+                return None
+            if value.startswith("extra-filename="):
+                options["extra"] = value.split("=", 1)[1]
+        elif flag == "--extern" and "=" in value:
+            options["externs"].append(value.split("=", 1)[1])
+    
+    crate_types = options["--crate-type"] or ["bin"]
+    emit = options["--emit"] or ["link"]
+    if (not options["--crate-name"] or not options["--out-dir"] or len(options["sources"]) != 1
+            or any(kind not in ("lib", "rlib") for kind in crate_types)
+            or any(kind not in ("dep-info", "metadata", "link") or "=" in kind for kind in emit)):
+        return None
+    
+    name = f"{options['--crate-name']}{options['extra']}"
+    out_dir = Path(options["--out-dir"])
+    # Dossier target du projet (out-dir = target/[<triple>/]<profil>/deps): normalise dans la cle
+    target_dir = out_dir.parent.parent if out_dir.name == "deps" else out_dir.parent
+    if "--target" in args or any(arg.startswith("--target=") for arg in args):
+        target_dir = target_dir.parent
+    return {
+        "out_dir": out_dir,
+        "target_dir": str(target_dir),
+        "files": [f"lib{name}.rmeta" if kind == "metadata" else f"lib{name}.rlib" for kind in emit if kind != "dep-info"],
+        "texts": [f"{name}.d"] if "dep-info" in emit else [],
+        "externs": options["externs"],
+        "source": options["sources"][0],
+    }
+
+def _rustc_dep_info(rustc, args, plan, env):
+    """Fichiers et variables d'environnement lus par une compilation: ([chemins], ["NOM=valeur"]).
+    
+    rustc est relance avec `--emit=dep-info` seul (analyse et expansion des
+    macros, sans generation de code): la liste couvre les modules, les
+    `include!`/`include_bytes!` (y compris hors du paquet ou dans OUT_DIR)
+    et les variables lues par `env!`/`option_env!`, dont celles definies
+    par un build script. Leve OSError si rustc echoue.
+    """
+    dep_file = plan["out_dir"] / f".{plan['files'][0] if plan['files'] else 'rustc'}.{os.getpid()}.dep-info"
+    command = [rustc]
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in ("--emit", "-o"):
+            skip = True
+        elif not arg.startswith("--emit="):
+            command.append(arg)
+    command.append(f"--emit=dep-info={dep_file}")
+    try:
+        result = subprocess.run(command, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, close_fds=False)
+        if result.returncode != 0:
+            raise OSError(f"rustc --emit=dep-info a echoue (code {result.returncode})")
+        files, variables = [], []
+        with open(dep_file, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.startswith("# env-dep:"):
+                    variables.append(line[len("# env-dep:"):])
+                elif line.endswith(":") and not line.startswith("#"):
+                    files.append(line[:-1].replace("\\ ", " "))
+    finally:
+        try:
+            os.unlink(dep_file)
+        except OSError:
+            pass
+    return files, variables
+
+def _rustc_native_libraries(args):
+    """Bibliotheques natives (`-l`) d'une invocation: [(nom, fichier trouve dans les dossiers -L ou None)]."""
+    search = []
+    names = []
+    i = 0
+    while i < len(args):
+        arg, value = args[i], None
+        if arg in ("-L", "-l") and i + 1 < len(args):
+            value = args[i + 1]
+            i += 1
+        elif arg[:2] in ("-L", "-l") and len(arg) > 2:
+            arg, value = arg[:2], arg[2:]
+        i += 1
+        if value is None:
+            continue
+        if arg == "-L":
+            kind, _, directory = value.rpartition("=")
+            if kind in ("", "native", "all"):
+                search.append(directory)
+        elif arg == "-l":
+            # `static:+bundle=nom:renomme`: seul le nom cherche compte
+            names.append(value.rpartition("=")[2].split(":")[0])
+    libraries = []
+    for name in names:
+        found = next((str(Path(directory) / pattern.format(name)) for directory in search
+                      for pattern in RUSTC_NATIVE_LIBRARY_NAMES
+                      if os.path.isfile(Path(directory) / pattern.format(name))), None)
+        libraries.append((name, found))
+    return libraries
+
+def rustc_cache_key(rustc, args, plan, env):
+    """Empreinte d'une invocation: version de rustc, arguments, variables CARGO_*, entrees du dep-info et dependances.
+    
+    Seuls les fichiers que rustc lit vraiment sont hashes (dep-info), pas
+    tout le dossier du paquet.
+    """
+    target_dir = plan["target_dir"]
+    normalize = lambda text: text.replace(target_dir, RUSTC_CACHE_TARGET_TOKEN)
+    digest = hashlib.sha256(f"v{RUSTC_CACHE_VERSION}\0".encode())
+    version = env.get("RUST_EMBEDDED_RUSTC_VERSION")
+    if not version:
+        result = capture_command([rustc, "-vV"], stderr=False)
+        version = hashlib.sha256(result["output"].encode()).hexdigest() if result["ok"] else rustc
+    digest.update(f"{version}\0".encode())
+    for arg in args:
+        digest.update(f"arg\0{normalize(arg)}\0".encode())
+    for name in sorted(env):
+        if (name.startswith("CARGO_") and name not in RUSTC_CACHE_IGNORED_ENV) or name == "RUSTC_BOOTSTRAP":
+            digest.update(f"env\0{name}={normalize(env[name])}\0".encode())
+    # Le contenu (et non le chemin) des dependances, des fichiers lus et des bibliotheques natives
+    for extern in plan["externs"]:
+        digest.update(f"extern\0{_file_sha256(extern)}\0".encode())
+    files, variables = _rustc_dep_info(rustc, args, plan, env)
+    for path in sorted(set(files)):
+        digest.update(f"file\0{normalize(path)}\0{_file_sha256(path)}\0".encode())
+    for variable in sorted(set(variables)):
+        digest.update(f"env-dep\0{normalize(variable)}\0".encode())
+    for name, path in _rustc_native_libraries(args):
+        digest.update(f"native\0{name}\0{_file_sha256(path) if path else ''}\0".encode())
+    return digest.hexdigest()
+
+def _replay_rustc_entry(entry, plan):
+    """Restaure les sorties d'une entree du cache; False si un objet a disparu (eviction)."""
+    target_dir = plan["target_dir"]
+    for name, blob in entry["files"].items():
+        dest = plan["out_dir"] / name
+        tmp_dest = dest.with_name(f".{name}.{os.getpid()}.tmp")
+        try:
+            # Copie (et non lien physique): rustc peut reecrire ses sorties sur place
+            shutil.copyfile(RUSTC_CACHE_DIR / "objects" / blob[:2] / blob, tmp_dest)
+            os.replace(tmp_dest, dest)
+        except OSError:
+            return False
+    for name, text in entry["texts"].items():
+        with open(plan["out_dir"] / name, "w") as f:
+            f.write(text.replace(RUSTC_CACHE_TARGET_TOKEN, target_dir))
+    # Messages de rustc (diagnostics JSON, notifications d'artefacts) rejoues pour cargo
+    sys.stdout.write(entry["stdout"].replace(RUSTC_CACHE_TARGET_TOKEN, target_dir))
+    sys.stderr.write(entry["stderr"].replace(RUSTC_CACHE_TARGET_TOKEN, target_dir))
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return True
+
+def _store_rustc_entry(key, plan, stdout, stderr):
+    """Ajoute les sorties d'une compilation au cache; retourne le nombre d'octets nouvellement stockes."""
+    target_dir = plan["target_dir"]
+    entry = {"files": {}, "texts": {},
+             "stdout": stdout.decode("utf-8", errors="replace").replace(target_dir, RUSTC_CACHE_TARGET_TOKEN),
+             "stderr": stderr.decode("utf-8", errors="replace").replace(target_dir, RUSTC_CACHE_TARGET_TOKEN)}
+    stored = 0
+    for name in plan["files"]:
+        source = plan["out_dir"] / name
+        blob = _file_sha256(source)
+        dest = RUSTC_CACHE_DIR / "objects" / blob[:2] / blob
+        if not dest.exists():
+            # Stockage par contenu: deux projets produisant le meme rlib le partagent
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp_dest = dest.with_name(f".{blob}.{os.getpid()}.tmp")
+            shutil.copyfile(source, tmp_dest)
+            os.replace(tmp_dest, dest)
+            stored += dest.stat().st_size
+        entry["files"][name] = blob
+    for name in plan["texts"]:
+        with open(plan["out_dir"] / name, "r", errors="replace") as f:
+            entry["texts"][name] = f.read().replace(target_dir, RUSTC_CACHE_TARGET_TOKEN)
+    
+    path = RUSTC_CACHE_DIR / "entries" / f"{key}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+    return stored
+
+async def _tee_command(command):
+    """Lance une commande en relayant stdout et stderr au fil de l'eau; retourne (code, stdout, stderr)."""
+    # close_fds=False: rustc herite du jobserver de cargo
+    process = await asyncio.create_subprocess_exec(*command, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE, close_fds=False)
+    
+    async def pump(stream, target, chunks):
+        while True:
+            data = await stream.read(PROCESS_READ_SIZE)
+            if not data:
+                return
+            chunks.append(data)
+            target.write(data)
+            target.flush()
+    
+    stdout, stderr = [], []
+    await asyncio.gather(pump(process.stdout, sys.stdout.buffer, stdout),
+                         pump(process.stderr, sys.stderr.buffer, stderr))
+    return await process.wait(), b"".join(stdout), b"".join(stderr)
+
+def rustc_wrapper(argv):
+    """Mode RUSTC_WRAPPER: `main.py rustc-wrapper <rustc> <arguments>`; retourne le code de sortie.
+    
+    Une invocation deja vue (meme empreinte) est rejouee depuis le cache sans
+    lancer rustc; sinon rustc est execute puis ses sorties sont stockees.
+    """
+    if not argv:
+        print("❌ Usage: rustc-wrapper <rustc> <arguments>", file=sys.stderr)
+        return 2
+    plan = _rustc_cache_plan(argv[1:])
+    if plan is None:
+        _update_rustc_cache_stats("uncacheable")
+        if os.name == "posix":
+            os.execvp(argv[0], argv)
+        return asyncio.run(_tee_command(argv))[0]
+    
+    try:
+        key = rustc_cache_key(argv[0], argv[1:], plan, os.environ)
+    except OSError:
+        _update_rustc_cache_stats("uncacheable")
+        return asyncio.run(_tee_command(argv))[0]
+    entry_path = RUSTC_CACHE_DIR / "entries" / f"{key}.json"
+    try:
+        with open(entry_path, "r") as f:
+            entry = json.load(f)
+        if _replay_rustc_entry(entry, plan):
+            os.utime(entry_path)
+            _update_rustc_cache_stats("hits")
+            return 0
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    returncode, stdout, stderr = asyncio.run(_tee_command(argv))
+    if returncode == 0:
+        try:
+            stored = _store_rustc_entry(key, plan, stdout, stderr)
+        except OSError:
+            stored = 0
+        _update_rustc_cache_stats("misses", stored)
+    return returncode
+
+def rustc_wrapper_path():
+    """Script RUSTC_WRAPPER (cargo attend un executable) qui relance main.py en mode rustc-wrapper."""
+    main_script = os.path.abspath(__file__)
+    if os.name == "nt":
+        path = RUSTC_CACHE_DIR / "rustc-wrapper.cmd"
+        content = f'@"{sys.executable}" "{main_script}" rustc-wrapper %*\r\n'
+    else:
+        path = RUSTC_CACHE_DIR / "rustc-wrapper"
+        content = f'#!/bin/sh\nexec "{sys.executable}" "{main_script}" rustc-wrapper "$@"\n'
+    try:
+        if path.read_text() == content:
+            return str(path)
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(content)
+    tmp_path.chmod(0o755)
+    os.replace(tmp_path, path)
+    return str(path)
+
+def rustc_cache_env(project_path, env=None):
+    """Environnement de `cargo build` avec le cache rustc active.
+    
+    Desactive par RUST_EMBEDDED_RUSTC_CACHE=0 ou si l'utilisateur a deja son
+    propre RUSTC_WRAPPER (sccache...). La version de rustc du projet (qui
+    peut dependre de rust-toolchain.toml) est calculee une fois ici plutot
+    que dans chaque invocation du wrapper.
+    """
+    env = dict(env if env is not None else os.environ)
+    if env.get("RUST_EMBEDDED_RUSTC_CACHE") == "0" or env.get("RUSTC_WRAPPER"):
+        return env
+    try:
+        wrapper = rustc_wrapper_path()
+    except OSError as e:
+        print(f"⚠️ Cache rustc desactive: {e}")
+        return env
+    result = capture_command(["rustc", "-vV"], cwd=project_path, stderr=False)
+    if result["ok"]:
+        env["RUST_EMBEDDED_RUSTC_VERSION"] = hashlib.sha256(result["output"].encode()).hexdigest()
+    env["RUSTC_WRAPPER"] = wrapper
+    return env
+
+def print_rustc_cache_delta(before):
+    """Resume l'utilisation du cache rustc depuis `before` (compteurs lus avant le build)."""
+    after = load_rustc_cache_stats()
+    hits = after["hits"] - before["hits"]
+    misses = after["misses"] - before["misses"]
+    if hits or misses:
+        print(f"🗄️  Cache rustc: {hits} crate(s) reutilisee(s), {misses} compilee(s) et mise(s) en cache")
+
+def print_rustc_cache_stats(as_json=False):
+    """Affiche les statistiques du cache rustc (action cache-stats)."""
+    stats = load_rustc_cache_stats()
+    stats["entries"] = len(list((RUSTC_CACHE_DIR / "entries").glob("*.json")))
+    stats["max_size"] = _rustc_cache_max_size()
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else None
+    if as_json:
+        print(json.dumps(stats, indent=2))
+        return True
+    print(f"🗄️  Cache rustc: {RUSTC_CACHE_DIR}")
+    print(f"   Entrees      : {stats['entries']} ({_format_size(stats['size'])} / {_format_size(stats['max_size'])})")
+    print(f"   Reutilisees  : {stats['hits']}")
+    print(f"   Compilees    : {stats['misses']}")
+    print(f"   Non cachables: {stats['uncacheable']}")
+    print(f"   Evincees     : {stats['evicted']}")
+    if stats["hit_rate"] is not None:
+        print(f"   Taux de hits : {stats['hit_rate']:.0%}")
+    return True
+
+def _timings_unit_key(unit):
+    """Nom stable d'une unite de compilation cargo: crate et cible (bin, build script...)."""
+    kind = unit.get("target", "").strip()
+    return f"{unit['name']} ({kind})" if kind else unit["name"]
+
+def parse_cargo_timings(report_file):
+    """Lit les unites d'un rapport `cargo build --timings` (tableau UNIT_DATA du HTML).
+    
+    Retourne {cle: {version, start, duration, rmeta, unlocks}}: `rmeta` est la
+    fin du frontend (metadonnees pretes), le reste de `duration` est la
+    generation de code et l'edition de liens.
+    """
+    with open(report_file, "r", encoding="utf-8") as f:
+        match = re.search(r"const UNIT_DATA = (\[.*?\n\]);", f.read(), re.S)
+    if not match:
+        raise ValueError(f"Donnees de compilation absentes du rapport: {report_file}")
+    
+    raw = json.loads(match.group(1))
+    keys = {unit["i"]: _timings_unit_key(unit) for unit in raw}
+    units = {}
+    for unit in raw:
+        units[keys[unit["i"]]] = {
+            "version": unit["version"],
+            "start": unit["start"],
+            "duration": unit["duration"],
+            "rmeta": unit["rmeta_time"],
+            # Unites debloquees a la fin de celle-ci (ou des que ses metadonnees sont pretes)
+            "unlocks": [keys[i] for i in unit["unlocked_units"] if i in keys],
+            "unlocks_rmeta": [keys[i] for i in unit["unlocked_rmeta_units"] if i in keys],
+        }
+    return units
+
+def timings_critical_path(units):
+    """Chaine d'unites qui a fixe la duree de la compilation, de la premiere a la derniere."""
+    if not units:
+        return []
+    unlocked_by = {}
+    for key, unit in units.items():
+        for other in unit["unlocks"]:
+            unlocked_by.setdefault(other, []).append((unit["start"] + unit["duration"], key))
+        for other in unit["unlocks_rmeta"]:
+            unlocked_by.setdefault(other, []).append((unit["start"] + (unit["rmeta"] or unit["duration"]), key))
+    
+    # On remonte depuis l'unite terminee en dernier, en suivant a chaque fois
+    # la dependance qui l'a debloquee le plus tard
+    key = max(units, key=lambda k: units[k]["start"] + units[k]["duration"])
+    path = [key]
+    while unlocked_by.get(key):
+        _, key = max(unlocked_by[key])
+        if key in path:
+            break
+        path.append(key)
+    return path[::-1]
+
+def _cargo_json_filter(state):
+    """Filtre de sortie pour `--message-format=json`: affiche les diagnostics, compte les artefacts."""
+    def line_filter(line):
+        if not line.startswith("{"):
+            if "Timing report saved to " in line:
+                state["report"] = line.split("Timing report saved to ", 1)[1].strip()
+            return line
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return line
+        reason = message.get("reason")
+        if reason == "compiler-artifact":
+            state["fresh" if message.get("fresh") else "built"] += 1
+        elif reason == "compiler-message":
+            return (message.get("message", {}).get("rendered") or "").rstrip() or None
+        return None
+    return line_filter
+
+def git_revision(project_path):
+    """Revision git du projet (`-dirty` si des fichiers suivis sont modifies), None hors d'un depot."""
+    head, status = run_steps([
+        _command_step(["git", "rev-parse", "--short=12", "HEAD"], project_path, echo=False, stderr=False),
+        _command_step(["git", "status", "--porcelain", "--untracked-files=no"], project_path,
+                      echo=False, stderr=False),
+    ])
+    if not head["ok"]:
+        return None
+    revision = head["output"].strip()
+    return f"{revision}-dirty" if status["ok"] and status["output"].strip() else revision
+
+def _build_history_path(project_path):
+    """Historique des temps de compilation d'un projet (hors de target/, survit a cargo clean)."""
+    key = hashlib.sha256(os.path.abspath(project_path).encode()).hexdigest()[:16]
+    return BUILD_HISTORY_DIR / f"{Path(project_path).resolve().name}-{key}.jsonl"
+
+def load_build_history(project_path, rust_target=None):
+    """Enregistrements de l'historique (du plus ancien au plus recent), filtres par target."""
+    records = []
+    try:
+        with open(_build_history_path(project_path), "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("v") != BUILD_HISTORY_VERSION:
+                    continue
+                if rust_target is None or record.get("target") == rust_target:
+                    records.append(record)
+    except OSError:
+        pass
+    return records
+
+def record_build_timings(project_path, rust_target, units, wall, state):
+    """Ajoute un enregistrement compact a l'historique (cle: revision git et target)."""
+    record = {
+        "v": BUILD_HISTORY_VERSION,
+        "time": int(time.time()),
+        "rev": git_revision(project_path),
+        "target": rust_target,
+        "wall": round(wall, 2),
+        "built": state["built"],
+        "fresh": state["fresh"],
+        "units": {key: [unit["version"], round(unit["start"], 2), round(unit["duration"], 2),
+                        None if unit["rmeta"] is None else round(unit["rmeta"], 2)]
+                  for key, unit in units.items()},
+        "critical": timings_critical_path(units),
+    }
+    path = _build_history_path(project_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    
+    # L'historique reste borne: on ne garde que les derniers enregistrements
+    records = load_build_history(project_path)
+    if len(records) > BUILD_HISTORY_MAX:
+        tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_file, "w") as f:
+            for old in records[-BUILD_HISTORY_MAX:]:
+                f.write(json.dumps(old, separators=(",", ":")) + "\n")
+        os.replace(tmp_file, path)
+    return record
+
+@traced
+def profile_build(project_path, rust_target):
+    """Compile avec `--timings` et enregistre la duree de chaque crate; retourne True si reussi."""
+    state = {"built": 0, "fresh": 0, "report": None}
+    command = ["cargo", "build", "--release", "--target", rust_target,
+               "--timings", "--message-format=json-render-diagnostics"]
+    # Sans le cache rustc: une crate rejouee depuis le cache durerait ~0 s et
+    # l'historique mesurerait l'etat du cache, pas le cout de compilation
+    result = run_command(command, project_path, line_filter=_cargo_json_filter(state))
+    if not result["ok"]:
+        return False
+    
+    report_file = state["report"] or str(Path(project_target_dir(project_path)) / "cargo-timings" / "cargo-timing.html")
+    try:
+        units = parse_cargo_timings(report_file)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Rapport de compilation illisible: {e}")
+        return True
+    if not units:
+        print("ℹ️  Tout etait deja compile: rien a mesurer (cargo clean pour un profil complet)")
+        return True
+    
+    record = record_build_timings(project_path, rust_target, units, result["duration"], state)
+    slowest = sorted(units, key=lambda key: units[key]["duration"], reverse=True)[:BUILD_REPORT_TOP]
+    print(f"⏱️  {len(units)} unite(s) compilee(s) en {result['duration']:.1f}s (revision {record['rev'] or 'inconnue'})")
+    for key in slowest:
+        print(f"   {units[key]['duration']:7.2f}s  {key} {units[key]['version']}")
+    print(f"💡 Analyse complete: python3 {sys.argv[0]} build-report --target ... --project-path {project_path}")
+    return True
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def build_regressions(current, baseline):
+    """Compare un enregistrement a la base glissante: crates ralenties, nouvelles ou mises a jour."""
+    regressions = []
+    for key, (version, _, duration, _) in current["units"].items():
+        previous = [record["units"][key] for record in baseline if key in record["units"]]
+        if not previous:
+            if duration >= BUILD_REGRESSION_MIN_SECONDS:
+                regressions.append({"kind": "new", "unit": key, "version": version, "duration": duration})
+            continue
+        reference = _median([unit[2] for unit in previous])
+        old_version = previous[-1][0]
+        slower = (duration - reference >= BUILD_REGRESSION_MIN_SECONDS
+                  and duration > reference * (1 + BUILD_REGRESSION_RATIO))
+        if old_version != version and (slower or duration >= BUILD_REGRESSION_MIN_SECONDS):
+            regressions.append({"kind": "bump", "unit": key, "version": version, "old_version": old_version,
+                                "duration": duration, "baseline": reference})
+        elif slower:
+            regressions.append({"kind": "slower", "unit": key, "version": version,
+                                "duration": duration, "baseline": reference})
+    
+    # Le temps total n'est comparable qu'entre compilations completes
+    clean = [record["wall"] for record in baseline if record.get("fresh") == 0]
+    if current.get("fresh") == 0 and clean:
+        reference = _median(clean)
+        if (current["wall"] - reference >= BUILD_REGRESSION_MIN_SECONDS
+                and current["wall"] > reference * (1 + BUILD_REGRESSION_RATIO)):
+            regressions.append({"kind": "total", "unit": "(compilation complete)",
+                                "duration": current["wall"], "baseline": reference})
+    return regressions
+
+def build_report(target_name, project_path, as_json=False):
+    """Affiche les crates les plus lentes, le chemin critique et les regressions; False si regression."""
+    rust_target = TARGETS[target_name]["rust_target"]
+    records = load_build_history(project_path, rust_target)
+    if not records:
+        print(f"❌ Aucun historique de compilation pour {target_name}", file=sys.stderr)
+        print(f"💡 Lancez d'abord: python3 {sys.argv[0]} build --target {target_name} --profile-build",
+              file=sys.stderr)
+        return False
+    
+    current = records[-1]
+    baseline = records[-1 - BUILD_BASELINE_SIZE:-1]
+    units = current["units"]
+    slowest = sorted(units, key=lambda key: units[key][2], reverse=True)[:BUILD_REPORT_TOP]
+    regressions = build_regressions(current, baseline)
+    
+    if as_json:
+        print(json.dumps({
+            "rev": current["rev"],
+            "target": rust_target,
+            "wall": current["wall"],
+            "baseline_records": len(baseline),
+            "slowest": [{"unit": key, "version": units[key][0], "duration": units[key][2],
+                         "frontend": units[key][3]} for key in slowest],
+            "critical_path": current["critical"],
+            "regressions": regressions,
+        }, indent=2))
+        return not regressions
+    
+    print(f"📊 Compilation {current['rev'] or '(hors git)'} pour {target_name}: {current['wall']:.1f}s, "
+          f"{len(units)} unite(s) compilee(s), {current['fresh']} a jour")
+    print()
+    print("🐢 Crates les plus lentes:")
+    for key in slowest:
+        version, _, duration, rmeta = units[key]
+        phases = f" (frontend {rmeta:.1f}s, codegen/liens {duration - rmeta:.1f}s)" if rmeta is not None else ""
+        print(f"   {duration:7.2f}s  {key} {version}{phases}")
+    
+    print()
+    critical = [key for key in current["critical"] if key in units]
+    if critical:
+        end = units[critical[-1]][1] + units[critical[-1]][2]
+        print(f"🧭 Chemin critique ({end:.1f}s):")
+        for key in critical:
+            print(f"   {units[key][1]:7.2f}s → {units[key][1] + units[key][2]:7.2f}s  {key}")
+    
+    print()
+    if not baseline:
+        print("ℹ️  Pas encore de base de comparaison (un seul enregistrement)")
+        return True
+    if not regressions:
+        print(f"✅ Aucune regression par rapport aux {len(baseline)} compilation(s) precedente(s)")
+        return True
+    print(f"⚠️  Regressions par rapport aux {len(baseline)} compilation(s) precedente(s):")
+    for regression in regressions:
+        if regression["kind"] == "bump":
+            print(f"   ⬆️  {regression['unit']} {regression['old_version']} → {regression['version']}: "
+                  f"{regression['duration']:.1f}s (avant {regression['baseline']:.1f}s)")
+        elif regression["kind"] == "new":
+            print(f"   🆕 {regression['unit']} {regression['version']}: {regression['duration']:.1f}s")
+        else:
+            print(f"   🐢 {regression['unit']}: {regression['duration']:.1f}s (base {regression['baseline']:.1f}s)")
+    return False
+
+def _linker_expr(text):
+    """Evalue une expression de memory.x: nombres (0x.., 2048K, 2M), + - * / et parentheses."""
+    tokens = re.findall(r"0[xX][0-9a-fA-F]+|\d+[KkMm]?|[-+*/()]", text)
+    if "".join(tokens) != re.sub(r"\s+", "", text):
+        raise ValueError(f"Expression non supportee: {text.strip()}")
+    position = 0
+
+    def number(token):
+        scale = {"k": 1024, "m": 1024 * 1024}.get(token[-1].lower(), 1)
+        if scale != 1:
+            token = token[:-1]
+        return int(token, 0) * scale
+
+    def atom():
+        nonlocal position
+        token = tokens[position]
+        position += 1
+        if token == "(":
+            value = expression()
+            position += 1
+            return value
+        if token == "-":
+            return -atom()
+        return number(token)
+
+    def term():
+        nonlocal position
+        value = atom()
+        while position < len(tokens) and tokens[position] in "*/":
+            operator = tokens[position]
+            position += 1
+            value = value * atom() if operator == "*" else value // atom()
+        return value
+
+    def expression():
+        nonlocal position
+        value = term()
+        while position < len(tokens) and tokens[position] in "+-":
+            operator = tokens[position]
+            position += 1
+            value = value + term() if operator == "+" else value - term()
+        return value
+
+    try:
+        return expression()
+    except IndexError:
+        raise ValueError(f"Expression incomplete: {text.strip()}")
+
+def parse_memory_x(path):
+    """Regions du bloc MEMORY d'un script de liens: {nom: (origine, taille)}."""
+    with open(path, "r") as f:
+        text = re.sub(r"/\*.*?\*/|//[^\n]*", "", f.read(), flags=re.S)
+    block = re.search(r"\bMEMORY\s*\{(.*?)\}", text, re.S)
+    if not block:
+        return {}
+    regions = {}
+    pattern = (r"(\w+)\s*(?:\([^)]*\))?\s*:\s*(?:ORIGIN|org|o)\s*=\s*([^,]+),"
+               r"\s*(?:LENGTH|len|l)\s*=\s*([^\n]+)")
+    for name, origin, length in re.findall(pattern, block.group(1)):
+        regions[name] = (_linker_expr(origin), _linker_expr(length))
+    return regions
+
+def _region_of(regions, address):
+    for name, (origin, length) in regions.items():
+        if origin <= address < origin + length:
+            return name
+    return None
+
+def rust_symbol_crate(name):
+    """Crate d'origine d'un symbole Rust (mangling legacy ou v0); None pour C/asm."""
+    if name.startswith("_ZN"):
+        match = re.match(r"_ZN(\d+)", name)
+        if not match:
+            return None
+        start = match.end()
+        ident = name[start:start + int(match.group(1))]
+        # `<T as Trait>::f`: la crate est celle du type
+        if ident.startswith("_$LT$") or ident.startswith("$LT$"):
+            ident = ident.split("$LT$", 1)[1]
+            ident = re.split(r"\.\.|\$", ident, 1)[0]
+        return ident or None
+    if name.startswith("_R"):
+        match = re.search(r"C(?:s[0-9A-Za-z_]*?_)?(\d+)", name[2:])
+        if match:
+            start = match.end() + 2
+            return name[start:start + int(match.group(1))] or None
+    return None
+
+_LEGACY_ESCAPES = {"$LT$": "<", "$GT$": ">", "$RF$": "&", "$BP$": "*", "$C$": ",", "$SP$": "@",
+                   "$u20$": " ", "$u27$": "'", "$u5b$": "[", "$u5d$": "]", "$u7b$": "{", "$u7d$": "}",
+                   "$u7e$": "~", "$u3b$": ";", "$u2b$": "+", "$u22$": '"'}
+
+def demangle_rust_symbol(name):
+    """Demangle simplifie des symboles Rust legacy (`_ZN...E`), sans le hash final."""
+    if not name.startswith("_ZN") or not name.endswith("E"):
+        return name
+    parts = []
+    position = 3
+    while position < len(name) - 1:
+        match = re.match(r"\d+", name[position:])
+        if not match:
+            return name
+        position += match.end()
+        parts.append(name[position:position + int(match.group())])
+        position += int(match.group())
+    if parts and re.fullmatch(r"h[0-9a-f]{16}", parts[-1]):
+        parts.pop()
+    text = "::".join(part[1:] if part.startswith("_$") else part for part in parts)
+    text = re.sub(r"\$[A-Za-z0-9]+\$", lambda m: _LEGACY_ESCAPES.get(m.group(), m.group()), text)
+    return text.replace("..", "::")
+
+def analyze_firmware_size(elf_file, regions):
+    """Occupation d'un firmware: par region de memory.x, par section, par symbole et par crate.
+    
+    Une section chargee en flash mais executee en RAM (`.data`) compte dans
+    les deux regions; `.bss` ne compte qu'en RAM.
+    """
+    usage = {name: 0 for name in regions}
+    sections = []
+    crates = {}
+    symbols = []
+    with ElfFile(elf_file) as elf:
+        allocated = set()
+        for index, section in enumerate(elf.sections):
+            if not section.flags & SHF_ALLOC or not section.size:
+                continue
+            allocated.add(index)
+            lma = elf.load_address(section)
+            placed = []
+            for address in {section.addr, lma} if section.type != SHT_NOBITS else {section.addr}:
+                region = _region_of(regions, address)
+                if region and region not in placed:
+                    usage[region] += section.size
+                    placed.append(region)
+            sections.append({"name": section.name, "addr": section.addr, "lma": lma,
+                             "size": section.size, "regions": placed})
+        
+        for symbol in elf.symbols():
+            if symbol.shndx not in allocated:
+                continue
+            crate = rust_symbol_crate(symbol.name) or "(C/asm)"
+            crates[crate] = crates.get(crate, 0) + symbol.size
+            symbols.append((symbol.size, symbol.name))
+    
+    symbols.sort(reverse=True)
+    return {
+        "regions": {name: {"origin": origin, "length": length, "used": usage[name]}
+                    for name, (origin, length) in regions.items()},
+        "sections": sections,
+        "symbols": {name: size for size, name in symbols[:SIZE_SNAPSHOT_SYMBOLS]},
+        "crates": dict(sorted(crates.items(), key=lambda item: -item[1])),
+    }
+
+def _format_size(size):
+    if abs(size) >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.2f} MiB"
+    if abs(size) >= 1024:
+        return f"{size / 1024:.1f} KiB"
+    return f"{size} B"
+
+def _format_delta(delta):
+    if delta is None:
+        return "(nouveau)"
+    if delta == 0:
+        return ""
+    return f"({'+' if delta > 0 else '-'}{_format_size(abs(delta))})"
+
+def parse_size_budget(specs, regions):
+    """Budgets `REGION=LIMITE` (octets, 0x.., 512K, 2M ou pourcentage de la region): {region: octets}."""
+    budget = {}
+    for spec in specs:
+        name, _, limit = str(spec).partition("=")
+        name, limit = name.strip(), limit.strip()
+        if not limit:
+            raise ValueError(f"Budget invalide (attendu REGION=LIMITE): {spec}")
+        if limit.endswith("%"):
+            if name not in regions:
+                raise ValueError(f"Region inconnue pour un budget en pourcentage: {name}")
+            budget[name] = int(regions[name][1] * float(limit[:-1]) / 100)
+        else:
+            budget[name] = _linker_expr(limit)
+    return budget
+
+def cargo_size_budget(project_path):
+    """Budgets declares dans Cargo.toml: [package.metadata.rust-embedded] size-budget = { FLASH = "90%" }."""
+    if tomllib is None:
+        return []
+    try:
+        with open(Path(project_path) / "Cargo.toml", "rb") as f:
+            manifest = tomllib.load(f)
+    except (OSError, ValueError):
+        return []
+    budget = manifest.get("package", {}).get("metadata", {}).get("rust-embedded", {}).get("size-budget", {})
+    return [f"{name}={limit}" for name, limit in budget.items()] if isinstance(budget, dict) else []
+
+def _size_snapshot_path(project_path, rust_target):
+    return Path(project_path) / "target" / "rust-embedded" / f"size-{rust_target}.json"
+
+def update_size_snapshot(project_path, rust_target, elf_file, report):
+    """Memorise le rapport et retourne celui de la compilation precedente (ou None).
+    
+    Le fichier garde deux rapports: le courant et le precedent. Relancer
+    `size` sur le meme ELF compare donc toujours a la compilation d'avant.
+    """
+    path = _size_snapshot_path(project_path, rust_target)
+    stat = os.stat(elf_file)
+    elf_id = [stat.st_mtime_ns, stat.st_size]
+    try:
+        with open(path, "r") as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != SIZE_SNAPSHOT_VERSION:
+            snapshot = {}
+    except (OSError, ValueError):
+        snapshot = {}
+    
+    current = snapshot.get("current")
+    if current and current.get("elf_id") == elf_id:
+        return snapshot.get("previous")
+    
+    snapshot = {"version": SIZE_SNAPSHOT_VERSION, "previous": current,
+                "current": {"elf_id": elf_id, "time": int(time.time()), **report}}
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return current
+
+@traced
+def firmware_size(target_name, project_path, budget_specs=(), as_json=False, summary=False, elf_file=None):
+    """Affiche l'occupation du firmware et l'ecart avec la compilation precedente.
+    
+    Retourne False si un budget (--budget ou Cargo.toml) est depasse. Avec
+    `summary`, seules les regions sont affichees (utilise apres un build).
+    """
+    rust_target = TARGETS[target_name]["rust_target"]
+    elf_file = elf_file or find_elf_file(project_path, rust_target)
+    if not elf_file:
+        return False
+    
+    memory_x = Path(project_path) / "memory.x"
+    try:
+        regions = parse_memory_x(memory_x) if memory_x.is_file() else {}
+        budget = parse_size_budget([*cargo_size_budget(project_path), *budget_specs], regions)
+        report = analyze_firmware_size(elf_file, regions)
+    except (ElfError, OSError, ValueError) as e:
+        print(f"❌ Analyse de la taille impossible: {e}", file=sys.stderr)
+        return False
+    previous = update_size_snapshot(project_path, rust_target, elf_file, report) or {}
+    
+    used = {name: region["used"] for name, region in report["regions"].items()}
+    for section in report["sections"]:
+        if section["name"] in budget and section["name"] not in used:
+            used[section["name"]] = section["size"]
+    exceeded = {name: (used.get(name, 0), limit) for name, limit in budget.items() if used.get(name, 0) > limit}
+    
+    if as_json:
+        print(json.dumps({"elf": elf_file, **report, "budget": budget,
+                          "exceeded": {name: {"used": u, "limit": l} for name, (u, l) in exceeded.items()},
+                          "previous": {key: previous.get(key) for key in ("regions", "crates")} if previous else None},
+                         indent=2))
+        return not exceeded
+    
+    old_regions = previous.get("regions", {})
+    if not summary:
+        print(f"📦 Taille du firmware: {elf_file}")
+        if not regions:
+            print("ℹ️  Pas de memory.x dans le projet: occupation par section uniquement")
+    for name, region in report["regions"].items():
+        percent = 100 * region["used"] / region["length"] if region["length"] else 0
+        old = old_regions.get(name, {}).get("used") if previous else region["used"]
+        limit = f", budget {_format_size(budget[name])}" if name in budget else ""
+        print(f"   {name:<8} {_format_size(region['used']):>11} / {_format_size(region['length']):<11}"
+              f" {percent:5.1f}%{limit} {_format_delta(None if old is None else region['used'] - old)}")
+    
+    if not summary:
+        old_sections = {section["name"]: section["size"] for section in previous.get("sections", [])}
+        print()
+        print("📑 Sections:")
+        for section in report["sections"]:
+            old = old_sections.get(section["name"]) if previous else section["size"]
+            print(f"   {section['name']:<20} {_format_size(section['size']):>11}  {section['addr']:#010x}"
+                  f"  {'/'.join(section['regions']) or '-':<12} {_format_delta(None if old is None else section['size'] - old)}")
+        
+        for title, current, old_values, top, label in (
+                ("🧩 Plus grosses crates", report["crates"], previous.get("crates"), SIZE_TOP_CRATES, lambda name: name),
+                ("🔣 Plus gros symboles", report["symbols"], previous.get("symbols"), SIZE_TOP_SYMBOLS, demangle_rust_symbol)):
+            print()
+            print(f"{title}:")
+            for name, size in sorted(current.items(), key=lambda item: -item[1])[:top]:
+                old = old_values.get(name) if old_values is not None else size
+                print(f"   {_format_size(size):>11}  {label(name)} {_format_delta(None if old is None else size - old)}")
+            if old_values:
+                # Plus fortes variations, y compris hors du classement
+                changes = sorted(((size - old_values.get(name, 0), name) for name, size in current.items()
+                                  if size != old_values.get(name)), key=lambda item: -abs(item[0]))
+                changes += [(-size, name) for name, size in old_values.items() if name not in current]
+                changes = sorted(changes, key=lambda item: -abs(item[0]))[:SIZE_TOP_CHANGES]
+                if changes:
+                    print("   Variations depuis la compilation precedente:")
+                    for delta, name in changes:
+                        print(f"   {_format_delta(delta):>13}  {label(name)}")
+    
+    for name, (used_bytes, limit) in exceeded.items():
+        print(f"❌ Budget depasse pour {name}: {_format_size(used_bytes)} > {_format_size(limit)}", file=sys.stderr)
+    return not exceeded
+
+def _rustflags_config_key(project_path, rust_target):
+    """Cle `--config` qui ajoute des rustflags sans masquer ceux du projet.
+    
+    Cargo fusionne les listes de --config avec celles des fichiers, mais
+    `target.<triple>.rustflags` remplace `build.rustflags`: on complete donc
+    build.rustflags quand c'est lui que le projet utilise.
+    """
+    uses_build = False
+    project_path = Path(project_path).resolve()
+    for directory in [project_path, *project_path.parents]:
+        config = _read_toml(directory / ".cargo" / "config.toml") or {}
+        if any(isinstance(table, dict) and "rustflags" in table for table in config.get("target", {}).values()):
+            return f"target.{rust_target}.rustflags"
+        uses_build = uses_build or "rustflags" in config.get("build", {})
+    return "build.rustflags" if uses_build else f"target.{rust_target}.rustflags"
+
+@traced
+def build_stack_sizes(project_path, rust_target):
+    """Compile en release avec `-Z emit-stack-sizes` (nightly); retourne l'ELF ou None.
+    
+    Le build a son propre dossier (target/rust-embedded/stack-sizes): celui
+    qui sert au flashage n'est ni invalide ni remplace.
+    """
+    wait_for_prefetch(project_path)
+    binary = cargo_package_name(project_path)
+    if binary is None:
+        print(f"❌ Le projet n'a pas un binaire unique: {project_path}", file=sys.stderr)
+        return None
+    
+    target_dir = Path(project_path) / "target" / "rust-embedded" / "stack-sizes"
+    command = ["cargo", "+nightly", "build", "--release", "--target", rust_target, "--target-dir", str(target_dir)]
+    env = None
+    if os.environ.get("RUSTFLAGS"):
+        # RUSTFLAGS remplace toute la configuration: on le complete
+        env = {**os.environ, "RUSTFLAGS": " ".join([os.environ["RUSTFLAGS"], *STACK_SIZES_RUSTFLAGS])}
+    else:
+        command += ["--config", f"{_rustflags_config_key(project_path, rust_target)}={json.dumps(STACK_SIZES_RUSTFLAGS)}"]
+    
+    print("🥞 Compilation avec -Z emit-stack-sizes (nightly)...")
+    result = run_command(command, project_path, env=env)
+    if not result["ok"]:
+        print("❌ Erreur lors de la compilation nightly", file=sys.stderr)
+        print(f"💡 rustup toolchain install nightly && rustup +nightly target add {rust_target}", file=sys.stderr)
+        return None
+    return str(target_dir / rust_target / "release" / binary)
+
+@traced
+def stack_usage(target_name, project_path, emit_stack_sizes=False, as_json=False):
+    """Affiche le pire cas d'utilisation de la pile par point d'entree et par interruption.
+    
+    Retourne False si l'analyse est impossible ou si le pire cas (programme
+    et interruption la plus gourmande) depasse la place laissee a la pile.
+    """
+    rust_target = TARGETS[target_name]["rust_target"]
+    if emit_stack_sizes:
+        elf_file = build_stack_sizes(project_path, rust_target)
+    else:
+        elf_file = find_elf_file(project_path, rust_target)
+    if not elf_file:
+        return False
+    
+    try:
+        report = stackusage.analyze_stack(elf_file)
+    except (ElfError, OSError, ValueError) as e:
+        print(f"❌ Analyse de la pile impossible: {e}", file=sys.stderr)
+        return False
+    stack = report["stack"]
+    overflow = bool(stack) and report["worst_total"] > stack["available"]
+    
+    if as_json:
+        print(json.dumps({"elf": elf_file, **report, "overflow": overflow}, indent=2))
+        return not overflow
+    
+    def show(item, label):
+        worst = f"{'≥ ' if item['flags'] else ''}{_format_size(item['worst'])}"
+        print(f"   {worst:>13}  {label}")
+        if len(item["path"]) > 1:
+            chain = [demangle_rust_symbol(name) for name in item["path"][1:STACK_PATH_LIMIT]]
+            if len(item["path"]) > STACK_PATH_LIMIT:
+                chain.append(f"... (+{len(item['path']) - STACK_PATH_LIMIT})")
+            print(f"   {'':>13}  ↳ {' → '.join(chain)}")
+        if item["flags"]:
+            print(f"   {'':>13}  ⚠️  borne basse: {', '.join(STACK_FLAG_LABELS[flag] for flag in item['flags'])}")
+    
+    sources = report["sources"]
+    print(f"🥞 Pile du firmware: {elf_file}")
+    print(f"   {report['functions']} fonctions, {report['calls']} appels directs; taille de pile: "
+          f"{sources['stack_sizes']} depuis .stack_sizes, {sources['prologue']} estimees depuis le prologue")
+    if not sources["stack_sizes"]:
+        print("💡 --emit-stack-sizes pour des tailles exactes (compilation nightly avec -Z emit-stack-sizes)")
+    
+    if report["entries"]:
+        print()
+        print("🚪 Points d'entree:")
+        for item in report["entries"]:
+            show(item, demangle_rust_symbol(item["name"]))
+    if report["handlers"]:
+        print()
+        print("⚡ Interruptions et exceptions:")
+        for item in report["handlers"]:
+            vectors = item["vectors"]
+            detail = f" ({', '.join(vectors)})" if len(vectors) <= 3 else f" ({len(vectors)} vecteurs)"
+            show(item, demangle_rust_symbol(item["name"]) + (detail if vectors else ""))
+    if report["roots"]:
+        print()
+        print(f"🌱 Sans appelant direct (pointeurs de fonction, callbacks): {len(report['roots'])}")
+        for item in report["roots"][:STACK_TOP_ROOTS]:
+            show(item, demangle_rust_symbol(item["name"]))
+    if report["recursion"]:
+        print()
+        print("🔁 Recursion (pile non bornee):")
+        for cycle in report["recursion"]:
+            print(f"   {' → '.join(demangle_rust_symbol(name) for name in [*cycle, cycle[0]])}")
+    for title, names in (("↪️  Appels indirects (cible inconnue)", report["indirect"]),
+                         ("📤 Appels hors du firmware (ROM)", report["external"])):
+        if names:
+            print()
+            print(f"{title}: {len(names)} fonction(s)")
+            for name in names[:STACK_TOP_ROOTS]:
+                print(f"   {demangle_rust_symbol(name)}")
+    
+    print()
+    total = f"{'≥ ' if report['lower_bound'] else ''}{_format_size(report['worst_total'])}"
+    if stack:
+        percent = 100 * report["worst_total"] / stack["available"] if stack["available"] else 0
+        print(f"📊 Pire cas (programme + interruption la plus gourmande, sans imbrication): {total}"
+              f" / {_format_size(stack['available'])} de pile ({percent:.1f}%)")
+    else:
+        print(f"📊 Pire cas (programme + interruption la plus gourmande, sans imbrication): {total}")
+    if overflow:
+        print(f"❌ Debordement de pile possible: {_format_size(report['worst_total'])} > "
+              f"{_format_size(stack['available'])}", file=sys.stderr)
+    return not overflow
+
+def resolve_project_paths(patterns):
+    """Developpe une liste de chemins ou de globs en dossiers de projets Cargo."""
+    projects = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            path = os.path.abspath(match)
+            if (Path(path) / "Cargo.toml").is_file() and path not in projects:
+                projects.append(path)
+    return projects
+
+def create_jobserver(tokens):
+    """Cree un jobserver GNU make: un pipe pre-rempli de `tokens` jetons."""
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"+" * tokens)
+    return read_fd, write_fd
+
+def jobserver_env(jobserver, budget):
+    """Environnement qui fait de cargo un client du jobserver."""
+    read_fd, write_fd = jobserver
+    flags = f"-j{budget} --jobserver-fds={read_fd},{write_fd} --jobserver-auth={read_fd},{write_fd}"
+    return {**os.environ, "CARGO_MAKEFLAGS": flags, "MAKEFLAGS": flags}
+
+def run_build_job(project_path, target_name, jobserver, env, output_lock):
+    """Lance un `cargo build` en prefixant sa sortie; retourne True si la compilation reussit.
+    
+    Le jeton implicite de chaque cargo est pris dans le jobserver avant le
+    lancement et rendu a la fin: le nombre total de compilations (cargo et
+    rustc confondus) ne depasse jamais le budget.
+    """
+    prefix = f"[{Path(project_path).name}:{target_name}]"
+    rust_target = TARGETS[target_name]["rust_target"]
+    with output_lock:
+        cached_elf, fingerprint, manifest = check_build_fingerprint(project_path, rust_target)
+    if cached_elf:
+        with output_lock:
+            print(f"{prefix} ♻️  Sources inchangees, compilation ignoree", flush=True)
+        return True
+    
+    command = ["cargo", "build", "--release", "--target", rust_target]
+    read_fd, write_fd = jobserver
+    token = os.read(read_fd, 1)
+    try:
+        result = run_command(command, project_path, env=rustc_cache_env(project_path, env), prefix=prefix,
+                             pass_fds=jobserver)
+    finally:
+        os.write(write_fd, token)
+    if not result["ok"]:
+        return False
+    with output_lock:
+        record_build_fingerprint(project_path, rust_target, fingerprint, manifest,
+                                 release_elf_path(project_path, rust_target))
+    return True
+
+def build_matrix(project_paths, target_names, cpu_budget=None):
+    """Compile plusieurs projets pour plusieurs targets en parallele.
+    
+    Toutes les invocations de cargo partagent un jobserver GNU make de
+    `cpu_budget` jetons pour ne pas surcharger la machine.
+    """
+    budget = max(1, cpu_budget or os.cpu_count() or 1)
+    for project_path in project_paths:
+        wait_for_prefetch(project_path)
+    jobserver = create_jobserver(budget)
+    env = jobserver_env(jobserver, budget)
+    output_lock = threading.Lock()
+    
+    jobs = []
+    for project_path in project_paths:
+        for target_name in target_names:
+            jobs.append({
+                "name": f"{Path(project_path).name}:{target_name}",
+                "run": lambda project_path=project_path, target_name=target_name:
+                    run_build_job(project_path, target_name, jobserver, env, output_lock),
+            })
+    
+    print(f"🛠️  {len(jobs)} compilation(s) en parallele, budget de {budget} coeurs")
+    try:
+        results = run_job_graph(jobs)
+    finally:
+        os.close(jobserver[0])
+        os.close(jobserver[1])
+    
+    print_job_summary(results, "Recapitulatif des compilations")
+    return all(result["ok"] for result in results.values())
+
+def _prefetch_path(project_path, name):
+    return Path(project_path) / "target" / "rust-embedded" / name
+
+def load_prefetch_state(project_path):
+    """Etat du prefetch des dependances (None si aucun n'a ete lance pour ce projet)."""
+    try:
+        with open(_prefetch_path(project_path, "prefetch.json"), "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != PREFETCH_STATE_VERSION:
+        return None
+    return state
+
+def _save_prefetch_state(project_path, state):
+    path = _prefetch_path(project_path, "prefetch.json")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Etat du prefetch non enregistre: {e}", flush=True)
+
+def _lock_prefetch(project_path):
+    """Prend le verrou du prefetch (tenu jusqu'a la fin du processus qui le detient)."""
+    path = _prefetch_path(project_path, "prefetch.lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = open(path, "a")
+    if fcntl is not None:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+    return lock
+
+def prefetch_running(project_path):
+    """Indique si un prefetch est en cours pour ce projet (son verrou est tenu)."""
+    state = load_prefetch_state(project_path)
+    if state is None or state.get("status") != "running" or fcntl is None:
+        # Sans flock (Windows), build ne s'attache pas: le verrou de cargo evite la course
+        return False
+    try:
+        with open(_prefetch_path(project_path, "prefetch.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    # Verrou libre: le processus s'est arrete sans mettre a jour son etat
+    return False
+
+def start_prefetch(target_name, project_path, offline=False):
+    """Lance en arriere-plan le prefetch d'un projet cree (voir run_prefetch); retourne son pid.
+    
+    Le processus est detache: il survit a la fin de `create`. Le verrou est
+    pris ici et transmis au processus, un `build` lance aussitot apres s'y
+    attache donc sans course possible.
+    """
+    lock = _lock_prefetch(project_path)
+    log_path = _prefetch_path(project_path, "prefetch.log")
+    state = {
+        "version": PREFETCH_STATE_VERSION,
+        "status": "running",
+        "target": target_name,
+        "pid": None,
+        "started": time.time(),
+        "steps": [],
+    }
+    _save_prefetch_state(project_path, state)
+    command = [sys.executable, os.path.abspath(__file__), "prefetch", "--target", target_name,
+               "--project-path", os.path.abspath(project_path)]
+    if offline:
+        command.append("--offline")
+    env = {**os.environ, "PYTHONUNBUFFERED": "1", PREFETCH_LOCK_FD_ENV: str(lock.fileno())}
+    try:
+        # subprocess et non le moteur asyncio: celui-ci arrete ses commandes a la fin de la boucle
+        with open(log_path, "w") as log:
+            process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+                                       env=env, pass_fds=(lock.fileno(),), start_new_session=(os.name == "posix"))
+    except OSError as e:
+        print(f"⚠️ Prefetch des dependances non lance: {e}")
+        _save_prefetch_state(project_path, {**state, "status": "failed"})
+        return None
+    finally:
+        lock.close()
+    print(f"📦 Telechargement et precompilation des dependances en arriere-plan (pid {process.pid})")
+    print(f"   Progression: {log_path} — le premier build attendra la fin de ce travail")
+    return process.pid
+
+@traced
+def run_prefetch(target_name, project_path, offline=False):
+    """Prepare les dependances d'un projet: Cargo.lock, `cargo fetch` puis compilation release.
+    
+    Lance par create en arriere-plan (ou a la main avec l'action prefetch).
+    Sans reseau, chaque etape est relancee avec --offline: les sources
+    viennent alors du cache de cargo, d'un miroir local ou d'un dossier
+    vendor declares dans .cargo/config.toml. La compilation porte sur le
+    projet tout juste genere: memes features que le premier build, qui
+    retrouve tout compile (et ses empreintes a jour). Retourne True si tout
+    a reussi.
+    """
+    inherited = os.environ.pop(PREFETCH_LOCK_FD_ENV, None)
+    lock = os.fdopen(int(inherited), "a") if inherited else _lock_prefetch(project_path)
+    rust_target = TARGETS[target_name]["rust_target"]
+    state = {
+        "version": PREFETCH_STATE_VERSION,
+        "status": "running",
+        "target": target_name,
+        "pid": os.getpid(),
+        "started": (load_prefetch_state(project_path) or {}).get("started", time.time()),
+        "steps": [],
+    }
+    _save_prefetch_state(project_path, state)
+    
+    offline = offline or os.environ.get("CARGO_NET_OFFLINE", "").lower() in ("1", "true")
+    steps = []
+    if not (Path(project_path) / "Cargo.lock").exists():
+        steps.append(("lockfile", ["cargo", "generate-lockfile"]))
+    steps.append(("fetch", ["cargo", "fetch", "--target", rust_target]))
+    steps.append(("build", ["cargo", "build", "--release", "--target", rust_target]))
+    env = rustc_cache_env(project_path)
+    
+    ok = True
+    try:
+        for number, (name, command) in enumerate(steps, 1):
+            print(f"📦 [{number}/{len(steps)}] {' '.join(command)}", flush=True)
+            state["step"] = name
+            _save_prefetch_state(project_path, state)
+            if name == "build":
+                _, fingerprint, manifest = check_build_fingerprint(project_path, rust_target)
+            started = time.monotonic()
+            result = run_command(command + (["--offline"] if offline else []), project_path, env=env)
+            if not result["ok"] and not offline and name != "build":
+                print("🔌 Echec, nouvel essai hors ligne (cache cargo, miroir local ou vendor)", flush=True)
+                offline = True
+                result = run_command(command + ["--offline"], project_path, env=env)
+            state["steps"].append({"name": name, "ok": result["ok"], "duration": time.monotonic() - started})
+            if not result["ok"]:
+                ok = False
+                break
+            if name == "build":
+                record_build_fingerprint(project_path, rust_target, fingerprint, manifest,
+                                         release_elf_path(project_path, rust_target))
+    finally:
+        state.update(status="done" if ok else "failed", finished=time.time(), offline=offline)
+        state.pop("step", None)
+        _save_prefetch_state(project_path, state)
+        lock.close()
+    print(f"{'✅ Dependances pretes' if ok else '❌ Prefetch des dependances echoue'}", flush=True)
+    return ok
+
+def wait_for_prefetch(project_path):
+    """Attend le prefetch lance par create en suivant sa progression, au lieu de lancer un second cargo."""
+    if not prefetch_running(project_path):
+        return
+    state = load_prefetch_state(project_path) or {}
+    print(f"⏳ Dependances en cours de preparation en arriere-plan (etape: {state.get('step', 'demarrage')}), "
+          f"suivi de la progression...")
+    started = time.monotonic()
+    try:
+        log = open(_prefetch_path(project_path, "prefetch.log"), "r", errors="replace")
+    except OSError:
+        log = None
+    # Les dernieres lignes deja ecrites, puis la suite au fil de l'eau
+    partial = ""
+    if log is not None:
+        for line in collections.deque(log, maxlen=3):
+            _print_line(f"[prefetch] {line.rstrip()}")
+    while True:
+        running = prefetch_running(project_path)
+        if log is not None:
+            partial += log.read()
+            *lines, partial = partial.split("\n")
+            for line in lines:
+                _print_line(f"[prefetch] {line.rstrip()}")
+        if not running:
+            break
+        time.sleep(PREFETCH_FOLLOW_INTERVAL)
+    if log is not None:
+        log.close()
+    state = load_prefetch_state(project_path) or {}
+    if state.get("status") == "done":
+        print(f"✅ Dependances pretes (attente de {time.monotonic() - started:.1f} s)")
+    else:
+        print("⚠️ Le prefetch des dependances n'a pas abouti, compilation normale")
+
+@traced
+def create_project(project_name, target_name, project_path, prefetch=True, offline=False):
+    """Cree un nouveau projet Rust embarque.
+    
+    Avec `prefetch`, les dependances sont telechargees et precompilees en
+    arriere-plan (voir start_prefetch) pendant que l'utilisateur decouvre
+    le projet.
+    """
+    print(f"📁 Creation du projet {project_name} pour {target_name}")
+    
+    full_path = Path(project_path) / project_name
+    
+    if full_path.exists():
+        print(f"❌ Le dossier {project_name} existe deja")
+        return False
+    
+    # Cree le projet Rust de base
+    if not run_command(["cargo", "init", str(full_path), "--name", project_name], project_path)["ok"]:
+        return False
+    
+    target_config = TARGETS[target_name]
+    
+    # Cree le fichier Cargo.toml specifique a l'embarque
+    cargo_toml_content = f"""[package]
+name = "{project_name}"
+version = "0.1.0"
+edition = "2021"
+
+[[bin]]
+name = "{project_name}"
+test = false
+bench = false
+
+[dependencies]
+cortex-m = "0.7"
+cortex-m-rt = "0.7"
+panic-halt = "0.2"
+"""
+    
+    if target_name == "pico":
+        cargo_toml_content += """rp-pico = "0.8"
+embedded-hal = "0.2.5"
+
+[dependencies.rp2040-hal]
+version = "0.9"
+features = ["rt", "critical-section-impl"]
+
+# Outils pour la generation UF2
+[dependencies.rp2040-boot2]
+version = "0.3"
+"""
+    elif target_name == "esp32c3":
+        cargo_toml_content += """esp32c3-hal = "0.15"
+esp-backtrace = { version = "0.8", features = ["esp32c3", "exception-handler", "panic-handler", "println"] }
+esp-println = { version = "0.6", features = ["esp32c3"] }
+"""
+    
+    with open(full_path / "Cargo.toml", "w") as f:
+        f.write(cargo_toml_content)
+    
+    # Cree le fichier .cargo/config.toml
+    cargo_config_dir = full_path / ".cargo"
+    cargo_config_dir.mkdir(exist_ok=True)
+    
+    if target_name == "pico":
+        config_content = f"""[build]
+target = "{target_config['rust_target']}"
+
+[target.{target_config['rust_target']}]
+runner = "elf2uf2-rs -d"
+rustflags = [
+    "-C", "link-arg=--nmagic",
+    "-C", "link-arg=-Tlink.x",
+]
+"""
+    else:
+        config_content = f"""[build]
+target = "{target_config['rust_target']}"
+
+[target.{target_config['rust_target']}]
+runner = "probe-rs run --chip {target_config['chip']}"
+"""
+    
+    with open(cargo_config_dir / "config.toml", "w") as f:
+        f.write(config_content)
+    
+    # Cree un main.rs de base
+    src_dir = full_path / "src"
+    main_rs_content = get_main_template(target_name)
+    
+    with open(src_dir / "main.rs", "w") as f:
+        f.write(main_rs_content)
     
     # Creer le fichier memory.x pour Pico
     if target_name == "pico":
-        memory_x_content = """/* Memory layout of the RP2040 microcontroller */
-MEMORY {
-    BOOT2 : ORIGIN = 0x10000000, LENGTH = 0x100
-    FLASH : ORIGIN = 0x10000100, LENGTH = 2048K - 0x100
-    RAM   : ORIGIN = 0x20000000, LENGTH = 256K
-}
+        memory_x_content = """/* Memory layout of the RP2040 microcontroller */
+MEMORY {
+    BOOT2 : ORIGIN = 0x10000000, LENGTH = 0x100
+    FLASH : ORIGIN = 0x10000100, LENGTH = 2048K - 0x100
+    RAM   : ORIGIN = 0x20000000, LENGTH = 256K
+}
+
+EXTERN(BOOT2_FIRMWARE)
+
+SECTIONS {
+    /* ### Boot loader */
+    .boot2 ORIGIN(BOOT2) :
+    {
+        KEEP(*(.boot2));
+    } > BOOT2
+} INSERT BEFORE .text;
+"""
+        with open(full_path / "memory.x", "w") as f:
+            f.write(memory_x_content)
+    
+    print(f"✅ Projet {project_name} cree avec succes dans {full_path}")
+    if prefetch:
+        start_prefetch(target_name, str(full_path), offline)
+    return True
+
+def get_main_template(target_name):
+    """Retourne le template main.rs pour la target donnee."""
+    if target_name == "pico":
+        return """#![no_std]
+#![no_main]
+
+use panic_halt as _;
+use rp_pico::entry;
+use rp_pico::hal::{clocks::{init_clocks_and_plls, Clock}, pac, sio::Sio, watchdog::Watchdog};
+
+#[entry]
+fn main() -> ! {
+    let mut pac = pac::Peripherals::take().unwrap();
+    let core = pac::CorePeripherals::take().unwrap();
+    
+    let mut watchdog = Watchdog::new(pac.WATCHDOG);
+    let clocks = init_clocks_and_plls(
+        rp_pico::XOSC_CRYSTAL_FREQ,
+        pac.XOSC,
+        pac.CLOCKS,
+        pac.PLL_SYS,
+        pac.PLL_USB,
+        &mut pac.RESETS,
+        &mut watchdog,
+    )
+    .ok()
+    .unwrap();
+
+    loop {
+        // Your code here
+    }
+}
+"""
+    elif target_name == "esp32c3":
+        return """#![no_std]
+#![no_main]
+
+use esp32c3_hal::{clock::ClockControl, peripherals::Peripherals, prelude::*, Rtc};
+use esp_backtrace as _;
+
+#[entry]
+fn main() -> ! {
+    let peripherals = Peripherals::take();
+    let mut system = peripherals.DPORT.split();
+    let clocks = ClockControl::boot_defaults(system.clock_control).freeze();
+    
+    let mut rtc = Rtc::new(peripherals.RTC_CNTL);
+    rtc.rwdt.disable();
+
+    loop {
+        // Your code here
+    }
+}
+"""
+    return ""
+
+@traced
+def generate_uf2_with_binutils(project_path, elf_file):
+    """Genere le UF2 via cargo-binutils (.bin intermediaire) - ancienne methode."""
+    # Generer le fichier .bin depuis l'ELF
+    bin_file = elf_file.replace('.elf', '.bin') if elf_file.endswith('.elf') else elf_file + '.bin'
+    objcopy_command = ["cargo", "objcopy", "--release", "--", "-O", "binary", bin_file]
+    
+    result = capture_command(objcopy_command, project_path, timeout=CONVERT_TIMEOUT)
+    
+    if not result["ok"]:
+        print(f"❌ Erreur generation binaire:", file=sys.stderr)
+        print(result["output"] or result["error"], file=sys.stderr)
+        return None
+    
+    print(f"✅ Fichier binaire cree: {bin_file}")
+    
+    # Convertir .bin vers UF2
+    uf2_file = bin_file.replace('.bin', '.uf2')
+    
+    # Essayer d'abord elf2uf2-rs
+    convert_command = ["elf2uf2-rs", bin_file, uf2_file]
+    result = capture_command(convert_command, project_path, timeout=CONVERT_TIMEOUT)
+    
+    if not result["ok"]:
+        print(f"⚠️ elf2uf2-rs a echoue, utilisation du convertisseur personnalise...")
+        # Utiliser notre convertisseur UF2 personnalise (dans le meme processus)
+        try:
+            with trace_span("convert_file_to_uf2"):
+                uf2conv.convert_file_to_uf2(bin_file, uf2_file)
+        except Exception as e:
+            print(f"❌ Erreur conversion .bin vers UF2 (convertisseur personnalise): {e}", file=sys.stderr)
+            return None
+    
+    return uf2_file
+
+@traced
+def copy_uf2_to_pico(uf2_file, pico_mount_path):
+    """Ecrit le fichier UF2 sur le lecteur BOOTSEL detecte (detect_pico_uf2_disk), None s'il est absent."""
+    if pico_mount_path:
+        dest_path = os.path.join(pico_mount_path, os.path.basename(uf2_file))
+        try:
+            with open(uf2_file, "rb") as f:
+                uf2_data = f.read()
+        except OSError as e:
+            print(f"⚠️ Lecture du fichier UF2 impossible: {e}")
+            return False
+        ok, detail = write_uf2_to_drive(uf2_data, pico_mount_path, os.path.basename(uf2_file))
+        if ok:
+            print(f"✅ Fichier UF2 ecrit sur le Pico: {dest_path} ({detail})")
+            rebooted = wait_for_unmount(pico_mount_path)
+            if rebooted:
+                print("🎉 Flashage termine! Le Pico a redemarre sur le nouveau firmware.")
+            elif rebooted is False:
+                print("⚠️ Le Pico n'a pas redemarre: l'image est-elle bien destinee au RP2040 ?")
+            else:
+                print("🎉 Flashage termine! Le Pico va redemarrer automatiquement.")
+            return True
+        else:
+            print(f"⚠️ Erreur lors de la copie vers le Pico: {detail}")
+            print(f"📋 Copiez manuellement le fichier: {uf2_file}")
+            print(f"📋 Vers le lecteur Pico: {pico_mount_path}")
+    else:
+        print(f"⚠️ Pico non detecte en mode BOOTSEL")
+        print(f"📋 Copiez manuellement le fichier: {uf2_file}")
+        print(f"📋 Vers le lecteur Pico une fois connecte en mode BOOTSEL")
+    return False
+
+@traced
+def flash_pico_uf2_binutils(project_path, elf_file):
+    """Flashage du Pico par conversion ELF → UF2 directe (fallback cargo-binutils)."""
+    # Conversion en Python depuis les segments PT_LOAD : ni cargo objcopy ni
+    # elf2uf2-rs, et les trous entre segments ne sont pas remplis de zeros
+    print("🔧 Generation UF2 directe depuis les segments de l'ELF...")
+    uf2_file = (elf_file[:-len('.elf')] if elf_file.endswith('.elf') else elf_file) + '.uf2'
+    
+    try:
+        with trace_span("convert_elf_to_uf2"):
+            payload_size, uf2_size = uf2conv.convert_elf_to_uf2(elf_file, uf2_file)
+        print(f"📊 {payload_size} bytes → {uf2_size} bytes UF2")
+    except (ElfError, OSError) as e:
+        print(f"⚠️ Conversion directe impossible ({e}), tentative via cargo-binutils...")
+        uf2_file = generate_uf2_with_binutils(project_path, elf_file)
+        if not uf2_file:
+            return False
+    
+    print(f"✅ Fichier UF2 cree: {uf2_file}")
+    
+    # Copier automatiquement vers le Pico si detecte; la carte est identifiee
+    # avant l'ecriture (le lecteur disparait quand elle redemarre)
+    pico_mount_path = detect_pico_uf2_disk()
+    board = pico_board_identity(pico_mount_path)
+    if copy_uf2_to_pico(uf2_file, pico_mount_path):
+        save_flash_manifest(elf_file, board=board)
+    
+    return True
+
+def flash_manifest_path(elf_file):
+    """Chemin du manifeste des pages flashees, stocke a cote de l'ELF."""
+    return elf_file + ".flash.json"
+
+def pico_board_identity(mount_point):
+    """Identifie la carte derriere un lecteur BOOTSEL par son numero de serie USB (sysfs).
+    
+    None si le lecteur est absent ou si le numero est introuvable (hors
+    Linux): le Board-ID de INFO_UF2.TXT, commun a tous les RP2040, ne
+    distingue pas deux cartes et un delta ne doit jamais partir sans
+    identite prouvee.
+    """
+    if not mount_point:
+        return None
+    try:
+        source = next((source for path, _, source in read_mountinfo() if path == mount_point), None)
+    except OSError:
+        source = None
+    if source and source.startswith("/dev/"):
+        serial = _sysfs_attribute(Path("/sys/class/block") / Path(os.path.realpath(source)).name, "serial")
+        if serial:
+            return f"usb:{serial}"
+    return None
+
+@traced
+def save_flash_manifest(elf_file, hashes=None, board=None):
+    """Enregistre l'empreinte des pages de l'image qui vient d'etre flashee sur la carte `board`.
+    
+    Sans identite de carte, un manifeste existant est supprime: le prochain
+    flashage --delta enverra l'image complete.
+    """
+    path = flash_manifest_path(elf_file)
+    if board is None:
+        discard_flash_manifest(elf_file)
+        return False
+    if hashes is None:
+        try:
+            hashes = uf2conv.elf_page_hashes(elf_file)
+        except (ElfError, OSError) as e:
+            print(f"⚠️ Manifeste de flashage non enregistre: {e}")
+            discard_flash_manifest(elf_file)
+            return False
+    
+    manifest = {
+        "version": FLASH_MANIFEST_VERSION,
+        "family_id": uf2conv.RP2040_FAMILY_ID,
+        "page_size": uf2conv.UF2_PAYLOAD_SIZE,
+        "sector_size": uf2conv.FLASH_SECTOR_SIZE,
+        "board": board,
+        "pages": {f"{addr:08x}": digest for addr, digest in sorted(hashes.items())},
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Manifeste de flashage non enregistre: {e}")
+        discard_flash_manifest(elf_file)
+        return False
+    return True
+
+def discard_flash_manifest(elf_file):
+    """Oublie le dernier flashage (carte flashee autrement: SWD, plusieurs cartes...)."""
+    try:
+        os.unlink(flash_manifest_path(elf_file))
+    except OSError:
+        pass
+
+def load_flash_manifest(elf_file, board):
+    """Charge les empreintes du dernier flashage de la carte `board`, None si absent, perime ou d'une autre carte."""
+    if board is None:
+        return None
+    try:
+        with open(flash_manifest_path(elf_file), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    expected = {
+        "version": FLASH_MANIFEST_VERSION,
+        "family_id": uf2conv.RP2040_FAMILY_ID,
+        "page_size": uf2conv.UF2_PAYLOAD_SIZE,
+        "sector_size": uf2conv.FLASH_SECTOR_SIZE,
+        "board": board,
+    }
+    if not isinstance(manifest, dict) or any(manifest.get(key) != value for key, value in expected.items()):
+        return None
+    try:
+        return {int(addr, 16): digest for addr, digest in manifest["pages"].items()}
+    except (KeyError, AttributeError, ValueError):
+        return None
+
+@traced
+def flash_pico_uf2_delta(project_path, elf_file):
+    """Flashage du Pico en ne transferant que les secteurs modifies depuis le dernier flashage.
+    
+    Le delta n'est envoye que si le manifeste a ete enregistre pour la carte
+    branchee; sinon l'image complete est flashee.
+    """
+    print("📋 Flashage Pico incremental (UF2 delta)")
+    
+    pico_mount_path = detect_pico_uf2_disk()
+    if not pico_mount_path:
+        print("⚠️ Pico non detecte en mode BOOTSEL: un delta ne peut pas etre copie a la main", file=sys.stderr)
+        return False
+    board = pico_board_identity(pico_mount_path)
+    previous_hashes = load_flash_manifest(elf_file, board)
+    if previous_hashes is None:
+        print("ℹ️  Aucun manifeste valide du dernier flashage de cette carte, envoi de l'image complete")
+        return flash_pico_uf2_binutils(project_path, elf_file)
+    
+    base = elf_file[:-len('.elf')] if elf_file.endswith('.elf') else elf_file
+    uf2_file = base + '.delta.uf2'
+    try:
+        with trace_span("convert_elf_to_uf2_delta"):
+            written, total, hashes = uf2conv.convert_elf_to_uf2_delta(elf_file, uf2_file, previous_hashes)
+    except (ElfError, OSError) as e:
+        print(f"⚠️ Generation du delta impossible ({e}), envoi de l'image complete")
+        return flash_pico_uf2_binutils(project_path, elf_file)
+    
+    if written == 0:
+        print("✅ Aucune page modifiee depuis le dernier flashage, rien a envoyer")
+        return True
+    
+    print(f"📊 {written}/{total} pages a reecrire ({written * uf2conv.UF2_BLOCK_SIZE} bytes UF2)")
+    print(f"✅ Fichier UF2 delta cree: {uf2_file}")
+    
+    if not copy_uf2_to_pico(uf2_file, pico_mount_path):
+        # Etat de la carte inconnu: le prochain flashage enverra tout
+        discard_flash_manifest(elf_file)
+        return False
+    save_flash_manifest(elf_file, hashes, board=board)
+    return True
+
+def create_simple_uf2_guide(project_path):
+    """Cree un guide simple pour flasher manuellement le Pico."""
+    print("📖 Guide de flashage manuel Pico:")
+    print()
+    print("1. 🔄 Recompilez le projet avec la configuration correcte:")
+    print(f"   cd {project_path}")
+    print("   cargo build --release")
+    print()
+    print("2. 📁 Creez un nouveau projet Pico avec l'extension pour la bonne config:")
+    print("   python3 main.py create --target pico --project-name nouveau-pico")
+    print()
+    print("3. 📋 Mode BOOTSEL:")
+    print("   - Debranchez le Pico")
+    print("   - Maintenez BOOTSEL enfonce")
+    print("   - Rebranchez le Pico")
+    print("   - Relâchez BOOTSEL")
+    print("   - Le Pico apparaît comme lecteur USB")
+    print()
+    print("4. 🎯 Utilisez probe-rs en mode SWD (si debogueur disponible):")
+    print(f"   cd {project_path}")
+    print("   cargo run --release")
+    print()
+    return True
+
+@traced
+def flash_pico_uf2(project_path, elf_file):
+    """Flashage du Pico en mode BOOTSEL (UF2) - Fallback manuel."""
+    print("📋 Flashage Pico en mode BOOTSEL (UF2)")
+    print("ℹ️  Ce mode necessite que le Pico soit connecte en mode BOOTSEL :")
+    print("   1. Debrancher le Pico")
+    print("   2. Maintenir le bouton BOOTSEL enfonce")
+    print("   3. Reconnecter le Pico (tout en maintenant BOOTSEL)")
+    print("   4. Relâcher BOOTSEL - le Pico apparaît comme lecteur USB")
+    print()
+    
+    # Comme --delta, l'ELF deja compile est converti et copie: flash ne
+    # recompile pas (cargo run relancerait la compilation)
+    if flash_pico_uf2_binutils(project_path, elf_file):
+        return True
+    
+    # Si toutes les methodes automatiques echouent, donner des instructions
+    print("💡 Les methodes automatiques ont echoue.")
+    print()
+    return create_simple_uf2_guide(project_path)
+
+def _unescape_mount_field(text):
+    """Decode les echappements octaux de mountinfo (`\\040` pour un espace)."""
+    return re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), text)
+
+def read_mountinfo():
+    """Points de montage du processus: [(point de montage, type de systeme de fichiers, source)]."""
+    mounts = []
+    with open(MOUNTINFO_FILE, "r", errors="replace") as f:
+        for line in f:
+            fields = line.split()
+            try:
+                separator = fields.index("-", 6)
+            except ValueError:
+                continue
+            if len(fields) < separator + 3:
+                continue
+            mounts.append((_unescape_mount_field(fields[4]), fields[separator + 1],
+                           _unescape_mount_field(fields[separator + 2])))
+    return mounts
+
+def _disk_labels():
+    """Labels des partitions (udev /dev/disk/by-label): {peripherique: label}."""
+    labels = {}
+    try:
+        entries = list(os.scandir("/dev/disk/by-label"))
+    except OSError:
+        return labels
+    for entry in entries:
+        label = re.sub(r"\\x([0-9a-fA-F]{2})", lambda match: chr(int(match.group(1), 16)), entry.name)
+        labels[os.path.realpath(entry.path)] = label
+    return labels
+
+class MountWatcher:
+    """Attend un changement de la table des montages (poll de /proc/self/mountinfo, sinon scrutation)."""
+
+    def __init__(self):
+        self._file = None
+        self._poll = None
+        try:
+            self._file = open(MOUNTINFO_FILE, "rb")
+            self._file.read()
+            self._poll = select.poll()
+            # Le noyau signale POLLPRI/POLLERR a chaque montage ou demontage
+            self._poll.register(self._file.fileno(), select.POLLPRI | select.POLLERR)
+        except (OSError, AttributeError):
+            self.close()
+
+    def wait(self, timeout):
+        """Attend au plus `timeout` secondes (et au plus BOOTSEL_POLL_INTERVAL entre deux verifications)."""
+        timeout = max(0, min(timeout, BOOTSEL_POLL_INTERVAL))
+        if self._poll is None:
+            time.sleep(timeout)
+            return
+        if self._poll.poll(timeout * 1000):
+            # Relire le fichier rearme la notification
+            self._file.seek(0)
+            self._file.read()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._poll = None
+
+def mounted_paths():
+    """Ensemble des points de montage actuels, None si mountinfo est indisponible (hors Linux)."""
+    try:
+        return {mount_point for mount_point, _, _ in read_mountinfo()}
+    except OSError:
+        return None
+
+def detect_pico_uf2_disks():
+    """Liste tous les Pico connectes en mode BOOTSEL (lecteurs UF2 montes).
+    
+    Sous Linux, la table des montages est lue directement: un lecteur FAT dont
+    le label (ou le nom du point de montage) commence par RPI-RP2 est retenu,
+    quel que soit l'endroit ou il est monte. Ailleurs, les chemins usuels sont
+    parcourus.
+    """
+    try:
+        mounts = read_mountinfo()
+    except OSError:
+        mounts = None
+    
+    if mounts is not None:
+        labels = _disk_labels()
+        candidates = []
+        for mount_point, fstype, source in mounts:
+            if fstype not in PICO_UF2_FSTYPES:
+                continue
+            label = labels.get(os.path.realpath(source)) if source.startswith("/dev/") else None
+            if (label or os.path.basename(mount_point)).startswith(PICO_UF2_LABEL):
+                candidates.append(mount_point)
+    else:
+        candidates = [path for pattern in PICO_UF2_MOUNT_PATTERNS for path in sorted(glob.glob(pattern))]
+    
+    disks = []
+    for path in candidates:
+        # Le lecteur du bootloader RP2040 expose toujours INFO_UF2.TXT
+        if os.path.isfile(os.path.join(path, "INFO_UF2.TXT")) and path not in disks:
+            disks.append(path)
+    return disks
+
+@traced
+def wait_for_pico_uf2_disks(timeout=BOOTSEL_WAIT_TIMEOUT):
+    """Comme detect_pico_uf2_disks, mais attend jusqu'a `timeout` secondes qu'un lecteur apparaisse."""
+    disks = detect_pico_uf2_disks()
+    if disks or timeout <= 0:
+        return disks
+    
+    print(f"⏳ En attente d'un Pico en mode BOOTSEL ({timeout:.0f}s)...", flush=True)
+    deadline = time.monotonic() + timeout
+    watcher = MountWatcher()
+    try:
+        while not disks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            watcher.wait(remaining)
+            disks = detect_pico_uf2_disks()
+    finally:
+        watcher.close()
+    return disks
+
+@traced
+def detect_pico_uf2_disk():
+    """Detecte si le Pico est connecte en mode BOOTSEL (lecteur UF2), en l'attendant un moment."""
+    disks = wait_for_pico_uf2_disks()
+    if disks:
+        print(f"Found pico uf2 disk {disks[0]}")
+        return disks[0]
+    return None
+
+@traced
+def wait_for_unmount(mount_point, timeout=BOOTSEL_REBOOT_TIMEOUT):
+    """Attend que le lecteur disparaisse (le Pico redemarre apres le dernier bloc UF2).
+    
+    Retourne True si le demontage est observe, False sinon, None si ce n'est
+    pas verifiable (dossier qui n'est pas un point de montage, hors Linux).
+    """
+    mounts = mounted_paths()
+    if mounts is None or mount_point not in mounts:
+        return None
+    deadline = time.monotonic() + timeout
+    watcher = MountWatcher()
+    try:
+        while True:
+            mounts = mounted_paths()
+            if mounts is not None and mount_point not in mounts:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            watcher.wait(remaining)
+    finally:
+        watcher.close()
+
+@traced
+def write_uf2_to_drive(uf2_data, mount_point, uf2_name):
+    """Ecrit l'image UF2 sur un lecteur BOOTSEL en une seule ecriture sequentielle, puis fsync.
+    
+    Pas de copie de metadonnees (ignorees par le FAT du bootloader).
+    Retourne (ok, detail).
+    """
+    view = memoryview(uf2_data)
+    written = 0
+    started = time.monotonic()
+    try:
+        fd = os.open(os.path.join(mount_point, uf2_name), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            while written < len(view):
+                written += os.write(fd, view[written:])
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        # Le Pico redemarre des le dernier bloc recu: une erreur apres
+        # l'ecriture complete (fsync, close) n'empeche pas le flashage
+        if written < len(view):
+            return False, str(e)
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return True, f"{_format_size(len(view))} a {_format_size(int(len(view) / elapsed))}/s"
+
+@traced
+def _flash_uf2_device(uf2_data, uf2_name, mount_point, details):
+    """Job de flash --all-devices: ecrit l'image puis attend le redemarrage de la carte."""
+    ok, detail = write_uf2_to_drive(uf2_data, mount_point, uf2_name)
+    if ok:
+        rebooted = wait_for_unmount(mount_point)
+        if rebooted is False:
+            ok = False
+            detail += ", pas de redemarrage"
+        elif rebooted:
+            detail += ", redemarre"
+    details[mount_point] = detail
+    return ok
+
+def _sysfs_attribute(device, name):
+    """Attribut sysfs d'un peripherique ou du premier parent qui l'a (idVendor, serial...), None sinon."""
+    try:
+        path = Path(device).resolve()
+    except OSError:
+        return None
+    for directory in [path, *path.parents]:
+        try:
+            return (directory / name).read_text().strip()
+        except OSError:
+            continue
+    return None
+
+def _usb_attribute(port, name):
+    """Attribut sysfs du peripherique USB d'un port serie (idVendor, serial...), None s'il est inconnu."""
+    return _sysfs_attribute(Path("/sys/class/tty") / Path(os.path.realpath(port)).name / "device", name)
+
+def _serial_port_vendor(port):
+    """Identifiant USB (idVendor) du port serie via sysfs, None s'il est inconnu."""
+    vendor = _usb_attribute(port, "idVendor")
+    return vendor.lower() if vendor else None
+
+def _serial_device_key(port):
+    """Identifie la carte derriere un port: numero de serie USB, sinon le port lui-meme."""
+    serial = _usb_attribute(port, "serial")
+    return f"usb:{serial}" if serial else f"port:{os.path.realpath(port)}"
+
+def detect_serial_ports():
+    """Liste les ports serie des cartes ESP32 (USB-JTAG Espressif ou pont USB-serie connu)."""
+    ports = []
+    seen = set()
+    for pattern in ESP_SERIAL_PORT_PATTERNS:
+        for port in sorted(glob.glob(pattern)):
+            real = os.path.realpath(port)
+            if real in seen:
+                continue
+            vendor = _serial_port_vendor(port)
+            if vendor is not None and vendor not in ESP_USB_VENDORS:
+                continue
+            seen.add(real)
+            ports.append(real)
+    return ports
+
+def _esp_flash_cache_path(project_path, rust_target):
+    return Path(project_path) / "target" / "rust-embedded" / f"esp-flash-{rust_target}.json"
+
+def load_esp_flash_cache(project_path, rust_target):
+    """Ports et debits des derniers flashages reussis, par carte (numero de serie USB)."""
+    try:
+        with open(_esp_flash_cache_path(project_path, rust_target), "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = None
+    if not isinstance(cache, dict) or cache.get("version") != ESP_FLASH_CACHE_VERSION:
+        cache = {"version": ESP_FLASH_CACHE_VERSION, "last": None, "devices": {}}
+    return cache
+
+def save_esp_flash_cache(project_path, rust_target, cache):
+    path = _esp_flash_cache_path(project_path, rust_target)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Cache des ports serie non enregistre: {e}")
+
+def merge_flash_options(target_name, flash_options):
+    """Options de flashage de TARGETS completees par celles de la ligne de commande (hors valeurs None)."""
+    overrides = {key: value for key, value in (flash_options or {}).items() if value is not None}
+    return {**TARGETS[target_name].get("flash_options", {}), **overrides}
+
+def espflash_command(elf_file, options, port=None, baud=None):
+    """Ligne de commande `espflash flash` pour les options de flashage donnees."""
+    command = ["espflash", "flash"]
+    if port:
+        command += ["--port", port]
+    if baud:
+        command += ["--baud", str(baud)]
+    if options.get("flash_mode"):
+        command += ["--flash-mode", options["flash_mode"]]
+    if options.get("flash_freq"):
+        command += ["--flash-freq", options["flash_freq"]]
+    return command + [elf_file]
+
+def _resolve_esp_port(options, cache):
+    """Choisit le port serie: option explicite, carte du dernier flashage, ou carte unique connectee.
+    
+    Retourne (port, cle de la carte); port None laisse espflash chercher.
+    """
+    if options.get("port"):
+        return options["port"], _serial_device_key(options["port"])
+    ports = detect_serial_ports()
+    keys = {_serial_device_key(port): port for port in ports}
+    last = cache.get("last")
+    if last in keys:
+        # Meme carte que la derniere fois, meme si son port a change (ttyACM0 → ttyACM1)
+        print(f"🔌 Port serie memorise: {keys[last]}")
+        return keys[last], last
+    if len(ports) == 1:
+        return ports[0], _serial_device_key(ports[0])
+    if len(ports) > 1:
+        print(f"⚠️ Plusieurs ports serie detectes ({', '.join(ports)}), precisez --port")
+    return None, None
+
+@traced
+def flash_esp32c3(project_path, elf_file, options):
+    """Flashe un ESP32-C3 avec espflash en reutilisant le port et le debit memorises.
+    
+    Avec `auto_baud`, les debits de ESP_AUTO_BAUD_RATES sont essayes du plus
+    rapide au plus lent et le premier qui fonctionne est retenu pour les
+    flashages suivants de cette carte. Seule une erreur de liaison serie
+    (ESP_LINK_ERROR_PATTERN) fait passer au debit suivant.
+    """
+    rust_target = TARGETS["esp32c3"]["rust_target"]
+    cache = load_esp_flash_cache(project_path, rust_target)
+    port, key = _resolve_esp_port(options, cache)
+    remembered = cache["devices"].get(key, {}).get("baud") if key else None
+    
+    if options.get("baud"):
+        rates = [options["baud"]]
+    elif options.get("auto_baud"):
+        rates = list(ESP_AUTO_BAUD_RATES)
+    elif remembered:
+        # Le debit memorise peut echouer (cable, hub): repli sur le debit par defaut
+        rates = [remembered, None]
+    else:
+        rates = [None]
+    
+    for i, baud in enumerate(rates):
+        if baud and len(rates) > 1:
+            print(f"📶 Essai a {baud} bauds")
+        result = run_command(espflash_command(elf_file, options, port, baud), project_path)
+        if result["ok"]:
+            break
+        if result["not_found"] or result["cancelled"] or result["timed_out"] or i == len(rates) - 1:
+            return False
+        if not ESP_LINK_ERROR_PATTERN.search(result["output"]):
+            # Mauvaise puce, image trop grande...: un autre debit n'y changerait rien
+            return False
+        print(f"⚠️ Echec de communication a {baud or 'debit par defaut'} bauds, nouvel essai plus lent...")
+    
+    if key:
+        entry = cache["devices"].setdefault(key, {})
+        entry["port"] = port
+        if options.get("auto_baud") or baud == remembered:
+            entry["baud"] = baud
+            if options.get("auto_baud"):
+                print(f"💾 Debit retenu pour cette carte: {baud or 'par defaut'} bauds")
+        elif not options.get("baud"):
+            entry.pop("baud", None)
+        cache["last"] = key
+        save_esp_flash_cache(project_path, rust_target, cache)
+    return True
+
+@traced
+def flash_all_devices(target_name, project_path, elf_file, devices=None, flash_options=None):
+    """Flashe en parallele toutes les cartes connectees avec la meme image.
+    
+    Pico: l'UF2 est genere une fois puis ecrit sur chaque lecteur BOOTSEL,
+    chaque carte devant ensuite redemarrer (demontage du lecteur).
+    ESP32-C3: un `espflash flash --port` par port serie, avec les memes
+    options de flashage. `devices` remplace
+    la detection (lecteurs ou ports explicites). Affiche un tableau
+    reussite/echec par carte; retourne True si toutes ont ete flashees.
+    """
+    if target_name == "pico":
+        devices = devices or wait_for_pico_uf2_disks()
+        kind = "lecteur(s) BOOTSEL"
+    else:
+        devices = devices or detect_serial_ports()
+        kind = "port(s) serie"
+    if not devices:
+        print(f"❌ Aucune carte {target_name} detectee", file=sys.stderr)
+        return False
+    print(f"🏭 {len(devices)} {kind} a flasher: {', '.join(devices)}")
+    
+    details = {}
+    if target_name == "pico":
+        uf2_file = (elf_file[:-len('.elf')] if elf_file.endswith('.elf') else elf_file) + '.uf2'
+        try:
+            with trace_span("convert_elf_to_uf2"):
+                payload_size, uf2_size = uf2conv.convert_elf_to_uf2(elf_file, uf2_file)
+            with open(uf2_file, "rb") as f:
+                uf2_data = f.read()
+        except (ElfError, OSError) as e:
+            print(f"❌ Generation de l'image UF2 impossible: {e}", file=sys.stderr)
+            return False
+        print(f"📊 Image partagee: {payload_size} bytes → {uf2_size} bytes UF2")
+        uf2_name = os.path.basename(uf2_file)
+        run = lambda device: _flash_uf2_device(uf2_data, uf2_name, device, details)
+    else:
+        flasher = TARGETS[target_name]["flasher"]
+        if not check_tool_installed(flasher):
+            print_missing_tool_help(flasher)
+            return False
 
-EXTERN(BOOT2_FIRMWARE)
+        options = merge_flash_options(target_name, flash_options)
 
-SECTIONS {
-    /* ### Boot loader */
-    .boot2 ORIGIN(BOOT2) :
-    {
-        KEEP(*(.boot2));
-    } > BOOT2
-} INSERT BEFORE .text;
-"""
-        with open(full_path / "memory.x", "w") as f:
-            f.write(memory_x_content)
+        def run(device):
+            result = run_command(espflash_command(elf_file, options, device, options.get("baud")),
+                                 project_path, prefix=f"[{os.path.basename(device)}]")
+            details[device] = result["error"] or ("" if result["ok"] else f"code {result['returncode']}")
+            return result["ok"]
+    
+    # Cartes independantes: toutes sont flashees en meme temps
+    jobs = [{"name": device, "run": lambda device=device: run(device)} for device in devices]
+    results = run_job_graph(jobs)
+    for device, result in results.items():
+        result["detail"] = details.get(device)
+    print_job_summary(results, "Recapitulatif du flashage")
+    
+    flashed = sum(1 for result in results.values() if result["ok"])
+    print(f"{'✅' if flashed == len(devices) else '❌'} {flashed}/{len(devices)} carte(s) flashee(s)")
+    return flashed == len(devices)
+
+@traced
+def detect_pico_flash_mode():
+    """Detecte la methode de flashage disponible pour le Pico."""
+    # Priorite au mode BOOTSEL (plus simple, pas de materiel supplementaire)
+    if check_tool_installed("elf2uf2-rs"):
+        return "bootsel"
+    
+    # Fallback vers mode SWD si debogueur disponible
+    if check_tool_installed("probe-rs"):
+        return "swd"
+    
+    return None
+
+@traced
+def build_project(target_name, project_path, force=False, profile=False, budget_specs=()):
+    """Compile le projet en release pour la carte, sauf si les sources n'ont pas change.
+    
+    Avec `profile`, cargo est toujours relance avec `--timings` et la duree
+    de chaque crate est ajoutee a l'historique (voir build-report). La
+    compilation echoue si le firmware depasse son budget de taille.
+    """
+    rust_target = TARGETS[target_name]["rust_target"]
+    print(f"🛠️  Compilation pour {target_name}...")
+    wait_for_prefetch(project_path)
+    cached_elf, fingerprint, manifest = check_build_fingerprint(project_path, rust_target)
+    elf_file = release_elf_path(project_path, rust_target)
+    if profile:
+        if not profile_build(project_path, rust_target):
+            return False
+        record_build_fingerprint(project_path, rust_target, fingerprint, manifest, elf_file)
+    elif cached_elf and not force:
+        print(f"♻️  Sources inchangees, compilation ignoree: {cached_elf}")
+    else:
+        build_command = [
+            "cargo", "build", 
+            "--release",
+            "--target", rust_target
+        ]
+        cache_stats = load_rustc_cache_stats()
+        if not run_command(build_command, project_path, env=rustc_cache_env(project_path))["ok"]:
+            return False
+        print_rustc_cache_delta(cache_stats)
+        record_build_fingerprint(project_path, rust_target, fingerprint, manifest, elf_file)
+    
+    # Occupation memoire a chaque build (lecture directe de l'ELF, quelques ms)
+    if elf_file and os.path.isfile(elf_file):
+        return firmware_size(target_name, project_path, budget_specs, summary=True, elf_file=elf_file)
+    return True
+
+@traced
+def flash_project(target_name, project_path, delta=False, all_devices=False, devices=None, flash_options=None):
+    """Flashe le firmware deja compile du projet sur la carte; retourne True si reussi.
+    
+    Avec `all_devices` (ou une liste `devices`), toutes les cartes connectees
+    sont flashees en parallele (voir flash_all_devices). `flash_options`
+    (baud, flash_mode, flash_freq, port, auto_baud) complete les options de
+    flashage de TARGETS.
+    """
+    target_config = TARGETS[target_name]
+    print(f"⚡ Televersement sur {target_name}...")
+    
+    # 1. Trouver le fichier binaire (.elf)
+    elf_file = find_elf_file(project_path, target_config["rust_target"])
+    if not elf_file:
+        return False
+    
+    print(f"📁 Fichier binaire trouve : {elf_file}")
+
+    if all_devices or devices:
+        # Plusieurs cartes: le manifeste de flash --delta ne decrit plus aucune d'elles
+        discard_flash_manifest(elf_file)
+        return flash_all_devices(target_name, project_path, elf_file, devices, flash_options)
+
+    # 2. Traitement special pour Pico (RP2040)
+    if target_name == "pico":
+        flash_mode = detect_pico_flash_mode()
+        
+        if flash_mode == "bootsel":
+            # Mode BOOTSEL (recommande, plus simple)
+            print("🎯 Utilisation du mode BOOTSEL (UF2)")
+            flash_function = flash_pico_uf2_delta if delta else flash_pico_uf2
+            if not flash_function(project_path, elf_file):
+                return False
+            print("✅ Flashage Pico termine avec succes!")
+                
+        elif flash_mode == "swd":
+            # Mode SWD avec probe-rs (necessite debogueur)
+            print("🎯 Utilisation du mode SWD avec probe-rs")
+            print("⚠️  Ce mode necessite un debogueur SWD connecte au Pico")
+            discard_flash_manifest(elf_file)
+            flash_command = ["probe-rs", "run", "--chip", target_config["chip"], elf_file]
+            if not run_command(flash_command, project_path)["ok"]:
+                return False
+            
+        else:
+            # Aucun outil de flashage disponible
+            print(f"❌ Aucun outil de flashage pour Pico n'est installe.", file=sys.stderr)
+            print(f"", file=sys.stderr)
+            print(f"💡 Solutions pour Pico RP2040:", file=sys.stderr)
+            print(f"   1. Mode BOOTSEL (recommande): cargo install elf2uf2-rs --locked", file=sys.stderr)
+            print(f"   2. Mode SWD (avec debogueur): cargo install probe-rs-tools --locked", file=sys.stderr)
+            print(f"   3. Installation automatique: python3 {sys.argv[0]} install-tools --target pico", file=sys.stderr)
+            print(f"   4. Configuration complete: python3 {sys.argv[0]} setup", file=sys.stderr)
+            return False
+            
+    # 3. Traitement pour ESP32-C3
+    elif target_name == "esp32c3":
+        flasher = target_config["flasher"]
+        if not check_tool_installed(flasher):
+            print(f"❌ L'outil de flashage '{flasher}' n'est pas installe.", file=sys.stderr)
+            print(f"", file=sys.stderr)
+            print(f"💡 Solutions:", file=sys.stderr)
+            print(f"   1. Installation manuelle: cargo install {flasher}", file=sys.stderr)
+            print(f"   2. Installation automatique: python3 {sys.argv[0]} install-tools --target {target_name}", file=sys.stderr)
+            print(f"   3. Configuration complete: python3 {sys.argv[0]} setup", file=sys.stderr)
+            return False
+        
+        if not flash_esp32c3(project_path, elf_file, merge_flash_options(target_name, flash_options)):
+            return False
+    
+    return True
+
+class ProjectWatcher:
+    """Surveille les sources d'un projet (inotify sous Linux, sinon scrutation)."""
+
+    def __init__(self, project_path):
+        self.root = Path(project_path).resolve()
+        self._fd = None
+        self._watches = {}
+        self._snapshot = None
+        try:
+            self._init_inotify()
+        except (OSError, AttributeError):
+            self._fd = None
+            self._snapshot = self._scan()
+
+    @property
+    def mode(self):
+        return "inotify" if self._fd is not None else "scrutation"
+
+    def _init_inotify(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify indisponible")
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._fd = fd
+        self._add_watch(self.root)
+        src = self.root / "src"
+        if src.is_dir():
+            self._add_tree(src)
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(path)), INOTIFY_MASK)
+        if wd >= 0:
+            self._watches[wd] = Path(path)
+
+    def _add_tree(self, path):
+        for dirpath, dirnames, _ in os.walk(path):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            self._add_watch(dirpath)
+
+    def _is_relevant(self, path):
+        try:
+            relpath = Path(path).relative_to(self.root)
+        except ValueError:
+            return False
+        return relpath.parts[:1] == ("src",) or str(relpath) in BUILD_FINGERPRINT_FILES
+
+    def _scan(self):
+        snapshot = {}
+        for relpath in _fingerprint_inputs(self.root):
+            try:
+                stat = os.stat(self.root / relpath)
+                snapshot[relpath] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                pass
+        return snapshot
+
+    def _read_events(self):
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + name_len].split(b"\0", 1)[0].decode(errors="replace")
+            offset += name_len
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            path = directory / name if name else directory
+            if mask & INOTIFY_IN_ISDIR and mask & (INOTIFY_IN_CREATE | INOTIFY_IN_MOVED_TO):
+                # Nouveau sous-dossier de src/: on le surveille aussi
+                if self._is_relevant(path):
+                    self._add_tree(path)
+            if name and self._is_relevant(path):
+                changed.add(str(path.relative_to(self.root)))
+        return changed
+
+    def wait(self, timeout):
+        """Attend au plus `timeout` secondes; retourne l'ensemble des fichiers modifies."""
+        if self._fd is not None:
+            ready, _, _ = select.select([self._fd], [], [], timeout)
+            return self._read_events() if ready else set()
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {path for path in set(snapshot) | set(self._snapshot)
+                       if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            remaining = deadline - time.monotonic()
+            if changed or remaining <= 0:
+                return changed
+            time.sleep(min(WATCH_POLL_INTERVAL, remaining))
+
+    def wait_quiet(self, changed):
+        """Regroupe une rafale de sauvegardes: attend WATCH_DEBOUNCE secondes sans evenement."""
+        while True:
+            more = self.wait(WATCH_DEBOUNCE)
+            if not more:
+                return changed
+            changed |= more
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+def _start_watch_build(project_path, rust_target):
+    """Lance `cargo build` en arriere-plan (annulable avec ses rustc)."""
+    command = ["cargo", "build", "--release", "--target", rust_target]
+    print(f"🚀 Execution de : {' '.join(command)}", flush=True)
+    return start_command(_command_step(command, project_path, env=rustc_cache_env(project_path)))
+
+def _cancel_watch_build(build):
+    """Interrompt une compilation en cours (cargo et ses rustc)."""
+    if build.done():
+        return
+    build.cancel()
+    build.wait()
+
+def watch_project(target_name, project_path, flash=True):
+    """Recompile (et flashe) le projet a chaque sauvegarde, jusqu'a Ctrl+C."""
+    rust_target = TARGETS[target_name]["rust_target"]
+    wait_for_prefetch(project_path)
+    watcher = ProjectWatcher(project_path)
+    print(f"👀 Surveillance de {watcher.root} ({watcher.mode}), Ctrl+C pour arreter")
+    
+    build = None
+    fingerprint = manifest = None
+    # Un premier cycle au demarrage pour partir d'un firmware a jour
+    pending = {"(demarrage)"}
+    try:
+        while True:
+            if pending:
+                changed = watcher.wait_quiet(pending)
+                pending = set()
+                if build is not None and not build.done():
+                    print("⏹️  Nouvelles modifications, compilation en cours annulee")
+                    _cancel_watch_build(build)
+                print(f"🔄 Modifie: {', '.join(sorted(changed)[:5])}" + (" ..." if len(changed) > 5 else ""))
+                
+                cached_elf, fingerprint, manifest = check_build_fingerprint(project_path, rust_target)
+                if cached_elf:
+                    print("♻️  Sources inchangees, rien a recompiler")
+                    build = None
+                else:
+                    build = _start_watch_build(project_path, rust_target)
+            
+            pending = watcher.wait(WATCH_POLL_INTERVAL)
+            if build is None or not build.done():
+                continue
+            
+            # Compilation terminee
+            result = build.results[0] if build.results else None
+            build = None
+            if result is None or not result["ok"]:
+                reason = (result["error"] or f"code: {result['returncode']}") if result else "erreur interne"
+                print(f"❌ Compilation echouee ({reason}), en attente de modifications...")
+                if result and result["not_found"]:
+                    print_missing_tool_help("cargo")
+                continue
+            record_build_fingerprint(project_path, rust_target, fingerprint, manifest,
+                                     release_elf_path(project_path, rust_target))
+            print("✅ Compilation terminee")
+            if flash and not pending:
+                if not flash_project(target_name, project_path):
+                    print("❌ Flashage echoue, en attente de modifications...")
+            print("👀 En attente de modifications...")
+    except KeyboardInterrupt:
+        print()
+        print("👋 Arret de la surveillance")
+    finally:
+        if build is not None:
+            _cancel_watch_build(build)
+        watcher.close()
+
+class MonitorBuffer:
+    """Tampon circulaire borne entre le lecteur du port serie et l'affichage.
     
-    print(f"✅ Projet {project_name} cree avec succes dans {full_path}")
-    return True
+    Le lecteur n'y fait qu'ajouter des blocs bruts dates; si l'affichage
+    prend trop de retard, les blocs les plus anciens sont jetes (et comptes).
+    """
 
-def get_main_template(target_name):
-    """Retourne le template main.rs pour la target donnee."""
-    if target_name == "pico":
-        return """#![no_std]
-#![no_main]
+    def __init__(self, limit=MONITOR_BUFFER_SIZE):
+        self.limit = limit
+        self.dropped = 0
+        self.closed = False
+        self._chunks = collections.deque()
+        self._size = 0
+        self._condition = threading.Condition()
 
-use panic_halt as _;
-use rp_pico::entry;
-use rp_pico::hal::{clocks::{init_clocks_and_plls, Clock}, pac, sio::Sio, watchdog::Watchdog};
+    def put(self, data):
+        with self._condition:
+            self._chunks.append((time.time(), data))
+            self._size += len(data)
+            while self._size > self.limit and len(self._chunks) > 1:
+                _, old = self._chunks.popleft()
+                self._size -= len(old)
+                self.dropped += len(old)
+            self._condition.notify()
 
-#[entry]
-fn main() -> ! {
-    let mut pac = pac::Peripherals::take().unwrap();
-    let core = pac::CorePeripherals::take().unwrap();
-    
-    let mut watchdog = Watchdog::new(pac.WATCHDOG);
-    let clocks = init_clocks_and_plls(
-        rp_pico::XOSC_CRYSTAL_FREQ,
-        pac.XOSC,
-        pac.CLOCKS,
-        pac.PLL_SYS,
-        pac.PLL_USB,
-        &mut pac.RESETS,
-        &mut watchdog,
-    )
-    .ok()
-    .unwrap();
+    def get(self, timeout):
+        """Retire tous les blocs disponibles (attend au plus `timeout` secondes)."""
+        with self._condition:
+            if not self._chunks and not self.closed:
+                self._condition.wait(timeout)
+            chunks = list(self._chunks)
+            self._chunks.clear()
+            self._size = 0
+            return chunks
 
-    loop {
-        // Your code here
-    }
-}
-"""
-    elif target_name == "esp32c3":
-        return """#![no_std]
-#![no_main]
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
 
-use esp32c3_hal::{clock::ClockControl, peripherals::Peripherals, prelude::*, Rtc};
-use esp_backtrace as _;
+class RotatingLogWriter:
+    """Capture du moniteur: fichiers gzip tournants de MONITOR_LOG_MAX_BYTES (non compresses)."""
 
-#[entry]
-fn main() -> ! {
-    let peripherals = Peripherals::take();
-    let mut system = peripherals.DPORT.split();
-    let clocks = ClockControl::boot_defaults(system.clock_control).freeze();
+    def __init__(self, directory, keep=MONITOR_LOG_KEEP, max_bytes=MONITOR_LOG_MAX_BYTES):
+        self.directory = Path(directory)
+        self.keep = keep
+        self.max_bytes = max_bytes
+        self.files = []
+        self._file = None
+        self._written = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _open(self):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = self.directory / f"monitor-{stamp}-{len(self.files):03d}.log.gz"
+        # Niveau 1: compression ~5x sur des logs texte, sans ralentir la capture
+        self._file = gzip.open(path, "wb", compresslevel=1)
+        self._written = 0
+        self.files.append(path)
+        logs = sorted(self.directory.glob("monitor-*.log.gz"))
+        for old in logs[:max(0, len(logs) - self.keep)]:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+    def write(self, data):
+        if self._file is None or self._written >= self.max_bytes:
+            self.close()
+            self._open()
+        self._file.write(data)
+        self._written += len(data)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def monitor_log_dir(project_path):
+    return Path(project_path) / "target" / "rust-embedded" / "logs"
+
+def open_serial_port(port, baud=None):
+    """Ouvre le port serie en lecture non bloquante, en mode brut (pas d'echo ni de traduction)."""
+    fd = os.open(port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    if termios is None:
+        return fd
+    try:
+        attrs = termios.tcgetattr(fd)
+    except termios.error:
+        # Pas un terminal (fichier ou tube de test): lu tel quel
+        return fd
+    iflag, oflag, cflag, lflag, ispeed, ospeed, cc = attrs
+    iflag &= ~(termios.IGNBRK | termios.BRKINT | termios.PARMRK | termios.ISTRIP | termios.INLCR
+               | termios.IGNCR | termios.ICRNL | termios.IXON | termios.IXOFF)
+    oflag &= ~termios.OPOST
+    lflag &= ~(termios.ECHO | termios.ECHONL | termios.ICANON | termios.ISIG | termios.IEXTEN)
+    cflag = (cflag & ~(termios.CSIZE | termios.PARENB)) | termios.CS8 | termios.CREAD | termios.CLOCAL
+    if baud:
+        speed = getattr(termios, f"B{baud}", None)
+        if speed is None:
+            os.close(fd)
+            raise ValueError(f"Debit non supporte par le terminal: {baud}")
+        ispeed = ospeed = speed
+    termios.tcsetattr(fd, termios.TCSANOW, [iflag, oflag, cflag, lflag, ispeed, ospeed, cc])
+    return fd
+
+def _monitor_reader(port, baud, fd, buffer, stop, stats):
+    """Chemin critique: lectures non bloquantes de grands blocs vers le tampon, rien d'autre.
     
-    let mut rtc = Rtc::new(peripherals.RTC_CNTL);
-    rtc.rwdt.disable();
+    Si la carte disparait (reset, debranchement), le port est rouvert des
+    qu'il revient.
+    """
+    poller = select.poll()
+    poller.register(fd, select.POLLIN)
+    while not stop.is_set():
+        try:
+            if not poller.poll(200):
+                continue
+            while True:
+                data = os.read(fd, MONITOR_READ_SIZE)
+                if not data:
+                    raise OSError("fin de flux")
+                buffer.put(data)
+                stats["bytes"] += len(data)
+        except BlockingIOError:
+            continue
+        except OSError:
+            poller.unregister(fd)
+            os.close(fd)
+            fd = None
+            _print_line(f"🔌 Port {port} deconnecte, en attente de reconnexion...")
+            while fd is None and not stop.wait(MONITOR_RECONNECT_INTERVAL):
+                try:
+                    fd = open_serial_port(port, baud)
+                except (OSError, ValueError):
+                    continue
+            if fd is None:
+                break
+            stats["reconnects"] += 1
+            _print_line(f"🔌 Port {port} reconnecte")
+            poller.register(fd, select.POLLIN)
+    if fd is not None:
+        os.close(fd)
+    buffer.close()
 
-    loop {
-        // Your code here
-    }
-}
-"""
-    return ""
+def _format_monitor_lines(chunks, partial):
+    """Decoupe les blocs en lignes datees sans codes ANSI; retourne (lignes, fin de ligne en attente)."""
+    lines = []
+    for stamp, data in chunks:
+        parts = (partial + data).split(b"\n")
+        partial = parts.pop()
+        if not parts:
+            continue
+        prefix = time.strftime("%H:%M:%S", time.localtime(stamp)) + f".{int(stamp * 1000) % 1000:03d} "
+        for raw in parts:
+            text = MONITOR_ANSI_PATTERN.sub("", raw.decode("utf-8", errors="replace")).rstrip("\r")
+            lines.append(prefix + text)
+    # Une ligne sans fin (sortie binaire) ne doit pas grossir indefiniment
+    if len(partial) > MONITOR_READ_SIZE:
+        lines.append(time.strftime("%H:%M:%S ") + MONITOR_ANSI_PATTERN.sub("", partial.decode("utf-8", errors="replace")))
+        partial = b""
+    return lines, partial
 
-def flash_pico_uf2_direct(project_path):
-    """Flashage du Pico via cargo run avec elf2uf2-rs."""
-    print("📋 Flashage Pico en mode BOOTSEL (UF2) - Methode directe")
-    print("ℹ️  Ce mode necessite que le Pico soit connecte en mode BOOTSEL :")
-    print("   1. Debrancher le Pico")
-    print("   2. Maintenir le bouton BOOTSEL enfonce")
-    print("   3. Reconnecter le Pico (tout en maintenant BOOTSEL)")
-    print("   4. Relâcher BOOTSEL - le Pico apparaît comme lecteur USB")
-    print()
+def _resolve_monitor_port(target_name, project_path, port):
+    if port:
+        return port
+    cache = load_esp_flash_cache(project_path, TARGETS[target_name]["rust_target"])
+    ports = detect_serial_ports()
+    keys = {_serial_device_key(candidate): candidate for candidate in ports}
+    if cache.get("last") in keys:
+        return keys[cache["last"]]
+    if len(ports) == 1:
+        return ports[0]
+    if ports:
+        print(f"❌ Plusieurs ports serie detectes ({', '.join(ports)}), precisez --port", file=sys.stderr)
+    else:
+        print("❌ Aucun port serie detecte, precisez --port", file=sys.stderr)
+    return None
+
+def monitor_serial(target_name, project_path, port=None, baud=None, pattern=None, capture=True, duration=None):
+    """Affiche (et capture) la sortie serie de la carte jusqu'a Ctrl+C.
     
-    # Utiliser cargo run qui declenchera elf2uf2-rs comme runner
-    print("🚀 Compilation et flashage via cargo run...")
-    cargo_command = ["cargo", "run", "--release"]
+    Un thread lit le port par grands blocs dans un tampon circulaire borne;
+    le decoupage en lignes, l'horodatage, le retrait des codes ANSI, le
+    filtre `pattern` (affichage seulement) et l'ecriture des logs gzip
+    tournants se font a cote, sans jamais bloquer la lecture.
+    """
+    port = _resolve_monitor_port(target_name, project_path, port)
+    if not port:
+        return False
+    baud = baud or TARGETS[target_name].get("monitor_baud")
+    try:
+        line_filter = re.compile(pattern) if pattern else None
+        fd = open_serial_port(port, baud)
+    except (OSError, ValueError, re.error) as e:
+        print(f"❌ Impossible d'ouvrir le moniteur sur {port}: {e}", file=sys.stderr)
+        return False
     
-    result = subprocess.run(cargo_command, cwd=project_path)
+    writer = RotatingLogWriter(monitor_log_dir(project_path)) if capture else None
+    buffer = MonitorBuffer()
+    stop = threading.Event()
+    stats = {"bytes": 0, "lines": 0, "reconnects": 0}
+    reader = threading.Thread(target=_monitor_reader, args=(port, baud, fd, buffer, stop, stats),
+                              name="monitor-reader", daemon=True)
+    print(f"📟 Moniteur {port}" + (f" a {baud} bauds" if baud else "") + ", Ctrl+C pour arreter")
+    if writer:
+        print(f"💾 Capture: {writer.directory}")
     
-    if result.returncode == 0:
-        print("✅ Flashage Pico termine avec succes!")
-        return True
-    else:
-        print("❌ Erreur lors du flashage direct", file=sys.stderr)
-        return False
+    started = time.monotonic()
+    deadline = started + duration if duration else None
+    partial = b""
+    last_flush = started
+    reader.start()
+    try:
+        while not (deadline and time.monotonic() >= deadline):
+            chunks = buffer.get(MONITOR_FLUSH_INTERVAL)
+            if not chunks and buffer.closed:
+                break
+            if chunks:
+                lines, partial = _format_monitor_lines(chunks, partial)
+                stats["lines"] += len(lines)
+                if writer and lines:
+                    writer.write(("\n".join(lines) + "\n").encode("utf-8"))
+                shown = [line for line in lines if line_filter.search(line)] if line_filter else lines
+                if shown:
+                    with _output_lock:
+                        sys.stdout.write("\n".join(shown) + "\n")
+                        sys.stdout.flush()
+            if writer and time.monotonic() - last_flush >= 1:
+                writer.flush()
+                last_flush = time.monotonic()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        stop.set()
+        reader.join()
+        if writer:
+            if partial:
+                writer.write(partial + b"\n")
+            writer.close()
+    
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"👋 Moniteur arrete: {stats['lines']} lignes, {_format_size(stats['bytes'])} "
+          f"({_format_size(int(stats['bytes'] / elapsed))}/s)")
+    if buffer.dropped:
+        print(f"⚠️ {_format_size(buffer.dropped)} perdus: l'affichage n'a pas suivi (utilisez --filter)")
+    return True
 
-def flash_pico_uf2_binutils(project_path, elf_file):
-    """Flashage du Pico via cargo-binutils (generation .bin → UF2)."""
-    print("🔧 Tentative de generation UF2 via cargo-binutils...")
+def _read_log_lines(path):
+    """Lignes d'un log gzip, y compris celui en cours d'ecriture (fin tronquee ignoree)."""
+    lines = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                lines.append(line.rstrip("\n"))
+    except (OSError, EOFError):
+        pass
+    return lines
+
+def tail_monitor_logs(project_path, count, pattern=None):
+    """Affiche les `count` dernieres lignes capturees (filtrees par `pattern`)."""
+    try:
+        line_filter = re.compile(pattern) if pattern else None
+    except re.error as e:
+        print(f"❌ Filtre invalide: {e}", file=sys.stderr)
+        return False
+    logs = sorted(monitor_log_dir(project_path).glob("monitor-*.log.gz"))
+    if not logs:
+        print(f"❌ Aucun log capture dans {monitor_log_dir(project_path)}", file=sys.stderr)
+        return False
     
-    # Generer le fichier .bin depuis l'ELF
-    bin_file = elf_file.replace('.elf', '.bin') if elf_file.endswith('.elf') else elf_file + '.bin'
-    objcopy_command = ["cargo", "objcopy", "--release", "--", "-O", "binary", bin_file]
+    tail = collections.deque(maxlen=count)
+    # Du plus recent au plus ancien, jusqu'a avoir assez de lignes
+    for path in reversed(logs):
+        lines = _read_log_lines(path)
+        if line_filter:
+            lines = [line for line in lines if line_filter.search(line)]
+        tail.extendleft(reversed(lines[-(count - len(tail)):]))
+        if len(tail) >= count:
+            break
+    print("\n".join(tail))
+    return True
+
+@traced
+def load_defmt_table(elf_file):
+    """Table des formats defmt de l'ELF, indexee une fois puis mise en cache par empreinte de l'ELF."""
+    digest = _file_sha256(elf_file)
+    path = DEFMT_CACHE_DIR / f"{digest}.json"
+    try:
+        with open(path, "r") as f:
+            cached = json.load(f)
+        if cached.get("version") == DEFMT_TABLE_VERSION:
+            return cached
+    except (OSError, ValueError):
+        pass
     
-    result = subprocess.run(objcopy_command, cwd=project_path, capture_output=True, text=True)
+    table = {"version": DEFMT_TABLE_VERSION, **defmtdecoder.read_table(elf_file)}
+    try:
+        DEFMT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(table, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Table defmt non mise en cache: {e}")
+    return table
+
+def _format_defmt_message(timestamp, level, message):
+    return " ".join(part for part in (timestamp, level and f"{level:<5}", message) if part)
+
+def decode_defmt_logs(target_name, project_path, source=None, port=None, baud=None, pattern=None,
+                      encoding="rzcobs", duration=None):
+    """Decode des logs defmt (capture RTT ou serie, fichier, `-` pour stdin, ou port serie en direct).
     
-    if result.returncode != 0:
-        print(f"❌ Erreur generation binaire:", file=sys.stderr)
-        print(result.stderr, file=sys.stderr)
+    Les formats sont lus dans l'ELF du projet: la carte n'envoie que des
+    index et des arguments binaires. Le flux est decode par grands blocs;
+    un port serie est lu par le meme lecteur non bloquant que `monitor`.
+    """
+    elf_file = find_elf_file(project_path, TARGETS[target_name]["rust_target"])
+    if not elf_file:
+        return False
+    try:
+        line_filter = re.compile(pattern) if pattern else None
+        decoder = defmtdecoder.DefmtDecoder(load_defmt_table(elf_file), encoding)
+    except (defmtdecoder.DefmtError, ElfError, OSError, ValueError, re.error) as e:
+        print(f"❌ Decodage defmt impossible: {e}", file=sys.stderr)
         return False
     
-    print(f"✅ Fichier binaire cree: {bin_file}")
-    
-    # Convertir .bin vers UF2
-    uf2_file = bin_file.replace('.bin', '.uf2')
+    stats = {"bytes": 0, "messages": 0, "reconnects": 0}
     
-    # Essayer d'abord elf2uf2-rs
-    convert_command = ["elf2uf2-rs", bin_file, uf2_file]
-    result = subprocess.run(convert_command, cwd=project_path, capture_output=True, text=True)
+    def emit(data):
+        messages = decoder.feed(data)
+        stats["messages"] += len(messages)
+        lines = [_format_defmt_message(*message) for message in messages]
+        if line_filter:
+            lines = [line for line in lines if line_filter.search(line)]
+        if lines:
+            with _output_lock:
+                sys.stdout.write("\n".join(lines) + "\n")
+                sys.stdout.flush()
     
-    if result.returncode != 0:
-        print(f"⚠️ elf2uf2-rs a echoue, utilisation du convertisseur personnalise...")
-        # Utiliser notre convertisseur UF2 personnalise
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        uf2conv_path = os.path.join(script_dir, "uf2conv.py")
-        
-        if os.path.exists(uf2conv_path):
-            custom_command = ["python3", uf2conv_path, bin_file, uf2_file]
-            result = subprocess.run(custom_command, cwd=project_path, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"❌ Erreur conversion .bin vers UF2 (convertisseur personnalise):", file=sys.stderr)
-                print(result.stderr, file=sys.stderr)
-                return False
-        else:
-            print(f"❌ Convertisseur personnalise non trouve: {uf2conv_path}", file=sys.stderr)
+    if source and source != "-" and not port:
+        if not os.path.exists(source):
+            print(f"❌ Source introuvable: {source}", file=sys.stderr)
             return False
+        if Path(source).is_char_device():
+            port = source
     
-    print(f"✅ Fichier UF2 cree: {uf2_file}")
-    
-    # Copier automatiquement vers le Pico si detecte
-    pico_mount_path = detect_pico_uf2_disk()
-    if pico_mount_path:
-        import shutil
-        dest_path = os.path.join(pico_mount_path, os.path.basename(uf2_file))
+    started = time.monotonic()
+    if port:
         try:
-            shutil.copy2(uf2_file, dest_path)
-            print(f"✅ Fichier UF2 copie vers le Pico: {dest_path}")
-            print("🎉 Flashage termine! Le Pico va redemarrer automatiquement.")
-        except Exception as e:
-            print(f"⚠️ Erreur lors de la copie vers le Pico: {e}")
-            print(f"📋 Copiez manuellement le fichier: {uf2_file}")
-            print(f"📋 Vers le lecteur Pico: {pico_mount_path}")
+            fd = open_serial_port(port, baud)
+        except (OSError, ValueError) as e:
+            print(f"❌ Impossible d'ouvrir {port}: {e}", file=sys.stderr)
+            return False
+        buffer = MonitorBuffer()
+        stop = threading.Event()
+        reader = threading.Thread(target=_monitor_reader, args=(port, baud, fd, buffer, stop, stats),
+                                  name="defmt-reader", daemon=True)
+        print(f"📟 Logs defmt sur {port}, Ctrl+C pour arreter", file=sys.stderr)
+        reader.start()
+        deadline = started + duration if duration else None
+        try:
+            while not (deadline and time.monotonic() >= deadline):
+                chunks = buffer.get(MONITOR_FLUSH_INTERVAL)
+                if not chunks and buffer.closed:
+                    break
+                if chunks:
+                    emit(b"".join(data for _, data in chunks))
+        except KeyboardInterrupt:
+            print(file=sys.stderr)
+        finally:
+            stop.set()
+            reader.join()
+        if buffer.dropped:
+            print(f"⚠️ {_format_size(buffer.dropped)} perdus: le decodage n'a pas suivi", file=sys.stderr)
     else:
-        print(f"⚠️ Pico non detecte en mode BOOTSEL")
-        print(f"📋 Copiez manuellement le fichier: {uf2_file}")
-        print(f"📋 Vers le lecteur Pico une fois connecte en mode BOOTSEL")
+        if not source:
+            print("❌ Precisez --input (capture RTT/serie, '-' pour stdin) ou --port", file=sys.stderr)
+            return False
+        stream = sys.stdin.buffer if source == "-" else open(source, "rb")
+        try:
+            for chunk in iter(lambda: stream.read(DEFMT_READ_SIZE), b""):
+                stats["bytes"] += len(chunk)
+                emit(chunk)
+        except KeyboardInterrupt:
+            print(file=sys.stderr)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
     
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(f"📊 {stats['messages']} messages decodes, {_format_size(stats['bytes'])} "
+          f"({int(stats['messages'] / elapsed)} messages/s)", file=sys.stderr)
+    if decoder.errors:
+        print(f"⚠️ {decoder.errors} trame(s) invalide(s) ignoree(s) (ELF different du firmware ?)", file=sys.stderr)
     return True
 
-def create_simple_uf2_guide(project_path):
-    """Cree un guide simple pour flasher manuellement le Pico."""
-    print("📖 Guide de flashage manuel Pico:")
-    print()
-    print("1. 🔄 Recompilez le projet avec la configuration correcte:")
-    print(f"   cd {project_path}")
-    print("   cargo build --release")
-    print()
-    print("2. 📁 Creez un nouveau projet Pico avec l'extension pour la bonne config:")
-    print("   python3 main.py create --target pico --project-name nouveau-pico")
-    print()
-    print("3. 📋 Mode BOOTSEL:")
-    print("   - Debranchez le Pico")
-    print("   - Maintenez BOOTSEL enfonce")
-    print("   - Rebranchez le Pico")
-    print("   - Relâchez BOOTSEL")
-    print("   - Le Pico apparaît comme lecteur USB")
-    print()
-    print("4. 🎯 Utilisez probe-rs en mode SWD (si debogueur disponible):")
-    print(f"   cd {project_path}")
-    print("   cargo run --release")
-    print()
-    return True
+def register_command(handle):
+    """Rattache une execution du moteur de processus a la requete serve en cours (pour l'annulation)."""
+    request = getattr(_rpc_context, "request", None)
+    if request is not None:
+        request["commands"].append(handle)
+        if request["cancelled"].is_set():
+            handle.cancel()
 
-def flash_pico_uf2(project_path, elf_file):
-    """Flashage du Pico en mode BOOTSEL (UF2) - Fallback manuel."""
-    print("📋 Flashage Pico en mode BOOTSEL (UF2)")
-    print("ℹ️  Ce mode necessite que le Pico soit connecte en mode BOOTSEL :")
-    print("   1. Debrancher le Pico")
-    print("   2. Maintenir le bouton BOOTSEL enfonce")
-    print("   3. Reconnecter le Pico (tout en maintenant BOOTSEL)")
-    print("   4. Relâcher BOOTSEL - le Pico apparaît comme lecteur USB")
-    print()
+class _RequestOutput(io.TextIOBase):
+    """Remplace sys.stdout/sys.stderr en mode serve.
     
-    # Essayer d'abord la methode directe
-    if flash_pico_uf2_direct(project_path):
+    Les lignes ecrites par le thread d'une requete deviennent des
+    notifications `progress` de cette requete; le reste part vers `fallback`.
+    """
+
+    def __init__(self, fallback, stream):
+        self.fallback = fallback
+        self.stream = stream
+
+    def writable(self):
         return True
-    
-    # Essayer la methode binutils avec fallback
-    print("🔧 Methode directe echouee, tentative via cargo-binutils...")
-    if flash_pico_uf2_binutils(project_path, elf_file):
+
+    def write(self, text):
+        request = getattr(_rpc_context, "request", None)
+        if request is None:
+            return self.fallback.write(text)
+        buffer = request["buffers"].get(self.stream, "") + text
+        *lines, rest = buffer.split("\n")
+        request["buffers"][self.stream] = rest
+        for line in lines:
+            request["emit"]({"id": request["id"], "stream": self.stream, "message": line})
+        return len(text)
+
+    def flush(self):
+        request = getattr(_rpc_context, "request", None)
+        if request is None:
+            self.fallback.flush()
+
+def _rpc_build(params):
+    return build_project(params["target"], params.get("projectPath", "."), force=params.get("force", False),
+                         profile=params.get("profile", False))
+
+def _rpc_flash(params):
+    flash_options = {"baud": params.get("baud"), "port": params.get("port"), "flash_mode": params.get("flashMode"),
+                     "flash_freq": params.get("flashFreq"), "auto_baud": params.get("autoBaud", False)}
+    return flash_project(params["target"], params.get("projectPath", "."), delta=params.get("delta", False),
+                         all_devices=params.get("allDevices", False), devices=params.get("devices"),
+                         flash_options=flash_options)
+
+def _rpc_create(params):
+    return create_project(params["projectName"], params["target"], params.get("projectPath", "."),
+                          prefetch=params.get("prefetch", True), offline=params.get("offline", False))
+
+def _rpc_doctor(params):
+    # Seule requete qui revalide l'inventaire (stat des binaires): un outil a pu
+    # etre installe hors du demon
+    reset_toolchain_inventory()
+    return get_toolchain_inventory(refresh=params.get("refresh", False))
+
+RPC_METHODS = {
+    "build": _rpc_build,
+    "flash": _rpc_flash,
+    "create": _rpc_create,
+    "doctor": _rpc_doctor,
+}
+
+class RpcSession:
+    """Session JSON-RPC 2.0 (un message JSON par ligne) sur un couple de flux."""
+
+    def __init__(self, reader, writer, pool):
+        self.reader = reader
+        self.writer = writer
+        self.pool = pool
+        self.lock = threading.Lock()
+        # Requetes en cours par id (les notifications, sans id, n'y figurent pas)
+        self.requests = {}
+        self.requests_lock = threading.Lock()
+
+    def send(self, message):
+        data = json.dumps(message, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.writer.write(data)
+            self.writer.flush()
+
+    def notify(self, method, params):
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def reply(self, request_id, result=None, error=None):
+        message = {"jsonrpc": "2.0", "id": request_id}
+        if error is not None:
+            message["error"] = error
+        else:
+            message["result"] = result
+        self.send(message)
+
+    def cancel(self, request_id):
+        if not isinstance(request_id, (str, int)):
+            return False
+        with self.requests_lock:
+            request = self.requests.get(request_id)
+        if request is None:
+            return False
+        request["cancelled"].set()
+        for handle in list(request["commands"]):
+            handle.cancel()
         return True
-    
-    # Si toutes les methodes automatiques echouent, donner des instructions
-    print("💡 Les methodes automatiques ont echoue.")
-    print()
-    return create_simple_uf2_guide(project_path)
 
-def detect_pico_uf2_disk():
-    """Detecte si le Pico est connecte en mode BOOTSEL (lecteur UF2)."""
-    import glob
-    
-    # Chemins typiques pour un Pico en mode BOOTSEL
-    pico_paths = [
-        "/media/*/RPI-RP2",      # Linux
-        "/Volumes/RPI-RP2",      # macOS
-    ]
-    
-    for pattern in pico_paths:
-        matches = glob.glob(pattern)
-        if matches:
-            path = matches[0]
-            print(f"Found pico uf2 disk {path}")
-            return path
-    
-    return None
+    def _run(self, request, handler, params):
+        _rpc_context.request = request
+        try:
+            result = handler(params)
+            error = None
+        except SystemExit as e:
+            result, error = None, {"code": RPC_ACTION_FAILED, "message": f"Action interrompue (code {e.code})"}
+        except (KeyError, TypeError) as e:
+            result, error = None, {"code": RPC_INVALID_PARAMS, "message": f"Parametre invalide: {e}"}
+        except Exception as e:
+            result, error = None, {"code": RPC_ACTION_FAILED, "message": str(e)}
+        finally:
+            for stream, rest in request["buffers"].items():
+                if rest:
+                    self.notify("progress", {"id": request["id"], "stream": stream, "message": rest})
+            _rpc_context.request = None
+            if request["id"] is not None:
+                with self.requests_lock:
+                    self.requests.pop(request["id"], None)
+        
+        if request["id"] is None:
+            # Notification: pas de reponse
+            return
+        if request["cancelled"].is_set():
+            error = {"code": RPC_REQUEST_CANCELLED, "message": "Requete annulee"}
+        elif error is None and result is False:
+            error = {"code": RPC_ACTION_FAILED, "message": "L'action a echoue"}
+        self.reply(request["id"], None if error else result, error)
 
-def detect_pico_flash_mode():
-    """Detecte la methode de flashage disponible pour le Pico."""
-    # Priorite au mode BOOTSEL (plus simple, pas de materiel supplementaire)
-    if check_tool_installed("elf2uf2-rs"):
-        return "bootsel"
+    def handle(self, message):
+        if not isinstance(message, dict):
+            self.reply(None, error={"code": RPC_INVALID_REQUEST, "message": "Message JSON-RPC invalide"})
+            return True
+        request_id = message.get("id")
+        method = message.get("method")
+        params = message.get("params") or {}
+        if request_id is not None and (isinstance(request_id, bool) or not isinstance(request_id, (str, int))):
+            self.reply(None, error={"code": RPC_INVALID_REQUEST, "message": "Id invalide (chaine ou entier)"})
+            return True
+        if not isinstance(params, dict):
+            self.reply(request_id, error={"code": RPC_INVALID_REQUEST, "message": "Parametres invalides (objet attendu)"})
+            return True
+        
+        if method in ("$/cancelRequest", "cancel"):
+            cancelled = self.cancel(params.get("id"))
+            if request_id is not None:
+                self.reply(request_id, cancelled)
+            return True
+        if method in ("shutdown", "exit"):
+            if request_id is not None:
+                self.reply(request_id, None)
+            return False
+        
+        handler = RPC_METHODS.get(method)
+        if handler is None:
+            if request_id is not None:
+                self.reply(request_id, error={"code": RPC_METHOD_NOT_FOUND, "message": f"Methode inconnue: {method}"})
+            return True
+        
+        request = {
+            "id": request_id,
+            "cancelled": threading.Event(),
+            "commands": [],
+            "buffers": {},
+            "emit": lambda params: self.notify("progress", params),
+        }
+        if request_id is not None:
+            with self.requests_lock:
+                duplicate = request_id in self.requests
+                if not duplicate:
+                    self.requests[request_id] = request
+            if duplicate:
+                # Deux requetes de meme id: annulation et reponse seraient ambigues
+                self.reply(request_id, error={"code": RPC_INVALID_REQUEST, "message": f"Id deja en cours: {request_id}"})
+                return True
+        self.pool.submit(self._run, request, handler, params)
+        return True
+
+    def serve(self):
+        """Traite les messages jusqu'a `shutdown` ou la fermeture du flux."""
+        for line in self.reader:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                self.reply(None, error={"code": RPC_PARSE_ERROR, "message": "JSON invalide"})
+                continue
+            if not self.handle(message):
+                break
+        with self.requests_lock:
+            pending = list(self.requests)
+        for request_id in pending:
+            self.cancel(request_id)
+
+def serve(socket_path=None):
+    """Demon JSON-RPC pour l'extension: stdio par defaut, ou socket Unix."""
+    pool = ThreadPoolExecutor(max_workers=RPC_MAX_WORKERS)
     
-    # Fallback vers mode SWD si debogueur disponible
-    if check_tool_installed("probe-rs"):
-        return "swd"
+    if socket_path is None:
+        # Le canal JSON-RPC garde le vrai stdout; tout ce que les outils
+        # lances ecrivent sur le descripteur 1 est renvoye sur stderr
+        rpc_out = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+        sys.stdout.flush()
+        os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+        sys.stdout = _RequestOutput(sys.stderr, "stdout")
+        sys.stderr = _RequestOutput(sys.stderr, "stderr")
+        session = RpcSession(sys.stdin, rpc_out, pool)
+        session.notify("ready", {"pid": os.getpid()})
+        session.serve()
+        pool.shutdown(wait=True)
+        return True
     
-    return None
+    sys.stdout = _RequestOutput(sys.stdout, "stdout")
+    sys.stderr = _RequestOutput(sys.stderr, "stderr")
+    
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            reader = io.TextIOWrapper(self.rfile, encoding="utf-8")
+            writer = io.TextIOWrapper(self.wfile, encoding="utf-8")
+            RpcSession(reader, writer, pool).serve()
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, Handler)
+    print(f"🔌 Serveur JSON-RPC en ecoute sur {socket_path}", file=sys.__stderr__)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+        pool.shutdown(wait=False)
+    return True
 
 def main():
     """Fonction principale pour parser les arguments et lancer les actions."""
+    # Mode RUSTC_WRAPPER: appele par cargo avec la ligne de commande de rustc
+    if sys.argv[1:2] == ["rustc-wrapper"]:
+        sys.exit(rustc_wrapper(sys.argv[2:]))
+    
     parser = argparse.ArgumentParser(description="Outil de build et flash pour Rust Embarque.")
-    parser.add_argument("action", choices=["build", "flash", "create", "install-target", "install-tools", "setup"], 
+    parser.add_argument("action", choices=["build", "flash", "create", "install-target", "install-tools", "setup",
+                                           "doctor", "tools-export", "tools-import", "watch",
+                                           "serve", "build-report", "size", "monitor", "logs", "cache-stats",
+                                           "prefetch", "analyze-stack"],
                        help="L'action a effectuer.")
-    parser.add_argument("--target", choices=TARGETS.keys(), help="La carte cible.")
+    parser.add_argument("--target", choices=[*TARGETS.keys(), "all"],
+                       help="La carte cible (build accepte 'all' pour toutes les cartes).")
     parser.add_argument("--project-path", default=".", help="Le chemin vers le projet Rust.")
+    parser.add_argument("--projects", nargs="+", metavar="CHEMIN",
+                       help="build: plusieurs projets (chemins ou globs) compiles en parallele.")
     parser.add_argument("--project-name", help="Le nom du nouveau projet (pour l'action create).")
+    parser.add_argument("-j", "--jobs", type=int,
+                       help="Budget de coeurs CPU pour les compilations (defaut: tous).")
+    parser.add_argument("--archive", help="tools-export/tools-import: archive tar.gz du cache des outils.")
+    parser.add_argument("--json", action="store_true",
+                       help="doctor, build-report, size, analyze-stack, cache-stats: sortie au format JSON.")
+    parser.add_argument("--force", action="store_true",
+                       help="build: lancer cargo meme si les sources n'ont pas change.")
+    parser.add_argument("--no-rustc-cache", action="store_true",
+                       help="build, watch: ne pas utiliser le cache des compilations rustc partage entre projets.")
+    parser.add_argument("--profile-build", action="store_true",
+                       help="build: mesurer la duree de chaque crate (cargo --timings) et l'historiser.")
+    parser.add_argument("--budget", nargs="+", default=[], metavar="REGION=LIMITE",
+                       help="build, size: budget de taille (ex: FLASH=90%% RAM=200K), echec si depasse.")
+    parser.add_argument("--emit-stack-sizes", action="store_true",
+                       help="analyze-stack: compiler avec -Z emit-stack-sizes (nightly) pour des tailles exactes.")
+    parser.add_argument("--no-prefetch", action="store_true",
+                       help="create: ne pas telecharger ni precompiler les dependances en arriere-plan.")
+    parser.add_argument("--offline", action="store_true",
+                       help="create, prefetch: sans reseau (cache cargo, miroir local ou dossier vendor).")
+    parser.add_argument("--no-flash", action="store_true",
+                       help="watch: recompiler a chaque sauvegarde sans flasher.")
+    parser.add_argument("--socket", help="serve: ecouter sur ce socket Unix au lieu de stdio.")
+    parser.add_argument("--all-devices", action="store_true",
+                       help="flash: flasher en parallele toutes les cartes connectees (BOOTSEL ou ports serie).")
+    parser.add_argument("--devices", nargs="+", metavar="CHEMIN",
+                       help="flash: lecteurs BOOTSEL ou ports serie a flasher (remplace la detection).")
+    parser.add_argument("--port", help="flash (ESP32-C3), monitor: port serie a utiliser (defaut: carte du dernier flashage).")
+    parser.add_argument("--baud", type=int, help="flash (ESP32-C3), monitor: debit du port serie en bauds.")
+    parser.add_argument("--auto-baud", action="store_true",
+                       help="ESP32-C3: essayer les debits les plus rapides et retenir le premier qui fonctionne.")
+    parser.add_argument("--flash-mode", choices=["qio", "qout", "dio", "dout"],
+                       help="ESP32-C3: mode de la flash SPI (defaut: dio).")
+    parser.add_argument("--flash-freq", help="ESP32-C3: frequence de la flash SPI (ex: 40mhz, 80mhz).")
+    parser.add_argument("--filter", metavar="REGEX", help="monitor, logs: n'afficher que les lignes correspondantes.")
+    parser.add_argument("--input", metavar="FICHIER",
+                       help="logs: flux defmt a decoder (capture RTT ou serie, port, '-' pour stdin).")
+    parser.add_argument("--encoding", choices=["rzcobs", "raw"], default="rzcobs",
+                       help="logs: encodage des trames defmt (defaut: rzcobs).")
+    parser.add_argument("--tail", type=int, nargs="?", const=MONITOR_TAIL_LINES, metavar="N",
+                       help="monitor: afficher les N dernieres lignes capturees au lieu d'ouvrir le port.")
+    parser.add_argument("--no-capture", action="store_true",
+                       help="monitor: ne pas enregistrer la sortie dans target/rust-embedded/logs.")
+    parser.add_argument("--delta", action="store_true",
+                       help="Pico BOOTSEL: n'envoyer que les pages modifiees depuis le dernier flashage.")
+    parser.add_argument("--trace", metavar="FICHIER",
+                       help="Enregistrer la duree de chaque etape (format Chrome trace-event, chrome://tracing).")
     
     args = parser.parse_args()
+    if args.trace:
+        start_trace(args.trace)
+    try:
+        with trace_span(args.action, "action"):
+            run_action(args)
+    finally:
+        finish_trace()
+
+def run_action(args):
+    """Execute l'action demandee sur la ligne de commande."""
     project_path = args.project_path
+    if args.no_rustc_cache:
+        os.environ["RUST_EMBEDDED_RUSTC_CACHE"] = "0"
+    
+    if args.target == "all" and args.action != "build":
+        print("❌ --target all n'est disponible que pour l'action build")
+        sys.exit(1)
     
     # --- Action: create ---
     if args.action == "create":
@@ -533,7 +5056,33 @@ def main():
         if not args.target:
             print("❌ La target est requise pour creer un nouveau projet")
             sys.exit(1)
-        create_project(args.project_name, args.target, project_path)
+        if not create_project(args.project_name, args.target, project_path, prefetch=not args.no_prefetch,
+                              offline=args.offline):
+            sys.exit(1)
+        
+    # --- Action: serve ---
+    elif args.action == "serve":
+        serve(args.socket)
+        
+    # --- Action: doctor ---
+    elif args.action == "doctor":
+        print_toolchain_inventory(as_json=args.json)
+        
+    # --- Action: cache-stats ---
+    elif args.action == "cache-stats":
+        print_rustc_cache_stats(as_json=args.json)
+        
+    # --- Actions: tools-export / tools-import ---
+    elif args.action in ("tools-export", "tools-import"):
+        if not args.archive:
+            print("❌ --archive est requis pour exporter ou importer le cache des outils")
+            sys.exit(1)
+        if args.action == "tools-export":
+            ok = export_tool_cache(args.archive)
+        else:
+            ok = import_tool_cache(args.archive)
+        if not ok:
+            sys.exit(1)
         
     # --- Action: install-target ---
     elif args.action == "install-target":
@@ -553,109 +5102,99 @@ def main():
             # Installation speciale pour Pico (les deux outils)
             if args.target == "pico":
                 print("📋 Installation des outils pour Pico RP2040...")
-                
-                # Installer llvm-tools-preview pour cargo objcopy
-                print("📋 Installation de llvm-tools-preview...")
-                llvm_command = ["rustup", "component", "add", "llvm-tools-preview"]
-                result = subprocess.run(llvm_command, capture_output=True, text=True)
-                if result.returncode != 0:
-                    print("⚠️ Impossible d'installer llvm-tools-preview")
-                else:
-                    print("✅ llvm-tools-preview installe")
-                
-                install_tool("elf2uf2-rs")  # Mode BOOTSEL (recommande)
-                install_tool("probe-rs")    # Mode SWD (debogueur)
+                # llvm-tools-preview pour cargo objcopy, elf2uf2-rs pour le
+                # mode BOOTSEL (recommande), probe-rs pour le mode SWD (debogueur)
+                ok = install_all(tool_names=["elf2uf2-rs", "probe-rs"], llvm_tools=True,
+                                 cpu_budget=args.jobs)
             else:
                 # Installation normale pour les autres targets
-                install_tool(target_config["flasher"])
+                ok = install_all(tool_names=[target_config["flasher"]], cpu_budget=args.jobs)
         else:
             # Installer tous les outils
-            for tool_name in TOOLS.keys():
-                install_tool(tool_name)
+            ok = install_all(tool_names=list(TOOLS.keys()), cpu_budget=args.jobs)
+        if not ok:
+            sys.exit(1)
                 
     # --- Action: setup ---
     elif args.action == "setup":
         print("🔧 Configuration de l'environnement de developpement...")
         
-        # Installer toutes les targets
-        for config in TARGETS.values():
-            install_rust_target(config["rust_target"])
-            
-        # Installer tous les outils
-        for tool_name in TOOLS.keys():
-            install_tool(tool_name)
+        # Installer toutes les targets et tous les outils en parallele
+        ok = install_all(rust_targets=[config["rust_target"] for config in TARGETS.values()],
+                         tool_names=list(TOOLS.keys()), llvm_tools=True, cpu_budget=args.jobs)
+        if not ok:
+            print("❌ La configuration de l'environnement est incomplete", file=sys.stderr)
+            sys.exit(1)
             
         print("✅ Environnement configure avec succes!")
         
+    # --- Action: build (plusieurs targets et/ou projets) ---
+    elif args.action == "build" and args.target and (args.target == "all" or args.projects):
+        target_names = list(TARGETS.keys()) if args.target == "all" else [args.target]
+        project_paths = resolve_project_paths(args.projects or [project_path])
+        if not project_paths:
+            print("❌ Aucun projet Cargo trouve", file=sys.stderr)
+            sys.exit(1)
+        if not build_matrix(project_paths, target_names, args.jobs):
+            sys.exit(1)
+        
     # Actions necessitant une target
     elif args.target:
         target_config = TARGETS[args.target]
         
         # --- Action: build ---
         if args.action == "build":
-            print(f"🛠️  Compilation pour {args.target}...")
-            build_command = [
-                "cargo", "build", 
-                "--release",
-                "--target", target_config["rust_target"]
-            ]
-            run_command(build_command, project_path)
+            if not build_project(args.target, project_path, force=args.force, profile=args.profile_build,
+                                 budget_specs=args.budget):
+                sys.exit(1)
+        
+        # --- Action: prefetch ---
+        elif args.action == "prefetch":
+            if not run_prefetch(args.target, project_path, offline=args.offline):
+                sys.exit(1)
+        
+        # --- Action: size ---
+        elif args.action == "size":
+            if not firmware_size(args.target, project_path, args.budget, as_json=args.json):
+                sys.exit(1)
+        
+        # --- Action: analyze-stack ---
+        elif args.action == "analyze-stack":
+            if not stack_usage(args.target, project_path, emit_stack_sizes=args.emit_stack_sizes, as_json=args.json):
+                sys.exit(1)
+        
+        # --- Action: build-report ---
+        elif args.action == "build-report":
+            if not build_report(args.target, project_path, as_json=args.json):
+                sys.exit(1)
             
         # --- Action: flash ---
         elif args.action == "flash":
-            print(f"⚡ Televersement sur {args.target}...")
-            
-            # 1. Trouver le fichier binaire (.elf)
-            elf_file = find_elf_file(project_path, target_config["rust_target"])
-            if not elf_file:
+            flash_options = {"baud": args.baud, "port": args.port, "flash_mode": args.flash_mode,
+                             "flash_freq": args.flash_freq, "auto_baud": args.auto_baud}
+            if not flash_project(args.target, project_path, delta=args.delta, all_devices=args.all_devices,
+                                 devices=args.devices, flash_options=flash_options):
                 sys.exit(1)
-            
-            print(f"📁 Fichier binaire trouve : {elf_file}")
-
-            # 2. Traitement special pour Pico (RP2040)
-            if args.target == "pico":
-                flash_mode = detect_pico_flash_mode()
-                
-                if flash_mode == "bootsel":
-                    # Mode BOOTSEL (recommande, plus simple)
-                    print("🎯 Utilisation du mode BOOTSEL (UF2)")
-                    if flash_pico_uf2(project_path, elf_file):
-                        print("✅ Flashage Pico termine avec succes!")
-                    else:
-                        sys.exit(1)
-                        
-                elif flash_mode == "swd":
-                    # Mode SWD avec probe-rs (necessite debogueur)
-                    print("🎯 Utilisation du mode SWD avec probe-rs")
-                    print("⚠️  Ce mode necessite un debogueur SWD connecte au Pico")
-                    flash_command = ["probe-rs", "run", "--chip", target_config["chip"], elf_file]
-                    run_command(flash_command, project_path)
-                    
-                else:
-                    # Aucun outil de flashage disponible
-                    print(f"❌ Aucun outil de flashage pour Pico n'est installe.", file=sys.stderr)
-                    print(f"", file=sys.stderr)
-                    print(f"💡 Solutions pour Pico RP2040:", file=sys.stderr)
-                    print(f"   1. Mode BOOTSEL (recommande): cargo install elf2uf2-rs --locked", file=sys.stderr)
-                    print(f"   2. Mode SWD (avec debogueur): cargo install probe-rs-tools --locked", file=sys.stderr)
-                    print(f"   3. Installation automatique: python3 {sys.argv[0]} install-tools --target pico", file=sys.stderr)
-                    print(f"   4. Configuration complete: python3 {sys.argv[0]} setup", file=sys.stderr)
-                    sys.exit(1)
-                    
-            # 3. Traitement pour ESP32-C3
-            elif args.target == "esp32c3":
-                flasher = target_config["flasher"]
-                if not check_tool_installed(flasher):
-                    print(f"❌ L'outil de flashage '{flasher}' n'est pas installe.", file=sys.stderr)
-                    print(f"", file=sys.stderr)
-                    print(f"💡 Solutions:", file=sys.stderr)
-                    print(f"   1. Installation manuelle: cargo install {flasher}", file=sys.stderr)
-                    print(f"   2. Installation automatique: python3 {sys.argv[0]} install-tools --target {args.target}", file=sys.stderr)
-                    print(f"   3. Configuration complete: python3 {sys.argv[0]} setup", file=sys.stderr)
-                    sys.exit(1)
-                
-                flash_command = ["espflash", "flash", "-M", "dio", elf_file]
-                run_command(flash_command, project_path)
+        
+        # --- Action: monitor ---
+        elif args.action == "monitor":
+            if args.tail:
+                ok = tail_monitor_logs(project_path, args.tail, args.filter)
+            else:
+                ok = monitor_serial(args.target, project_path, port=args.port, baud=args.baud,
+                                    pattern=args.filter, capture=not args.no_capture)
+            if not ok:
+                sys.exit(1)
+        
+        # --- Action: logs ---
+        elif args.action == "logs":
+            if not decode_defmt_logs(args.target, project_path, source=args.input, port=args.port, baud=args.baud,
+                                     pattern=args.filter, encoding=args.encoding):
+                sys.exit(1)
+        
+        # --- Action: watch ---
+        elif args.action == "watch":
+            watch_project(args.target, project_path, flash=not args.no_flash)
     else:
         print("❌ Target requise pour cette action")
         sys.exit(1)
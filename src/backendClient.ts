@@ -0,0 +1,140 @@
+import { ChildProcess, spawn } from 'child_process';
+import * as vscode from 'vscode';
+
+export interface ProgressEvent {
+    id: number;
+    stream: 'stdout' | 'stderr';
+    message: string;
+}
+
+interface PendingRequest {
+    resolve: (result: any) => void;
+    reject: (error: Error) => void;
+    onProgress?: (event: ProgressEvent) => void;
+}
+
+/**
+ * Client du backend Python lance une seule fois en mode `serve`.
+ * Les requetes JSON-RPC (une par ligne) partagent le meme processus, qui
+ * garde ses caches (outils, projets, empreintes) chauds entre deux actions.
+ */
+export class BackendClient implements vscode.Disposable {
+    private process: ChildProcess | null = null;
+    private buffer = '';
+    private nextId = 1;
+    private pending = new Map<number, PendingRequest>();
+
+    constructor(
+        private readonly scriptPath: string,
+        private readonly getPythonCommand: () => string,
+        private readonly output: vscode.OutputChannel
+    ) {}
+
+    private start(): ChildProcess {
+        if (this.process && this.process.exitCode === null) {
+            return this.process;
+        }
+
+        const child = spawn(this.getPythonCommand(), [this.scriptPath, 'serve'], {
+            stdio: ['pipe', 'pipe', 'pipe']
+        });
+        child.stdout?.setEncoding('utf8');
+        child.stdout?.on('data', (chunk: string) => this.onData(chunk));
+        child.stderr?.setEncoding('utf8');
+        child.stderr?.on('data', (chunk: string) => this.output.append(chunk));
+        child.on('exit', () => {
+            this.process = null;
+            this.buffer = '';
+            for (const request of this.pending.values()) {
+                request.reject(new Error('Le backend Python s\'est arrete'));
+            }
+            this.pending.clear();
+        });
+        child.on('error', (error) => {
+            // Echec du spawn (ENOENT...): 'exit' n'arrive jamais, le prochain start() relance
+            this.process = null;
+            this.buffer = '';
+            for (const request of this.pending.values()) {
+                request.reject(error);
+            }
+            this.pending.clear();
+        });
+
+        this.process = child;
+        return child;
+    }
+
+    private onData(chunk: string): void {
+        this.buffer += chunk;
+        let newline = this.buffer.indexOf('\n');
+        while (newline >= 0) {
+            const line = this.buffer.slice(0, newline).trim();
+            this.buffer = this.buffer.slice(newline + 1);
+            if (line) {
+                this.onMessage(line);
+            }
+            newline = this.buffer.indexOf('\n');
+        }
+    }
+
+    private onMessage(line: string): void {
+        let message: any;
+        try {
+            message = JSON.parse(line);
+        } catch {
+            this.output.appendLine(line);
+            return;
+        }
+
+        if (message.method === 'progress') {
+            const event = message.params as ProgressEvent;
+            this.output.appendLine(event.message);
+            this.pending.get(event.id)?.onProgress?.(event);
+            return;
+        }
+
+        const request = this.pending.get(message.id);
+        if (!request) {
+            return;
+        }
+        this.pending.delete(message.id);
+        if (message.error) {
+            request.reject(new Error(message.error.message));
+        } else {
+            request.resolve(message.result);
+        }
+    }
+
+    private send(message: object): void {
+        this.start().stdin?.write(JSON.stringify(message) + '\n');
+    }
+
+    request<T = any>(method: string, params: object = {}, onProgress?: (event: ProgressEvent) => void,
+                     token?: vscode.CancellationToken): Promise<T> {
+        const id = this.nextId++;
+        return new Promise<T>((resolve, reject) => {
+            this.pending.set(id, { resolve, reject, onProgress });
+            token?.onCancellationRequested(() => this.cancel(id));
+            try {
+                this.send({ jsonrpc: '2.0', id, method, params });
+            } catch (error) {
+                this.pending.delete(id);
+                reject(error);
+            }
+        });
+    }
+
+    cancel(id: number): void {
+        if (this.pending.has(id)) {
+            this.send({ jsonrpc: '2.0', method: '$/cancelRequest', params: { id } });
+        }
+    }
+
+    dispose(): void {
+        if (this.process) {
+            this.process.stdin?.write(JSON.stringify({ jsonrpc: '2.0', method: 'exit' }) + '\n');
+            this.process.stdin?.end();
+            this.process = null;
+        }
+    }
+}
@@ -1,13 +1,23 @@
-import { spawn } from 'child_process';
+import { execFile, spawn } from 'child_process';
 import * as vscode from 'vscode';
 import * as path from 'path';
+import { BackendClient } from './backendClient';
 
 export class RustEmbeddedProvider {
     private context: vscode.ExtensionContext;
     private pythonCommand: string | null = null;
+    private output: vscode.OutputChannel;
+    private backend: BackendClient;
 
     constructor(context: vscode.ExtensionContext) {
         this.context = context;
+        this.output = vscode.window.createOutputChannel('Rust Embedded');
+        this.backend = new BackendClient(
+            path.join(context.extensionPath, 'main.py'),
+            () => this.getPythonCommand(),
+            this.output
+        );
+        context.subscriptions.push(this.output, this.backend);
     }
 
     private getWorkspaceFolder(): string | undefined {
@@ -77,6 +87,33 @@ export class RustEmbeddedProvider {
         }
     }
 
+    private async runBackendAction(action: string, title: string, params: object = {}): Promise<boolean> {
+        const workspaceFolder = this.getWorkspaceFolder();
+        if (!workspaceFolder) return false;
+
+        this.output.show(true);
+        this.output.appendLine(`▶️ ${title}`);
+
+        return vscode.window.withProgress({
+            location: vscode.ProgressLocation.Notification,
+            title,
+            cancellable: true
+        }, async (progress, token) => {
+            try {
+                await this.backend.request(action, { projectPath: workspaceFolder, ...params },
+                    (event) => progress.report({ message: event.message }), token);
+                return true;
+            } catch (error) {
+                const message = error instanceof Error ? error.message : String(error);
+                this.output.appendLine(`❌ ${message}`);
+                if (!token.isCancellationRequested) {
+                    vscode.window.showErrorMessage(`${title} : ${message}`);
+                }
+                return false;
+            }
+        });
+    }
+
     async createProject(): Promise<void> {
         // Demander le nom du projet
         const projectName = await vscode.window.showInputBox({
@@ -129,45 +166,31 @@ export class RustEmbeddedProvider {
 
         if (!projectName) return;
 
-        vscode.window.withProgress({
-            location: vscode.ProgressLocation.Notification,
-            title: `Création du projet ${projectName}...`,
-            cancellable: false
-        }, async (progress) => {
-            progress.report({ increment: 0 });
-            this.runPythonScript('create', target, projectName);
-            
-            // Attendre un peu puis proposer d'ouvrir le nouveau projet
-            setTimeout(async () => {
-                const workspaceFolder = this.getWorkspaceFolder();
-                if (workspaceFolder) {
-                    const projectPath = path.join(workspaceFolder, projectName!);
-                    const openProject = await vscode.window.showInformationMessage(
-                        `Projet ${projectName} créé avec succès!`,
-                        'Ouvrir le projet'
-                    );
-                    
-                    if (openProject === 'Ouvrir le projet') {
-                        const uri = vscode.Uri.file(projectPath);
-                        await vscode.commands.executeCommand('vscode.openFolder', uri);
-                    }
-                }
-            }, 2000);
+        const created = await this.runBackendAction('create', `Création du projet ${projectName}...`, {
+            target,
+            projectName
         });
+
+        const workspaceFolder = this.getWorkspaceFolder();
+        if (created && workspaceFolder) {
+            const projectPath = path.join(workspaceFolder, projectName);
+            const openProject = await vscode.window.showInformationMessage(
+                `Projet ${projectName} créé avec succès!`,
+                'Ouvrir le projet'
+            );
+            
+            if (openProject === 'Ouvrir le projet') {
+                const uri = vscode.Uri.file(projectPath);
+                await vscode.commands.executeCommand('vscode.openFolder', uri);
+            }
+        }
     }
 
     async buildProject(): Promise<void> {
         const target = await this.selectTarget();
         if (!target) return;
 
-        vscode.window.withProgress({
-            location: vscode.ProgressLocation.Notification,
-            title: `Compilation pour ${target}...`,
-            cancellable: false
-        }, async (progress) => {
-            progress.report({ increment: 0 });
-            this.runPythonScript('build', target);
-        });
+        await this.runBackendAction('build', `Compilation pour ${target}...`, { target });
     }
 
     async flashProject(): Promise<void> {
@@ -195,23 +218,27 @@ export class RustEmbeddedProvider {
             }
         }
 
-        vscode.window.withProgress({
-            location: vscode.ProgressLocation.Notification,
-            title: `Flashage pour ${target}...`,
-            cancellable: false
-        }, async (progress) => {
-            progress.report({ increment: 0 });
-            this.runPythonScript('flash', target);
-        });
+        await this.runBackendAction('flash', `Flashage pour ${target}...`, { target });
     }
 
     private async checkToolInstalled(toolName: string): Promise<boolean> {
+        // Utilise l'inventaire cache du backend (methode `doctor`) : aucune sonde
+        // `--version` n'est relancee tant que les binaires n'ont pas change
+        const inventory = await this.getToolchainInventory();
+        if (inventory) {
+            return inventory[toolName]?.installed === true;
+        }
+
+        return new Promise((resolve) => {
+            execFile(toolName, ['--version'], (error) => resolve(!error));
+        });
+    }
+
+    private async getToolchainInventory(): Promise<Record<string, { installed: boolean }> | null> {
         try {
-            const { execSync } = require('child_process');
-            execSync(`${toolName} --version`, { stdio: 'ignore' });
-            return true;
+            return await this.backend.request('doctor');
         } catch {
-            return false;
+            return null;
         }
     }
 
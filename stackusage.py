@@ -0,0 +1,566 @@
+#!/usr/bin/env python3
+"""
+Analyse statique de la pile d'un firmware en pur Python
+Taille de pile par fonction (section .stack_sizes de `-Z emit-stack-sizes`,
+sinon prologue), graphe d'appels desassemble depuis le code (Thumb, RV32IMC)
+et pire cas par point d'entree et par interruption
+"""
+import array
+import bisect
+import struct
+import sys
+
+from elffile import (ELFCLASS32, SHF_ALLOC, SHF_EXECINSTR, SHT_NOBITS, STT_FUNC, STT_NOTYPE, STT_OBJECT,
+                     ElfError, ElfFile)
+
+EM_ARM = 40
+EM_RISCV = 243
+
+STB_GLOBAL = 1
+STB_WEAK = 2
+
+STACK_SIZES_SECTION = ".stack_sizes"
+VECTOR_TABLE_SECTION = ".vector_table"
+
+# Points d'entree reconnus par nom (cortex-m-rt, riscv-rt, esp-hal), en plus de e_entry
+ENTRY_SYMBOLS = ("Reset", "_start", "main")
+# Points d'entree des exceptions RISC-V (riscv-rt, esp-hal)
+TRAP_SYMBOLS = ("_start_trap", "_start_trap_rust", "_start_trap_rust_hal", "DefaultHandler", "ExceptionHandler")
+# Bornes de la pile definies par les scripts de liens: haut puis bas
+STACK_TOP_SYMBOLS = ("_stack_start", "_stack_start_cpu0")
+STACK_BOTTOM_SYMBOLS = ("_stack_end", "_stack_end_cpu0")
+
+# Exceptions Cortex-M par position dans la table des vecteurs (IRQ a partir de 16)
+CORTEX_M_EXCEPTIONS = {2: "NMI", 3: "HardFault", 4: "MemManage", 5: "BusFault", 6: "UsageFault",
+                       11: "SVCall", 12: "DebugMonitor", 14: "PendSV", 15: "SysTick"}
+# Registres empiles par le materiel a l'entree d'une exception Cortex-M (sans FPU)
+CORTEX_M_EXCEPTION_FRAME = 32
+
+# Nombre d'instructions examinees pour estimer la trame depuis le prologue
+PROLOGUE_INSTRUCTIONS = 16
+
+# Origine de la taille de pile d'une fonction
+SOURCE_PROLOGUE = 0
+SOURCE_STACK_SIZES = 1
+
+# Drapeaux par fonction; propages le long des appels, ils font du pire cas une borne basse
+FLAG_INDIRECT = 1    # appel par pointeur (BLX Rm, JALR): cible inconnue
+FLAG_EXTERNAL = 2    # appel hors des fonctions du firmware (ROM, adresse absolue)
+FLAG_RECURSIVE = 4   # dans un cycle du graphe d'appels
+FLAG_NAMES = {FLAG_INDIRECT: "indirect", FLAG_EXTERNAL: "external", FLAG_RECURSIVE: "recursion"}
+
+
+def flag_names(flags):
+    """Noms des drapeaux poses dans `flags` (pour le rapport JSON)."""
+    return [name for flag, name in FLAG_NAMES.items() if flags & flag]
+
+def _signed(value, bits):
+    return value - (1 << bits) if value & (1 << (bits - 1)) else value
+
+def read_stack_sizes(elf):
+    """Taille de pile par adresse de fonction depuis `.stack_sizes`: {adresse: octets}.
+
+    Chaque entree est l'adresse de la fonction (un mot de la cible) suivie
+    de la taille de sa trame en ULEB128. Le script de liens doit garder la
+    section (`KEEP(*(.stack_sizes))`, fait par cortex-m-rt).
+    """
+    section = elf.section(STACK_SIZES_SECTION)
+    if section is None:
+        return {}
+    data = bytes(elf.section_data(section))
+    fmt = elf.endian + "I"
+    thumb = elf.machine == EM_ARM
+    sizes = {}
+    position = 0
+    while position + 4 < len(data):
+        address = struct.unpack_from(fmt, data, position)[0]
+        position += 4
+        size = shift = 0
+        while True:
+            if position >= len(data):
+                raise ElfError(f"Section {STACK_SIZES_SECTION} tronquee: {elf.path}")
+            byte = data[position]
+            position += 1
+            size |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        # Fonctions retirees par l'edition de liens: adresse nulle
+        if address:
+            sizes[address & ~1 if thumb else address] = size
+    return sizes
+
+def _code_ranges(start, end, marker_addresses, marker_data):
+    """Plages de code d'une fonction, sans les donnees (literal pools) reperees par les symboles `$d`."""
+    ranges = []
+    position = start
+    in_code = True
+    i = bisect.bisect_right(marker_addresses, start)
+    while i < len(marker_addresses) and marker_addresses[i] < end:
+        if marker_data[i] and in_code:
+            ranges.append((position, marker_addresses[i]))
+            in_code = False
+        elif not marker_data[i] and not in_code:
+            position = marker_addresses[i]
+            in_code = True
+        i += 1
+    if in_code:
+        ranges.append((position, end))
+    return ranges
+
+def _scan_thumb(code, base, ranges):
+    """Decode une fonction Thumb (ARMv6-M): (appels, sauts, appel indirect, trame estimee).
+
+    Les appels sont les BL, les sauts les B/B.W (appels terminaux s'ils
+    sortent de la fonction). La trame vient du prologue: PUSH, SUB SP et
+    `ldr rX, =-N; add sp, rX` pour les grosses trames.
+    """
+    calls = []
+    jumps = []
+    indirect = False
+    frame = 0
+    literals = {}
+    seen = 0
+    for start, end in ranges:
+        i = (start - base) >> 1
+        stop = min((end - base) >> 1, len(code))
+        while i < stop:
+            hw = code[i]
+            address = base + (i << 1)
+            seen += 1
+            if hw >= 0xE800:
+                # Instruction 32 bits: seuls BL et B.W nous interessent
+                low = code[i + 1] if i + 1 < stop else 0
+                if hw & 0xF800 == 0xF000 and low & 0x9000 == 0x9000:
+                    s = (hw >> 10) & 1
+                    offset = ((s << 24) | ((1 ^ ((low >> 13) & 1) ^ s) << 23) | ((1 ^ ((low >> 11) & 1) ^ s) << 22)
+                              | ((hw & 0x3FF) << 12) | ((low & 0x7FF) << 1))
+                    (calls if low & 0x4000 else jumps).append(address + 4 + _signed(offset, 25))
+                    seen = PROLOGUE_INSTRUCTIONS
+                i += 2
+                continue
+            if hw & 0xF800 == 0xE000:
+                jumps.append(address + 4 + _signed((hw & 0x7FF) << 1, 12))
+                seen = PROLOGUE_INSTRUCTIONS
+            elif hw & 0xFF87 == 0x4780:
+                indirect = True
+                seen = PROLOGUE_INSTRUCTIONS
+            elif seen <= PROLOGUE_INSTRUCTIONS:
+                if hw & 0xFE00 == 0xB400:
+                    frame += 4 * bin(hw & 0x1FF).count("1")
+                elif hw & 0xFF80 == 0xB080:
+                    frame += (hw & 0x7F) << 2
+                elif hw & 0xF800 == 0x4800:
+                    literal = ((((address + 4) & ~3) + ((hw & 0xFF) << 2)) - base) >> 1
+                    if literal + 1 < len(code):
+                        literals[(hw >> 8) & 7] = code[literal] | (code[literal + 1] << 16)
+                elif hw & 0xFF87 == 0x4485 and (hw >> 3) & 0xF in literals:
+                    frame += max(0, -_signed(literals[(hw >> 3) & 0xF], 32))
+            i += 1
+    return calls, jumps, indirect, frame
+
+def _scan_riscv(code, base, ranges):
+    """Decode une fonction RV32IMC: (appels, sauts, appel indirect, trame estimee).
+
+    Les appels sont JAL/C.JAL vers ra et les paires `auipc; jalr` (appels
+    lointains), les sauts J/C.J et `auipc; jr`. Un JALR vers ra sans auipc
+    est un appel par pointeur. La trame vient de `addi sp, sp, -N`.
+    """
+    calls = []
+    jumps = []
+    indirect = False
+    frame = 0
+    seen = 0
+    for start, end in ranges:
+        i = (start - base) >> 1
+        stop = min((end - base) >> 1, len(code))
+        auipc = None
+        while i < stop:
+            hw = code[i]
+            address = base + (i << 1)
+            seen += 1
+            if hw & 3 != 3:
+                op = hw & 3
+                funct3 = hw >> 13
+                rd = (hw >> 7) & 31
+                if op == 1 and funct3 in (1, 5):
+                    # C.JAL (RV32 uniquement) / C.J
+                    offset = (((hw >> 12) & 1) << 11 | ((hw >> 11) & 1) << 4 | ((hw >> 9) & 3) << 8
+                              | ((hw >> 8) & 1) << 10 | ((hw >> 7) & 1) << 6 | ((hw >> 6) & 1) << 7
+                              | ((hw >> 3) & 7) << 1 | ((hw >> 2) & 1) << 5)
+                    (calls if funct3 == 1 else jumps).append(address + _signed(offset, 12))
+                    seen = PROLOGUE_INSTRUCTIONS
+                elif op == 2 and funct3 == 4 and hw & 0x107C == 0x1000 and rd:
+                    # C.JALR
+                    indirect = True
+                    seen = PROLOGUE_INSTRUCTIONS
+                elif seen <= PROLOGUE_INSTRUCTIONS and op == 1 and rd == 2 and funct3 == 3:
+                    # C.ADDI16SP
+                    offset = (((hw >> 12) & 1) << 9 | ((hw >> 6) & 1) << 4 | ((hw >> 5) & 1) << 6
+                              | ((hw >> 3) & 3) << 7 | ((hw >> 2) & 1) << 5)
+                    frame += max(0, -_signed(offset, 10))
+                elif seen <= PROLOGUE_INSTRUCTIONS and op == 1 and rd == 2 and funct3 == 0:
+                    # C.ADDI sp, sp, imm
+                    frame += max(0, -_signed(((hw >> 12) & 1) << 5 | ((hw >> 2) & 31), 6))
+                i += 1
+                continue
+
+            word = hw | ((code[i + 1] if i + 1 < stop else 0) << 16)
+            opcode = word & 0x7F
+            rd = (word >> 7) & 31
+            if opcode == 0x6F:
+                # JAL
+                offset = ((word >> 31) << 20 | ((word >> 21) & 0x3FF) << 1 | ((word >> 20) & 1) << 11
+                          | ((word >> 12) & 0xFF) << 12)
+                if rd:
+                    calls.append(address + _signed(offset, 21))
+                else:
+                    jumps.append(address + _signed(offset, 21))
+                seen = PROLOGUE_INSTRUCTIONS
+            elif opcode == 0x67:
+                # JALR: cible connue si le registre vient d'un auipc juste avant
+                rs1 = (word >> 15) & 31
+                if auipc and auipc[0] == rs1 and auipc[2] == address:
+                    target = (auipc[1] + _signed(word >> 20, 12)) & 0xFFFFFFFF
+                    (calls if rd else jumps).append(target)
+                elif rd:
+                    indirect = True
+                seen = PROLOGUE_INSTRUCTIONS
+            elif opcode == 0x17:
+                auipc = (rd, (address + _signed(word & 0xFFFFF000, 32)) & 0xFFFFFFFF, address + 4)
+            elif seen <= PROLOGUE_INSTRUCTIONS and word & 0xFFFFF == 0x10113:
+                # addi sp, sp, imm
+                frame += max(0, -_signed(word >> 20, 12))
+            i += 2
+    return calls, jumps, indirect, frame
+
+def _strongly_connected(offsets, callees, count):
+    """Composantes fortement connexes (Tarjan iteratif): (composante par noeud, nombre).
+
+    Les composantes sont numerotees en ordre topologique inverse: celles
+    qu'une composante appelle ont toujours un numero plus petit.
+    """
+    index_of = array.array("i", [-1]) * count
+    low = array.array("I", [0]) * count
+    on_stack = bytearray(count)
+    component = array.array("i", [-1]) * count
+    stack = []
+    order = 0
+    components = 0
+    for root in range(count):
+        if index_of[root] >= 0:
+            continue
+        index_of[root] = low[root] = order
+        order += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [[root, offsets[root]]]
+        while work:
+            frame = work[-1]
+            node = frame[0]
+            if frame[1] < offsets[node + 1]:
+                callee = callees[frame[1]]
+                frame[1] += 1
+                if index_of[callee] < 0:
+                    index_of[callee] = low[callee] = order
+                    order += 1
+                    stack.append(callee)
+                    on_stack[callee] = 1
+                    work.append([callee, offsets[callee]])
+                elif on_stack[callee] and index_of[callee] < low[node]:
+                    low[node] = index_of[callee]
+                continue
+            work.pop()
+            if work and low[node] < low[work[-1][0]]:
+                low[work[-1][0]] = low[node]
+            if low[node] == index_of[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component[member] = components
+                    if member == node:
+                        break
+                components += 1
+    return component, components
+
+
+class CallGraph:
+    """Graphe d'appels compact: fonctions triees par adresse, appels au format CSR.
+
+    Les fonctions appelees par la fonction i sont
+    `callees[offsets[i]:offsets[i + 1]]`. Tailles, drapeaux et aretes sont
+    des `array`/`bytearray`: quelques octets par fonction et par appel, meme
+    sur un gros binaire.
+    """
+
+    def __init__(self, names, addresses, sizes):
+        self.names = names
+        self.addresses = addresses
+        self.sizes = sizes
+        count = len(addresses)
+        self.frames = array.array("I", [0]) * count
+        self.sources = bytearray(count)
+        self.flags = bytearray(count)
+        self.offsets = array.array("I", [0])
+        self.callees = array.array("I")
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def index_of(self, address):
+        """Indice de la fonction qui contient `address`, -1 si aucune."""
+        i = bisect.bisect_right(self.addresses, address) - 1
+        if i >= 0 and address < self.addresses[i] + self.sizes[i]:
+            return i
+        return -1
+
+    def callers_count(self):
+        """Nombre d'appelants directs de chaque fonction."""
+        counts = array.array("I", [0]) * len(self)
+        for callee in self.callees:
+            counts[callee] += 1
+        return counts
+
+    def worst_cases(self):
+        """Pire cas de pile depuis chaque fonction, appels compris: (profondeur, suivant, drapeaux, cycles).
+
+        `suivant[i]` est l'appele qui donne le pire cas (-1 pour une feuille)
+        et `drapeaux[i]` cumule ceux de toutes les fonctions atteignables.
+        Une recursion compte une fois chaque fonction du cycle: le resultat
+        est alors une borne basse. `cycles` liste les indices de chaque cycle.
+        """
+        count = len(self)
+        offsets, callees = self.offsets, self.callees
+        component, components = _strongly_connected(offsets, callees, count)
+
+        # Membres de chaque composante, regroupes par tri par denombrement
+        starts = array.array("I", [0]) * (components + 1)
+        for c in component:
+            starts[c + 1] += 1
+        for c in range(components):
+            starts[c + 1] += starts[c]
+        fill = array.array("I", starts)
+        members = array.array("I", [0]) * count
+        for node in range(count):
+            c = component[node]
+            members[fill[c]] = node
+            fill[c] += 1
+
+        comp_depth = array.array("Q", [0]) * components
+        comp_next = array.array("i", [-1]) * components
+        comp_flags = bytearray(components)
+        cycles = []
+        for c in range(components):
+            nodes = members[starts[c]:starts[c + 1]]
+            frame = best = 0
+            best_node = -1
+            flags = 0
+            recursive = len(nodes) > 1
+            for node in nodes:
+                frame += self.frames[node]
+                flags |= self.flags[node]
+                for edge in range(offsets[node], offsets[node + 1]):
+                    callee = callees[edge]
+                    d = component[callee]
+                    if d == c:
+                        recursive = True
+                        continue
+                    flags |= comp_flags[d]
+                    if best_node < 0 or comp_depth[d] > best:
+                        best = comp_depth[d]
+                        best_node = callee
+            if recursive:
+                flags |= FLAG_RECURSIVE
+                cycles.append(list(nodes))
+            comp_depth[c] = frame + best
+            comp_next[c] = best_node
+            comp_flags[c] = flags
+
+        depth = array.array("Q", (comp_depth[c] for c in component))
+        following = array.array("i", (comp_next[c] for c in component))
+        flags = bytearray(comp_flags[c] for c in component)
+        return depth, following, flags, cycles
+
+
+def build_call_graph(elf):
+    """Graphe d'appels d'un ELF ARM (Thumb) ou RISC-V 32 bits, tailles de pile comprises.
+
+    Les fonctions sont les symboles STT_FUNC des sections executables; les
+    alias a la meme adresse sont fusionnes (nom global prefere). Un appel
+    terminal (saut vers le debut d'une autre fonction) compte comme un
+    appel: le pire cas reste un majorant.
+    """
+    if elf.elf_class != ELFCLASS32 or elf.machine not in (EM_ARM, EM_RISCV):
+        raise ElfError(f"Architecture non supportee (ARM ou RISC-V 32 bits attendu, e_machine={elf.machine}): "
+                       f"{elf.path}")
+    thumb = elf.machine == EM_ARM
+    scan = _scan_thumb if thumb else _scan_riscv
+    executable = {i for i, section in enumerate(elf.sections)
+                  if section.flags & SHF_EXECINSTR and section.type != SHT_NOBITS and section.size}
+
+    functions = {}
+    markers = []
+    for symbol in elf.symbols(types=(STT_FUNC, STT_NOTYPE), sized=False):
+        if symbol.shndx not in executable:
+            continue
+        address = symbol.value & ~1 if thumb else symbol.value
+        if symbol.type == STT_NOTYPE:
+            if symbol.name[:2] in ("$d", "$t", "$a", "$x"):
+                markers.append((address, symbol.name[1] == "d"))
+            continue
+        if not symbol.size:
+            continue
+        rank = (symbol.bind == STB_GLOBAL, symbol.bind == STB_WEAK, symbol.size)
+        current = functions.get(address)
+        if current is None or rank > current[0]:
+            functions[address] = (rank, symbol)
+
+    ordered = sorted(functions)
+    graph = CallGraph([functions[address][1].name for address in ordered], array.array("I", ordered),
+                      array.array("I", (functions[address][1].size for address in ordered)))
+    markers.sort()
+    marker_addresses = array.array("I", (address for address, _ in markers))
+    marker_data = bytearray(is_data for _, is_data in markers)
+    stack_sizes = read_stack_sizes(elf)
+
+    # Code de chaque section executable en demi-mots (instructions alignees sur 2 octets)
+    codes = {}
+    for index in executable:
+        section = elf.sections[index]
+        code = array.array("H")
+        code.frombytes(bytes(elf.section_data(section)[:section.size & ~1]))
+        if sys.byteorder != ("little" if elf.endian == "<" else "big"):
+            code.byteswap()
+        codes[index] = (section.addr, code)
+
+    for index, address in enumerate(ordered):
+        symbol = functions[address][1]
+        base, code = codes[symbol.shndx]
+        end = address + symbol.size
+        calls, jumps, indirect, frame = scan(code, base, _code_ranges(address, end, marker_addresses, marker_data))
+        if address in stack_sizes:
+            graph.frames[index] = stack_sizes[address]
+            graph.sources[index] = SOURCE_STACK_SIZES
+        else:
+            graph.frames[index] = frame
+        flags = FLAG_INDIRECT if indirect else 0
+
+        targets = set()
+        for target in calls:
+            callee = graph.index_of(target)
+            if callee < 0:
+                flags |= FLAG_EXTERNAL
+            elif callee != index or target == address:
+                targets.add(callee)
+        for target in jumps:
+            if address <= target < end:
+                continue
+            callee = graph.index_of(target)
+            if callee >= 0 and ordered[callee] == target:
+                targets.add(callee)
+        graph.flags[index] = flags
+        graph.callees.extend(sorted(targets))
+        graph.offsets.append(len(graph.callees))
+    return graph
+
+def _vector_handlers(elf, graph):
+    """Table des vecteurs Cortex-M: (pointeur de pile initial, Reset, {fonction: [vecteurs]})."""
+    section = elf.section(VECTOR_TABLE_SECTION)
+    if section is None or elf.machine != EM_ARM:
+        return None, -1, {}
+    data = bytes(elf.section_data(section))
+    words = [word for (word,) in struct.iter_unpack(elf.endian + "I", data[:len(data) & ~3])]
+    if len(words) < 2:
+        return None, -1, {}
+    handlers = {}
+    for position, word in enumerate(words[2:], 2):
+        function = graph.index_of(word & ~1) if word else -1
+        if function >= 0:
+            name = CORTEX_M_EXCEPTIONS.get(position) or (f"IRQ{position - 16}" if position >= 16 else f"#{position}")
+            handlers.setdefault(function, []).append(name)
+    return words[0], graph.index_of(words[1] & ~1), handlers
+
+def _stack_bounds(elf, top):
+    """Haut et bas de la pile: symboles du script de liens, sinon fin de la derniere section en RAM."""
+    bounds = {}
+    for symbol in elf.symbols(types=(STT_NOTYPE, STT_OBJECT), sized=False):
+        if symbol.name in STACK_TOP_SYMBOLS + STACK_BOTTOM_SYMBOLS:
+            bounds.setdefault(symbol.name, symbol.value)
+    if top is None:
+        top = next((bounds[name] for name in STACK_TOP_SYMBOLS if name in bounds), None)
+    if not top:
+        return None
+    bottom = next((bounds[name] for name in STACK_BOTTOM_SYMBOLS if 0 < bounds.get(name, 0) < top), None)
+    if bottom is None:
+        ends = [section.addr + section.size for section in elf.sections
+                if section.flags & SHF_ALLOC and section.size and section.addr + section.size <= top]
+        if not ends:
+            return None
+        bottom = max(ends)
+    return {"top": top, "bottom": bottom, "available": top - bottom}
+
+def analyze_stack(elf_file):
+    """Pire cas d'utilisation de la pile d'un firmware, par point d'entree et par interruption.
+
+    Le rapport est serialisable en JSON. Les chemins d'appels donnent les
+    noms bruts des symboles (a demangler pour l'affichage); `flags` signale
+    un pire cas qui n'est qu'une borne basse (recursion, appel indirect ou
+    hors firmware).
+    """
+    with ElfFile(elf_file) as elf:
+        graph = build_call_graph(elf)
+        stack_top, reset, vectors = _vector_handlers(elf, graph)
+        stack = _stack_bounds(elf, stack_top)
+        entry = graph.index_of(elf.entry & ~1 if elf.machine == EM_ARM else elf.entry)
+        arch = "thumb" if elf.machine == EM_ARM else "riscv32"
+
+    depth, following, flags, cycles = graph.worst_cases()
+    callers = graph.callers_count()
+    by_name = {name: index for index, name in enumerate(graph.names)}
+
+    count = len(graph)
+
+    def path(index):
+        chain = []
+        while index >= 0 and len(chain) < count:
+            chain.append(graph.names[index])
+            index = following[index]
+        return chain
+
+    def result(index, overhead=0, **extra):
+        return {"name": graph.names[index], "address": graph.addresses[index], "frame": graph.frames[index],
+                "worst": depth[index] + overhead, "path": path(index), "flags": flag_names(flags[index]), **extra}
+
+    entries = []
+    for index in (entry, reset, *(by_name.get(name, -1) for name in ENTRY_SYMBOLS)):
+        if index >= 0 and index not in entries and (not entries or not callers[index]):
+            entries.append(index)
+
+    if vectors:
+        handlers = {index: (names, CORTEX_M_EXCEPTION_FRAME) for index, names in vectors.items()}
+    else:
+        handlers = {by_name[name]: ([], 0) for name in TRAP_SYMBOLS
+                    if name in by_name and not callers[by_name[name]]}
+    roots = [index for index in range(count)
+             if not callers[index] and index not in handlers and index not in entries]
+
+    report = {
+        "arch": arch,
+        "functions": count,
+        "calls": len(graph.callees),
+        "sources": {"stack_sizes": graph.sources.count(SOURCE_STACK_SIZES),
+                    "prologue": graph.sources.count(SOURCE_PROLOGUE)},
+        "entries": [result(index) for index in entries],
+        "handlers": sorted((result(index, overhead, vectors=names) for index, (names, overhead) in handlers.items()),
+                           key=lambda item: -item["worst"]),
+        "roots": sorted((result(index) for index in roots), key=lambda item: -item["worst"]),
+        "recursion": [[graph.names[index] for index in cycle] for cycle in cycles],
+        "indirect": [graph.names[index] for index in range(count) if graph.flags[index] & FLAG_INDIRECT],
+        "external": [graph.names[index] for index in range(count) if graph.flags[index] & FLAG_EXTERNAL],
+        "stack": stack,
+    }
+    main_worst = max((item["worst"] for item in report["entries"]), default=0)
+    handler_worst = max((item["worst"] for item in report["handlers"]), default=0)
+    report["worst_total"] = main_worst + handler_worst
+    report["lower_bound"] = any(item["flags"] for item in report["entries"] + report["handlers"])
+    return report
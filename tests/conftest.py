@@ -0,0 +1,91 @@
+"""
+Outils communs des tests: modules du depot importables et ELF32 synthetiques
+"""
+import struct
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from elffile import PT_LOAD, SHT_NOBITS, SHT_SYMTAB  # noqa: E402
+
+SHT_PROGBITS = 1
+SHT_STRTAB = 3
+EM_ARM = 40
+
+
+def _strings(names):
+    """Table de chaines ELF: (contenu, {nom: offset})."""
+    table = bytearray(b"\x00")
+    offsets = {"": 0}
+    for name in names:
+        if name not in offsets:
+            offsets[name] = len(table)
+            table += name.encode() + b"\x00"
+    return bytes(table), offsets
+
+
+def build_elf(path, sections=(), symbols=(), segments=(), machine=EM_ARM, entry=0):
+    """Ecrit un ELF32 petit boutiste minimal et retourne son chemin.
+
+    `sections`: dicts {name, type, flags, addr, data, size} (size pour .bss),
+    `symbols`: (nom, valeur, taille, type, liaison, nom de section),
+    `segments`: (nom de section, adresse physique) pour des PT_LOAD.
+    """
+    sections = [dict({"type": SHT_PROGBITS, "flags": 0, "addr": 0, "data": b""}, **section) for section in sections]
+    names = [section["name"] for section in sections]
+    index = {name: i for i, name in enumerate(names, 1)}
+    strtab, name_offsets = _strings([symbol[0] for symbol in symbols])
+    symtab = bytearray(16)
+    for name, value, size, sym_type, bind, section in symbols:
+        symtab += struct.pack("<IIIBBH", name_offsets[name], value, size, (bind << 4) | sym_type, 0,
+                              index.get(section, 0))
+    count = len(sections)
+    sections += [
+        {"name": ".symtab", "type": SHT_SYMTAB, "flags": 0, "addr": 0, "data": bytes(symtab),
+         "link": count + 2, "entsize": 16},
+        {"name": ".strtab", "type": SHT_STRTAB, "flags": 0, "addr": 0, "data": strtab},
+    ]
+    shstrtab, shstr_offsets = _strings([section["name"] for section in sections] + [".shstrtab"])
+    sections.append({"name": ".shstrtab", "type": SHT_STRTAB, "flags": 0, "addr": 0, "data": shstrtab})
+
+    phoff = 52
+    body = bytearray(phoff + 32 * len(segments))
+    offsets = []
+    for section in sections:
+        body += bytes(-len(body) % 4)
+        offsets.append(len(body))
+        if section["type"] != SHT_NOBITS:
+            body += section["data"]
+    body += bytes(-len(body) % 4)
+
+    phdrs = bytearray()
+    for name, paddr in segments:
+        section = sections[index[name] - 1]
+        size = section.get("size", len(section["data"]))
+        filesz = 0 if section["type"] == SHT_NOBITS else size
+        phdrs += struct.pack("<8I", PT_LOAD, offsets[index[name] - 1], section["addr"], paddr, filesz, size, 5, 4)
+    body[phoff:phoff + len(phdrs)] = phdrs
+
+    shoff = len(body)
+    body += bytes(40)
+    for section, offset in zip(sections, offsets):
+        size = section.get("size", len(section["data"]))
+        body += struct.pack("<10I", shstr_offsets[section["name"]], section["type"], section["flags"],
+                            section["addr"], offset, size, section.get("link", 0), 0, 4, section.get("entsize", 0))
+
+    ident = b"\x7fELF" + bytes([1, 1, 1]) + bytes(9)
+    body[:52] = struct.pack("<16sHHIIIIIHHHHHH", ident, 2, machine, 1, entry, phoff if segments else 0, shoff,
+                            0, 52, 32, len(segments), 40, len(sections) + 1, len(sections))
+    Path(path).write_bytes(bytes(body))
+    return Path(path)
+
+
+@pytest.fixture
+def make_elf(tmp_path):
+    """Fabrique d'ELF dans le repertoire temporaire du test."""
+    def make(name="firmware.elf", **kwargs):
+        return build_elf(tmp_path / name, **kwargs)
+    return make
@@ -0,0 +1,128 @@
+"""
+Tests du decodeur defmt: table des formats, rzCOBS et trames brutes
+"""
+import json
+import struct
+
+import pytest
+
+import defmtdecoder
+from defmtdecoder import DefmtDecoder, DefmtError
+from elffile import STT_OBJECT
+
+TABLE = {
+    "formats": {
+        "1": ["defmt_info", "boot {=u8} {=str}"],
+        "2": ["defmt_warn", "temp={=i16} raw={=u32:#x} ok={=bool}"],
+        "3": ["defmt_error", "c={=char}"],
+        "4": ["defmt_debug", "buf={=[u8;3]:x}"],
+        "5": ["defmt_info", "bad={=[u8;x]}"],
+    },
+    "timestamp": None,
+}
+
+
+def rzcobs_encode(data):
+    """Encodeur de reference (crate rzcobs), pour les tests d'aller-retour."""
+    out = bytearray()
+    run = zeros = 0
+    for byte in data:
+        if run < 7:
+            if byte:
+                out.append(byte)
+            else:
+                zeros |= 1 << run
+            run += 1
+            if run == 7 and zeros:
+                out.append(zeros)
+                run = zeros = 0
+        elif not byte:
+            out.append((run - 7) | 0x80)
+            run = zeros = 0
+        else:
+            out.append(byte)
+            run += 1
+            if run == 134:
+                out.append(0xFF)
+                run = zeros = 0
+    if 0 < run < 7:
+        # Positions restantes marquees comme zeros de bourrage
+        out.append((zeros | (0x7F << run)) & 0x7F)
+    elif run:
+        out.append((run - 7) | 0x80)
+    return bytes(out)
+
+
+def test_read_table_from_elf(make_elf):
+    info = json.dumps({"package": "app", "tag": "defmt_info", "data": "hello {=u8}", "disambiguator": "1"})
+    stamp = json.dumps({"package": "app", "tag": "defmt_timestamp", "data": "{=u32:us}", "disambiguator": "2"})
+    elf = make_elf(
+        sections=[{"name": ".defmt", "data": bytes(8)}, {"name": ".rodata", "data": bytes(8)}],
+        symbols=[(info, 1, 1, STT_OBJECT, 0, ".defmt"), (stamp, 2, 1, STT_OBJECT, 0, ".defmt"),
+                 ('{"not": "in .defmt"}', 3, 1, STT_OBJECT, 0, ".rodata")],
+    )
+    table = defmtdecoder.read_table(elf)
+    assert table == {"formats": {"1": ["defmt_info", "hello {=u8}"], "2": ["defmt_timestamp", "{=u32:us}"]},
+                     "timestamp": "{=u32:us}"}
+    decoder = DefmtDecoder(table, encoding="raw")
+    assert decoder.feed(b"\x01\x00" + struct.pack("<I", 1500000) + b"\x2a") == [("1.500000", "INFO", "hello 42")]
+
+
+def test_read_table_without_defmt_section(make_elf):
+    with pytest.raises(DefmtError, match="absente"):
+        defmtdecoder.read_table(make_elf(sections=[{"name": ".text", "data": bytes(4)}]))
+
+
+@pytest.mark.parametrize("frame", [b"", b"\x01", b"\x00" * 20, b"abcdefg", bytes(range(1, 200)),
+                                   bytes(range(256)) * 2, b"\x01\x00\x00\x00\x00\x00\x00\x00\x02"])
+def test_rzcobs_round_trip(frame):
+    decoded = defmtdecoder.rzcobs_decode(rzcobs_encode(frame))
+    # Le decodage peut laisser des zeros de bourrage a la fin
+    assert decoded[:len(frame)] == frame
+    assert not decoded[len(frame):].strip(b"\x00")
+
+
+def test_rzcobs_rejects_truncated_frame():
+    with pytest.raises(DefmtError):
+        defmtdecoder.rzcobs_decode(b"\x85")
+
+
+def test_rzcobs_stream_in_pieces():
+    frames = [b"\x01\x00\x07\x02hi", b"\x02\x00\xfe\xff\xef\xbe\xad\xde\x01"]
+    stream = b"".join(rzcobs_encode(frame) + b"\x00" for frame in frames)
+    decoder = DefmtDecoder(TABLE)
+    messages = []
+    for i in range(0, len(stream), 3):
+        messages += decoder.feed(stream[i:i + 3])
+    assert messages == [("", "INFO", "boot 7 hi"), ("", "WARN", "temp=-2 raw=0xdeadbeef ok=true")]
+    assert decoder.errors == 0
+
+
+def test_raw_frame_waits_for_the_rest():
+    decoder = DefmtDecoder(TABLE, encoding="raw")
+    frame = b"\x04\x00\x0a\x0b\xff"
+    assert decoder.feed(frame[:3]) == []
+    assert decoder.feed(frame[3:] + b"\x03\x00A\x00") == [("", "DEBUG", "buf=[a, b, ff]")]
+    assert decoder.feed(b"\x00\x00") == [("", "ERROR", "c=A")]
+
+
+@pytest.mark.parametrize("frame", [
+    b"\x03\x00\x00\x00\x11\x00",   # char hors de l'Unicode
+    b"\x03\x00\x00\xd8\x00\x00",   # substitut UTF-16
+    b"\x05\x00\x01\x02",           # longueur de tableau invalide
+    b"\x09\x00",                   # format inconnu
+])
+def test_invalid_frames_are_counted(frame):
+    decoder = DefmtDecoder(TABLE)
+    good = rzcobs_encode(b"\x01\x00\x01\x00") + b"\x00"
+    assert decoder.feed(rzcobs_encode(frame) + b"\x00" + good) == [("", "INFO", "boot 1 ")]
+    assert decoder.errors == 1
+
+    raw = DefmtDecoder(TABLE, encoding="raw")
+    assert raw.feed(frame) == []
+    assert raw.errors == 1
+
+
+def test_unknown_encoding():
+    with pytest.raises(ValueError):
+        DefmtDecoder(TABLE, encoding="hex")
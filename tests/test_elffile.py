@@ -0,0 +1,87 @@
+"""
+Tests du lecteur ELF minimal
+"""
+import pytest
+
+import uf2conv
+from elffile import (SHF_ALLOC, SHF_EXECINSTR, SHT_NOBITS, STT_FUNC, STT_NOTYPE, STT_OBJECT, ElfError, ElfFile,
+                     is_elf_file)
+
+FLASH = 0x10000000
+RAM = 0x20000000
+
+
+@pytest.fixture
+def firmware(make_elf):
+    return make_elf(
+        sections=[
+            {"name": ".text", "flags": SHF_ALLOC | SHF_EXECINSTR, "addr": FLASH, "data": b"\x10" * 0x40},
+            {"name": ".data", "flags": SHF_ALLOC, "addr": RAM, "data": b"\xda" * 8},
+            {"name": ".bss", "type": SHT_NOBITS, "flags": SHF_ALLOC, "addr": RAM + 8, "size": 0x100},
+        ],
+        symbols=[
+            ("main", FLASH | 1, 0x20, STT_FUNC, 1, ".text"),
+            ("COUNTER", RAM + 8, 4, STT_OBJECT, 1, ".bss"),
+            ("$t", FLASH, 0, STT_NOTYPE, 0, ".text"),
+            ("_stack_start", RAM + 0x40000, 0, STT_NOTYPE, 1, ""),
+        ],
+        # .data est chargee en flash juste apres le code
+        segments=[(".data", FLASH + 0x40), (".text", FLASH), (".bss", RAM + 8)],
+        entry=FLASH | 1,
+    )
+
+
+def test_header_and_sections(firmware):
+    with ElfFile(firmware) as elf:
+        assert (elf.elf_class, elf.endian, elf.machine, elf.entry) == (1, "<", 40, FLASH | 1)
+        assert [section.name for section in elf.sections][:4] == ["", ".text", ".data", ".bss"]
+        text = elf.section(".text")
+        assert (text.addr, text.size) == (FLASH, 0x40)
+        assert bytes(elf.section_data(text)) == b"\x10" * 0x40
+        assert bytes(elf.section_data(elf.section(".bss"))) == b""
+        assert elf.section(".absent") is None
+
+
+def test_load_segments_use_physical_addresses(firmware):
+    with ElfFile(firmware) as elf:
+        segments = [(address, bytes(data)) for address, data in elf.load_segments()]
+        assert segments == [(FLASH, b"\x10" * 0x40), (FLASH + 0x40, b"\xda" * 8)]
+        assert elf.load_address(elf.section(".data")) == FLASH + 0x40
+        assert elf.load_address(elf.section(".bss")) == RAM + 8
+
+
+def test_symbols_filters(firmware):
+    with ElfFile(firmware) as elf:
+        assert [symbol.name for symbol in elf.symbols()] == ["main", "COUNTER"]
+        main = next(elf.symbols(types=(STT_FUNC,)))
+        assert (main.value, main.size, main.type, main.bind, main.shndx) == (FLASH | 1, 0x20, STT_FUNC, 1, 1)
+        unsized = [symbol.name for symbol in elf.symbols(types=(STT_NOTYPE,), sized=False)]
+        assert unsized == ["", "$t", "_stack_start"]
+
+
+def test_elf_to_uf2_follows_load_segments(firmware, tmp_path):
+    output = tmp_path / "firmware.uf2"
+    uf2conv.convert_elf_to_uf2(firmware, output)
+    data = output.read_bytes()
+    assert uf2conv.verify_uf2(data, uf2conv.RP2040_FAMILY_ID)[1] == {}
+    assert uf2conv.uf2_info(data)["families"]["rp2040"]["ranges"] == [(FLASH, FLASH + 0x100)]
+
+
+def test_invalid_files(tmp_path, firmware):
+    small = tmp_path / "small.elf"
+    small.write_bytes(b"\x7fELF")
+    with pytest.raises(ElfError, match="trop petit"):
+        ElfFile(small)
+
+    other = tmp_path / "firmware.bin"
+    other.write_bytes(bytes(64))
+    with pytest.raises(ElfError, match="Signature"):
+        ElfFile(other)
+    assert not is_elf_file(other)
+    assert is_elf_file(firmware)
+    assert not is_elf_file(tmp_path / "absent.elf")
+
+    truncated = tmp_path / "truncated.elf"
+    truncated.write_bytes(firmware.read_bytes()[:200])
+    with pytest.raises(ElfError, match="tronque"):
+        ElfFile(truncated)
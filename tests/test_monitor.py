@@ -0,0 +1,138 @@
+"""
+Tests du tampon du moniteur serie et de son lecteur, sur un pseudo-terminal
+"""
+import os
+import threading
+import time
+
+import pytest
+
+import main
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "openpty") or main.termios is None,
+                                reason="pseudo-terminal indisponible")
+
+
+def _collect(buffer, size, timeout=5):
+    data = b""
+    deadline = time.monotonic() + timeout
+    while len(data) < size and time.monotonic() < deadline:
+        data += b"".join(chunk for _, chunk in buffer.get(0.1))
+    return data
+
+
+@pytest.fixture
+def pty_port():
+    master, slave = os.openpty()
+    port = os.ttyname(slave)
+    os.close(slave)
+    yield master, port
+    try:
+        os.close(master)
+    except OSError:
+        pass
+
+
+def test_buffer_drops_oldest_chunks():
+    buffer = main.MonitorBuffer(limit=10)
+    for chunk in (b"aaaa", b"bbbb", b"cccc", b"dddd"):
+        buffer.put(chunk)
+    assert buffer.dropped == 8
+    assert [data for _, data in buffer.get(0)] == [b"cccc", b"dddd"]
+    assert buffer.get(0) == []
+
+
+def test_buffer_keeps_a_chunk_larger_than_limit():
+    buffer = main.MonitorBuffer(limit=4)
+    buffer.put(b"0123456789")
+    assert buffer.dropped == 0
+    assert [data for _, data in buffer.get(0)] == [b"0123456789"]
+
+
+def test_buffer_close_wakes_reader():
+    buffer = main.MonitorBuffer()
+    threading.Timer(0.05, buffer.close).start()
+    start = time.monotonic()
+    assert buffer.get(5) == []
+    assert buffer.closed
+    assert time.monotonic() - start < 2
+
+
+def test_open_serial_port_is_raw(pty_port):
+    master, port = pty_port
+    fd = main.open_serial_port(port, 115200)
+    try:
+        attrs = main.termios.tcgetattr(fd)
+        assert not attrs[3] & (main.termios.ICANON | main.termios.ECHO)
+        assert attrs[4] == attrs[5] == main.termios.B115200
+        # Pas de traduction CR/LF en mode brut
+        os.write(master, b"a\r\nb\r")
+        time.sleep(0.05)
+        assert os.read(fd, 64) == b"a\r\nb\r"
+    finally:
+        os.close(fd)
+
+
+def test_open_serial_port_rejects_unknown_baud(pty_port):
+    _, port = pty_port
+    with pytest.raises(ValueError):
+        main.open_serial_port(port, 123)
+
+
+def test_reader_forwards_data(pty_port):
+    master, port = pty_port
+    buffer = main.MonitorBuffer()
+    stop = threading.Event()
+    stats = {"bytes": 0, "reconnects": 0}
+    fd = main.open_serial_port(port, 115200)
+    thread = threading.Thread(target=main._monitor_reader, args=(port, 115200, fd, buffer, stop, stats))
+    thread.start()
+    try:
+        payload = b"".join(b"line %d\n" % i for i in range(500))
+        os.write(master, payload)
+        assert _collect(buffer, len(payload)) == payload
+        assert stats["bytes"] == len(payload)
+    finally:
+        stop.set()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert buffer.closed
+
+
+def test_reader_survives_disconnect(pty_port, monkeypatch):
+    master, port = pty_port
+    monkeypatch.setattr(main, "MONITOR_RECONNECT_INTERVAL", 0.05)
+    buffer = main.MonitorBuffer()
+    stop = threading.Event()
+    stats = {"bytes": 0, "reconnects": 0}
+    fd = main.open_serial_port(port)
+    thread = threading.Thread(target=main._monitor_reader, args=(port, None, fd, buffer, stop, stats))
+    thread.start()
+    try:
+        os.write(master, b"before\n")
+        assert _collect(buffer, 7) == b"before\n"
+        # Fermer le maitre fait disparaitre le port: le lecteur attend son retour
+        os.close(master)
+        time.sleep(0.3)
+        assert thread.is_alive()
+    finally:
+        stop.set()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert buffer.closed
+    assert stats["reconnects"] == 0
+
+
+def test_format_lines_strips_ansi_and_keeps_partial():
+    stamp = time.mktime((2026, 1, 2, 3, 4, 5, 0, 0, -1)) + 0.25
+    lines, partial = main._format_monitor_lines(
+        [(stamp, b"\x1b[32mINFO\x1b[0m ready\r\nhal"), (stamp, b"f"), (stamp, b" done\nnext")], b"")
+    assert lines == ["03:04:05.250 INFO ready", "03:04:05.250 half done"]
+    assert partial == b"next"
+
+
+def test_format_lines_flushes_endless_line():
+    data = b"x" * (main.MONITOR_READ_SIZE + 1)
+    lines, partial = main._format_monitor_lines([(time.time(), data)], b"")
+    assert partial == b""
+    assert len(lines) == 1 and lines[0].endswith("x" * main.MONITOR_READ_SIZE)
@@ -0,0 +1,64 @@
+"""
+Tests de la lecture de mountinfo et de la detection des lecteurs BOOTSEL
+"""
+import main
+
+
+def _mountinfo(tmp_path, lines, monkeypatch):
+    path = tmp_path / "mountinfo"
+    path.write_text("".join(line + "\n" for line in lines))
+    monkeypatch.setattr(main, "MOUNTINFO_FILE", str(path))
+
+
+def _bootsel_drive(path):
+    path.mkdir(parents=True)
+    (path / "INFO_UF2.TXT").write_text("UF2 Bootloader v3.0\nModel: Raspberry Pi RP2\nBoard-ID: RPI-RP2\n")
+    return str(path)
+
+
+def test_read_mountinfo_fields_and_escapes(tmp_path, monkeypatch):
+    _mountinfo(tmp_path, [
+        "22 1 259:2 / / rw,relatime shared:1 - ext4 /dev/nvme0n1p2 rw",
+        r"98 22 8:17 / /media/user/RPI-RP2\040(2) rw,nosuid shared:50 master:3 - vfat /dev/sdb1 rw,uid=1000",
+        "99 22 0:50 / /tmp rw - tmpfs tmpfs rw",
+        "garbage line",
+    ], monkeypatch)
+    assert main.read_mountinfo() == [
+        ("/", "ext4", "/dev/nvme0n1p2"),
+        ("/media/user/RPI-RP2 (2)", "vfat", "/dev/sdb1"),
+        ("/tmp", "tmpfs", "tmpfs"),
+    ]
+
+
+def test_detect_by_mount_point_name(tmp_path, monkeypatch):
+    drive = _bootsel_drive(tmp_path / "media" / "RPI-RP2")
+    # Meme nom mais sans INFO_UF2.TXT, ou pas en FAT: ignores
+    (tmp_path / "other" / "RPI-RP2").mkdir(parents=True)
+    fake = _bootsel_drive(tmp_path / "ext" / "RPI-RP2")
+    _mountinfo(tmp_path, [
+        f"98 22 8:17 / {drive} rw - vfat /dev/sdb1 rw",
+        f"99 22 8:33 / {tmp_path / 'other' / 'RPI-RP2'} rw - vfat /dev/sdc1 rw",
+        f"100 22 8:49 / {fake} rw - ext4 /dev/sdd1 rw",
+    ], monkeypatch)
+    monkeypatch.setattr(main, "_disk_labels", lambda: {})
+    assert main.detect_pico_uf2_disks() == [drive]
+
+
+def test_detect_by_partition_label(tmp_path, monkeypatch):
+    drive = _bootsel_drive(tmp_path / "mnt" / "pico")
+    renamed = _bootsel_drive(tmp_path / "mnt" / "RPI-RP2-backup")
+    _mountinfo(tmp_path, [
+        f"98 22 8:17 / {drive} rw - vfat /dev/sdb1 rw",
+        f"99 22 8:33 / {renamed} rw - vfat /dev/sdc1 rw",
+    ], monkeypatch)
+    # Le label de la partition l'emporte sur le nom du point de montage
+    monkeypatch.setattr(main, "_disk_labels", lambda: {"/dev/sdb1": "RPI-RP2", "/dev/sdc1": "DATA"})
+    assert main.detect_pico_uf2_disks() == [drive]
+
+
+def test_detect_without_mountinfo_uses_patterns(tmp_path, monkeypatch):
+    drive = _bootsel_drive(tmp_path / "Volumes" / "RPI-RP2")
+    monkeypatch.setattr(main, "MOUNTINFO_FILE", str(tmp_path / "absent"))
+    monkeypatch.setattr(main, "PICO_UF2_MOUNT_PATTERNS", [str(tmp_path / "Volumes" / "RPI-RP2*")])
+    assert main.detect_pico_uf2_disks() == [drive]
+    assert main.mounted_paths() is None
@@ -0,0 +1,117 @@
+"""
+Tests de l'analyse statique de la pile sur un firmware Thumb synthetique
+"""
+import struct
+
+import pytest
+
+import stackusage
+from elffile import SHF_ALLOC, SHF_EXECINSTR, SHT_NOBITS, STT_FUNC, ElfError, ElfFile
+
+FLASH = 0x10000000
+TEXT = FLASH + 0x100
+RAM = 0x20000000
+STACK_TOP = 0x20040000
+
+
+def thumb_bl(source, target):
+    """Encodage de `BL target` place a `source` (deux demi-mots)."""
+    offset = target - (source + 4)
+    s = (offset >> 24) & 1
+    j1 = (1 ^ ((offset >> 23) & 1) ^ s) & 1
+    j2 = (1 ^ ((offset >> 22) & 1) ^ s) & 1
+    return [0xF000 | (s << 10) | ((offset >> 12) & 0x3FF), 0xD000 | (j1 << 13) | (j2 << 11) | ((offset >> 1) & 0x7FF)]
+
+
+# (nom, adresse, demi-mots); les BL sont resolus a la construction
+FUNCTIONS = [
+    ("Reset", TEXT, [0xB510, ("bl", "foo"), 0xE7FE]),              # push {r4, lr}; bl foo; b .
+    ("foo", TEXT + 0x08, [0xB5F0, 0xB084, ("bl", "bar"), 0xBDF0]),  # push {r4-r7, lr}; sub sp, #16; bl bar; pop
+    ("bar", TEXT + 0x14, [0xB082, 0x4770]),                         # sub sp, #8; bx lr (24 dans .stack_sizes)
+    ("irq", TEXT + 0x18, [0xB500, 0x4798, 0xBD00]),                 # push {lr}; blx r3; pop {pc}
+    ("rec", TEXT + 0x20, [0xB500, ("bl", "rec"), 0xBD00]),          # push {lr}; bl rec; pop {pc}
+]
+
+
+@pytest.fixture
+def firmware(make_elf):
+    addresses = {name: address for name, address, _ in FUNCTIONS}
+    code = bytearray()
+    symbols = []
+    for name, address, halfwords in FUNCTIONS:
+        code += bytes(address - TEXT - len(code))
+        start = len(code)
+        for item in halfwords:
+            words = thumb_bl(TEXT + len(code), addresses[item[1]]) if isinstance(item, tuple) else [item]
+            code += struct.pack(f"<{len(words)}H", *words)
+        symbols.append((name, address | 1, len(code) - start, STT_FUNC, 1, ".text"))
+    vectors = [STACK_TOP, addresses["Reset"] | 1] + [0] * 14 + [addresses["irq"] | 1]
+    return make_elf(
+        sections=[
+            {"name": ".vector_table", "flags": SHF_ALLOC, "addr": FLASH, "data": struct.pack("<17I", *vectors)},
+            {"name": ".text", "flags": SHF_ALLOC | SHF_EXECINSTR, "addr": TEXT, "data": bytes(code)},
+            {"name": ".bss", "type": SHT_NOBITS, "flags": SHF_ALLOC, "addr": RAM, "size": 0x100},
+            {"name": ".stack_sizes", "data": struct.pack("<I", addresses["bar"] | 1) + bytes([24])},
+        ],
+        symbols=symbols,
+        entry=addresses["Reset"] | 1,
+    )
+
+
+def test_read_stack_sizes(firmware):
+    with ElfFile(firmware) as elf:
+        assert stackusage.read_stack_sizes(elf) == {TEXT + 0x14: 24}
+
+
+def test_call_graph_frames_and_callees(firmware):
+    with ElfFile(firmware) as elf:
+        graph = stackusage.build_call_graph(elf)
+    frames = dict(zip(graph.names, graph.frames))
+    assert frames == {"Reset": 8, "foo": 36, "bar": 24, "irq": 4, "rec": 4}
+    assert list(graph.sources) == [stackusage.SOURCE_PROLOGUE, stackusage.SOURCE_PROLOGUE,
+                                   stackusage.SOURCE_STACK_SIZES, stackusage.SOURCE_PROLOGUE,
+                                   stackusage.SOURCE_PROLOGUE]
+    callees = {graph.names[i]: [graph.names[c] for c in graph.callees[graph.offsets[i]:graph.offsets[i + 1]]]
+               for i in range(len(graph))}
+    assert callees == {"Reset": ["foo"], "foo": ["bar"], "bar": [], "irq": [], "rec": ["rec"]}
+    assert graph.flags[graph.names.index("irq")] == stackusage.FLAG_INDIRECT
+
+
+def test_analyze_stack_report(firmware):
+    report = stackusage.analyze_stack(firmware)
+    assert report["arch"] == "thumb"
+    assert report["sources"] == {"stack_sizes": 1, "prologue": 4}
+    [entry] = report["entries"]
+    assert (entry["name"], entry["worst"], entry["path"], entry["flags"]) == ("Reset", 68, ["Reset", "foo", "bar"], [])
+    [handler] = report["handlers"]
+    # Trame materielle de 32 octets empilee a l'entree de l'interruption
+    assert (handler["name"], handler["worst"], handler["vectors"], handler["flags"]) == ("irq", 36, ["IRQ0"],
+                                                                                         ["indirect"])
+    assert report["recursion"] == [["rec"]]
+    assert report["indirect"] == ["irq"]
+    assert report["stack"] == {"top": STACK_TOP, "bottom": RAM + 0x100, "available": STACK_TOP - RAM - 0x100}
+    assert report["worst_total"] == 68 + 36
+    assert report["lower_bound"]
+
+
+def test_unsupported_architecture(make_elf):
+    elf = make_elf(sections=[{"name": ".text", "flags": SHF_ALLOC | SHF_EXECINSTR, "data": bytes(4)}], machine=62)
+    with pytest.raises(ElfError, match="non supportee"):
+        stackusage.analyze_stack(elf)
+
+
+def test_riscv_prologue_and_calls(make_elf):
+    base = 0x42000000
+    # main: addi sp, sp, -16; jal ra, helper; ret / helper: addi sp, sp, -32; ret
+    code = struct.pack("<5I", 0xFF010113, 0x008000EF, 0x00008067, 0xFE010113, 0x00008067)
+    elf = make_elf(
+        sections=[{"name": ".text", "flags": SHF_ALLOC | SHF_EXECINSTR, "addr": base, "data": code}],
+        symbols=[("main", base, 12, STT_FUNC, 1, ".text"), ("helper", base + 12, 8, STT_FUNC, 1, ".text")],
+        machine=stackusage.EM_RISCV,
+        entry=base,
+    )
+    report = stackusage.analyze_stack(elf)
+    assert report["arch"] == "riscv32"
+    [entry] = report["entries"]
+    assert (entry["name"], entry["frame"], entry["worst"], entry["path"]) == ("main", 16, 48, ["main", "helper"])
+    assert report["handlers"] == [] and report["stack"] is None
@@ -0,0 +1,154 @@
+"""
+Tests de verify_uf2, merge_uf2 et extract_uf2
+"""
+import io
+import struct
+
+import pytest
+
+import uf2conv
+from uf2conv import RP2040_FAMILY_ID, UF2_BLOCK_SIZE
+
+FLASH = 0x10000000
+
+
+def _blocks(data):
+    return [bytearray(data[i:i + UF2_BLOCK_SIZE]) for i in range(0, len(data), UF2_BLOCK_SIZE)]
+
+
+def _field(block, offset, value):
+    struct.pack_into("<I", block, offset, value)
+
+
+def _renumber(blocks):
+    for number, block in enumerate(blocks):
+        _field(block, 20, number)
+        _field(block, 24, len(blocks))
+    return b"".join(blocks)
+
+
+def test_convert_then_verify_is_clean():
+    data = uf2conv.convert_to_uf2(bytes(range(256)) * 10, FLASH)
+    assert uf2conv.verify_uf2(data, RP2040_FAMILY_ID) == (10, {}, {})
+    info = uf2conv.uf2_info(data)
+    assert info["payload"] == 2560
+    assert info["families"]["rp2040"]["ranges"] == [(FLASH, FLASH + 2560)]
+
+
+def test_verify_reports_family_and_trailing_bytes():
+    data = uf2conv.convert_to_uf2(bytes(256), FLASH, family_id=0xe48bff59)
+    _, errors, _ = uf2conv.verify_uf2(data + b"xx", RP2040_FAMILY_ID)
+    assert errors["2 octets apres le dernier bloc"] == [1]
+    assert list(errors)[1].startswith("family ")
+
+
+def test_verify_detects_duplicate_and_overlap():
+    blocks = _blocks(uf2conv.convert_to_uf2(bytes(256 * 3), FLASH))
+    duplicate = _renumber(blocks + [bytearray(blocks[1])])
+    _, errors, _ = uf2conv.verify_uf2(duplicate)
+    assert errors == {"bloc duplique": [3]}
+
+    shifted = bytearray(blocks[2])
+    _field(shifted, 12, FLASH + 0x180)
+    _field(shifted, 16, 128)
+    _, errors, warnings = uf2conv.verify_uf2(_renumber(blocks + [shifted]))
+    assert errors["blocs qui se chevauchent"] == [3]
+    assert "adresses non croissantes" in warnings
+
+
+@pytest.mark.parametrize("size, kind", [(0, "payload vide"), (477, "payload de plus de 476 octets")])
+def test_verify_rejects_bad_payload_size(size, kind):
+    blocks = _blocks(uf2conv.convert_to_uf2(bytes(256 * 2), FLASH))
+    _field(blocks[1], 16, size)
+    _, errors, _ = uf2conv.verify_uf2(b"".join(blocks))
+    assert errors == {kind: [1]}
+
+
+def test_verify_numbering_and_sections():
+    blocks = _blocks(uf2conv.convert_to_uf2(bytes(256 * 3), FLASH))
+    _field(blocks[2], 20, 5)
+    _, errors, _ = uf2conv.verify_uf2(b"".join(blocks))
+    assert errors == {"numerotation incorrecte": [2]}
+
+    # Deux images concatenees sont deux sections valides, une image coupee ne l'est pas
+    other = uf2conv.convert_to_uf2(bytes(256 * 2), FLASH + 0x10000)
+    assert uf2conv.verify_uf2(uf2conv.convert_to_uf2(bytes(256 * 3), FLASH) + other)[1] == {}
+    _, errors, _ = uf2conv.verify_uf2(b"".join(blocks[:2]) + other)
+    assert errors == {"section incomplete": [2]}
+
+
+def test_merge_renumbers_blocks():
+    first = uf2conv.convert_to_uf2(b"\x11" * 512, FLASH)
+    output = io.BytesIO()
+    count = uf2conv.merge_uf2([(first, None), (b"\x22" * 300, FLASH + 0x1000)], output)
+    merged = output.getvalue()
+    assert count == 4
+    assert uf2conv.verify_uf2(merged, RP2040_FAMILY_ID) == (4, {}, {})
+    numbers = [struct.unpack_from("<2I", merged, i * UF2_BLOCK_SIZE + 20) for i in range(count)]
+    assert numbers == [(0, 4), (1, 4), (2, 4), (3, 4)]
+    assert uf2conv.uf2_info(merged)["families"]["rp2040"]["ranges"] == [(FLASH, FLASH + 0x200),
+                                                                        (FLASH + 0x1000, FLASH + 0x1200)]
+
+
+def test_merge_rejects_overlapping_images():
+    with pytest.raises(ValueError, match="incompatibles.*chevauchent|incompatibles.*duplique"):
+        uf2conv.merge_uf2([(bytes(1024), FLASH), (bytes(256), FLASH + 0x100)], io.BytesIO())
+
+
+def test_merge_rejects_invalid_image():
+    blocks = _blocks(uf2conv.convert_to_uf2(bytes(512), FLASH))
+    _field(blocks[0], 16, 0)
+    with pytest.raises(ValueError, match="image 1 invalide: payload vide"):
+        uf2conv.merge_uf2([(b"".join(blocks), None)], io.BytesIO())
+    with pytest.raises(ValueError, match="image 1: ni UF2"):
+        uf2conv.merge_uf2([(b"not an uf2", None)], io.BytesIO())
+
+
+def test_extract_round_trip(tmp_path):
+    payload = bytes(range(256)) * 7 + b"tail"
+    output = tmp_path / "firmware.bin"
+    base, size, written = uf2conv.extract_uf2(uf2conv.convert_to_uf2(payload, FLASH), output)
+    assert base == FLASH
+    # Le dernier bloc est complete a 256 octets par des zeros
+    assert size == written == 8 * 256
+    assert output.read_bytes() == payload + bytes(size - len(payload))
+
+
+def test_extract_with_gap_and_base(tmp_path):
+    output = io.BytesIO()
+    uf2conv.merge_uf2([(b"\xaa" * 256, FLASH + 0x1000), (b"\xbb" * 256, FLASH + 0x100)], output)
+    target = tmp_path / "gap.bin"
+    base, size, written = uf2conv.extract_uf2(output.getvalue(), target, base=FLASH)
+    assert (base, size, written) == (FLASH, 0x1100, 512)
+    data = target.read_bytes()
+    assert data[:0x100] == bytes(0x100)
+    assert data[0x100:0x200] == b"\xbb" * 256
+    assert data[0x200:0x1000] == bytes(0xe00)
+    assert data[0x1000:] == b"\xaa" * 256
+
+    with pytest.raises(ValueError, match="avant l'adresse de base"):
+        uf2conv.extract_uf2(output.getvalue(), target, base=FLASH + 0x200)
+
+
+def test_extract_skips_empty_and_oversize_blocks(tmp_path):
+    blocks = _blocks(uf2conv.convert_to_uf2(b"\x01" * 256 + b"\x02" * 256 + b"\x03" * 256, FLASH))
+    _field(blocks[0], 16, 0)
+    _field(blocks[2], 16, 477)
+    target = tmp_path / "partial.bin"
+    assert uf2conv.extract_uf2(b"".join(blocks), target) == (FLASH + 0x100, 256, 256)
+    assert target.read_bytes() == b"\x02" * 256
+
+    for block in blocks:
+        _field(block, 16, 0)
+    with pytest.raises(ValueError, match="aucun bloc"):
+        uf2conv.extract_uf2(b"".join(blocks), target)
+
+
+def test_extract_requires_family_choice(tmp_path):
+    output = io.BytesIO()
+    uf2conv.merge_uf2([(uf2conv.convert_to_uf2(bytes(256), FLASH), None),
+                       (uf2conv.convert_to_uf2(bytes(256), 0, family_id=0x1c5f21b0), None)], output)
+    target = tmp_path / "esp.bin"
+    with pytest.raises(ValueError, match="plusieurs familles"):
+        uf2conv.extract_uf2(output.getvalue(), target)
+    assert uf2conv.extract_uf2(output.getvalue(), target, family_id=0x1c5f21b0) == (0, 256, 256)
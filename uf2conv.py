@@ -6,6 +6,18 @@ Basé sur le script officiel Microsoft UF2
 import sys
 import struct
 import os
+import io
+import mmap
+import hashlib
+import argparse
+import array
+import collections
+import operator
+import itertools
+import contextlib
+import json
+
+from elffile import ElfError, ElfFile, is_elf_file
 
 UF2_MAGIC_START0 = 0x0A324655
 UF2_MAGIC_START1 = 0x9E5D5157
@@ -13,67 +25,753 @@ UF2_MAGIC_END = 0x0AB16F30
 
 RP2040_FAMILY_ID = 0xe48bff56
 
+UF2_BLOCK_SIZE = 512
+UF2_PAYLOAD_SIZE = 256
+UF2_MAX_PAYLOAD_SIZE = 476
+UF2_FLAG_NOT_MAIN_FLASH = 0x0001
+UF2_FLAG_FAMILY_ID_PRESENT = 0x2000
+
+UF2_FAMILIES = {
+    0xe48bff56: "rp2040",
+    0xe48bff57: "absolute",
+    0xe48bff58: "data",
+    0xe48bff59: "rp2350-arm-s",
+    0xe48bff5a: "rp2350-riscv",
+    0xe48bff5b: "rp2350-arm-ns",
+    0xd42ba06c: "esp32c3",
+}
+# Familles Raspberry Pi: le bootrom ignore les blocs qui ne sont pas des pages
+# de 256 octets alignees
+UF2_PAGED_FAMILIES = {0xe48bff56, 0xe48bff57, 0xe48bff58, 0xe48bff59, 0xe48bff5a, 0xe48bff5b}
+
+# Messages d'un meme type affiches par verify avant le simple decompte
+UF2_REPORT_LIMIT = 8
+
+# Header (8 mots de 32 bits) + footer (magic de fin en fin de bloc)
+_UF2_HEADER = struct.Struct("<8I")
+_UF2_FOOTER = struct.Struct("<I")
+_UF2_DATA_OFFSET = _UF2_HEADER.size
+_UF2_FOOTER_OFFSET = UF2_BLOCK_SIZE - _UF2_FOOTER.size
+# Adresse target, payload size et numero de bloc (champs 3 a 5 du header)
+_UF2_ADDR_AND_NO = struct.Struct("<3I")
+_UF2_ADDR_OFFSET = 12
+# Numero de bloc et total (champs 6 et 7 du header), reecrits par merge
+_UF2_NO_AND_TOTAL = struct.Struct("<2I")
+_UF2_NO_OFFSET = 20
+# Champs d'un bloc en lecture: header, payload saute (jamais copie), magic de fin
+_UF2_BLOCK_FIELDS = struct.Struct("<8I476xI")
+
+# Nombre de blocs accumules avant chaque ecriture vers le fichier de sortie
+UF2_WRITE_BATCH = 64
+
+_ZERO_PAYLOAD = bytes(UF2_PAYLOAD_SIZE)
+
+# Le bootrom RP2040 efface la flash par secteurs de 4 Ko : une page modifiee
+# entraine la reecriture de tout son secteur
+FLASH_SECTOR_SIZE = 4096
+
+
+def _uf2_block_count(size):
+    """Retourne le nombre de blocs UF2 necessaires pour `size` octets."""
+    return (size + UF2_PAYLOAD_SIZE - 1) // UF2_PAYLOAD_SIZE
+
+
+def _new_block_buffer(num_blocks, num_total, family_id):
+    """Alloue un tampon de `num_blocks` blocs aux champs constants pre-remplis.
+
+    Seuls l'adresse, le numero de bloc et le payload changent d'un bloc a
+    l'autre : le reste du header, le padding et le magic de fin sont ecrits
+    une seule fois ici.
+    """
+    buf = bytearray(UF2_BLOCK_SIZE * num_blocks)
+    for i in range(num_blocks):
+        offset = i * UF2_BLOCK_SIZE
+        _UF2_HEADER.pack_into(buf, offset,
+            UF2_MAGIC_START0,            # magic start 0
+            UF2_MAGIC_START1,            # magic start 1
+            UF2_FLAG_FAMILY_ID_PRESENT,  # flags (family ID présent)
+            0,                           # adresse target (par bloc)
+            UF2_PAYLOAD_SIZE,            # payload size
+            0,                           # block number (par bloc)
+            num_total,                   # nombre total de blocks
+            family_id                    # family ID (RP2040)
+        )
+        _UF2_FOOTER.pack_into(buf, offset + _UF2_FOOTER_OFFSET, UF2_MAGIC_END)
+    return buf
+
+
+def _pack_uf2_block(buf, offset, payload, target_addr, block_no):
+    """Ecrit l'adresse, le numero et le payload d'un bloc a la position `offset`."""
+    _UF2_ADDR_AND_NO.pack_into(buf, offset + _UF2_ADDR_OFFSET,
+                               target_addr, UF2_PAYLOAD_SIZE, block_no)
+    data_start = offset + _UF2_DATA_OFFSET
+    length = len(payload)
+    buf[data_start:data_start + length] = payload
+    # Pad le payload à 256 bytes si nécessaire (dernier bloc)
+    if length < UF2_PAYLOAD_SIZE:
+        buf[data_start + length:data_start + UF2_PAYLOAD_SIZE] = _ZERO_PAYLOAD[length:]
+
+
+def _iter_chunks(view, start_addr):
+    """Decoupe une image contigue en couples (adresse, payload de 256 octets max)."""
+    for offset in range(0, len(view), UF2_PAYLOAD_SIZE):
+        yield start_addr + offset, view[offset:offset + UF2_PAYLOAD_SIZE]
+
+
+def iter_uf2_blocks(data, start_addr=0x10000000, family_id=RP2040_FAMILY_ID):
+    """Genere les blocs UF2 un par un sans copier l'image source.
+
+    `data` peut etre bytes, bytearray, mmap ou memoryview. Chaque bloc est
+    renvoye sous forme de memoryview sur un unique tampon reutilise : il doit
+    etre consomme (ecrit ou copie) avant de demander le bloc suivant.
+    """
+    view = memoryview(data).cast("B")
+    num_blocks = _uf2_block_count(len(view))
+    buf = _new_block_buffer(1, num_blocks, family_id)
+    block = memoryview(buf)
+
+    for block_no, (addr, payload) in enumerate(_iter_chunks(view, start_addr)):
+        _pack_uf2_block(buf, 0, payload, addr, block_no)
+        yield block
+
+
+def write_uf2_payloads(payloads, num_blocks, sink, family_id=RP2040_FAMILY_ID):
+    """Ecrit des blocs UF2 a partir de couples (adresse, payload) dans `sink`.
+
+    Les blocs sont numerotes dans l'ordre d'arrivee, `num_blocks` doit donc
+    correspondre exactement au nombre de payloads fournis. Les blocs sont
+    construits par lots dans un tampon prealloue reutilise, la memoire
+    consommee reste constante quelle que soit la taille de l'image.
+    Retourne le nombre d'octets UF2 ecrits.
+    """
+    batch = min(UF2_WRITE_BATCH, num_blocks) or 1
+    buf = _new_block_buffer(batch, num_blocks, family_id)
+    out = memoryview(buf)
+    written = 0
+    slot = 0
+
+    for block_no, (addr, payload) in enumerate(payloads):
+        _pack_uf2_block(buf, slot * UF2_BLOCK_SIZE, payload, addr, block_no)
+        slot += 1
+        if slot == batch:
+            sink.write(out)
+            written += batch * UF2_BLOCK_SIZE
+            slot = 0
+
+    if slot:
+        sink.write(out[:slot * UF2_BLOCK_SIZE])
+        written += slot * UF2_BLOCK_SIZE
+
+    if written != num_blocks * UF2_BLOCK_SIZE:
+        raise ValueError(f"{written // UF2_BLOCK_SIZE} blocs ecrits, {num_blocks} annonces")
+    return written
+
+
+def write_uf2(data, sink, start_addr=0x10000000, family_id=RP2040_FAMILY_ID):
+    """Ecrit `data` au format UF2 dans `sink` (fichier ou objet avec write()).
+
+    Retourne le nombre d'octets UF2 ecrits.
+    """
+    view = memoryview(data).cast("B")
+    return write_uf2_payloads(_iter_chunks(view, start_addr), _uf2_block_count(len(view)),
+                              sink, family_id)
+
+
+def segment_pages(segments):
+    """Decoupe des segments [(adresse, donnees)] en pages UF2 alignees sur 256 octets.
+
+    Seules les pages reellement couvertes par un segment sont produites, les
+    trous entre segments ne sont pas remplis. Une page partagee par deux
+    segments est fusionnee, les octets non couverts valent 0.
+    Retourne la liste triee [(adresse_page, payload)].
+    """
+    pages = {}
+    for addr, data in segments:
+        view = memoryview(data).cast("B")
+        pos = 0
+        while pos < len(view):
+            cur = addr + pos
+            page_addr = cur - (cur % UF2_PAYLOAD_SIZE)
+            in_page = cur - page_addr
+            length = min(UF2_PAYLOAD_SIZE - in_page, len(view) - pos)
+            chunk = view[pos:pos + length]
+            existing = pages.get(page_addr)
+            if existing is None and in_page == 0 and length == UF2_PAYLOAD_SIZE:
+                # Page complete : on garde une vue sans copie
+                pages[page_addr] = chunk
+            else:
+                if not isinstance(existing, bytearray):
+                    existing = bytearray(existing) if existing is not None else bytearray(UF2_PAYLOAD_SIZE)
+                    pages[page_addr] = existing
+                existing[in_page:in_page + length] = chunk
+            pos += length
+    return sorted(pages.items(), key=lambda item: item[0])
+
+
+def _write_elf_uf2(elf, sink, family_id):
+    pages = segment_pages(elf.load_segments())
+    if not pages:
+        raise ElfError(f"Aucun segment PT_LOAD a flasher dans {elf.path}")
+    return len(pages), write_uf2_payloads(pages, len(pages), sink, family_id)
+
+
+def convert_elf_to_uf2(elf_file, output, family_id=RP2040_FAMILY_ID):
+    """Convertit un ELF en UF2 directement depuis ses segments PT_LOAD.
+
+    Chaque bloc porte l'adresse de chargement reelle de ses donnees, sans
+    passer par un .bin intermediaire qui remplirait les trous de zeros.
+    `output` est un chemin ou un objet fichier deja ouvert en ecriture.
+    Retourne le couple (octets de payload, taille UF2).
+    """
+    with ElfFile(elf_file) as elf:
+        if hasattr(output, "write"):
+            num_pages, written = _write_elf_uf2(elf, output, family_id)
+        else:
+            with open(output, 'wb') as out:
+                num_pages, written = _write_elf_uf2(elf, out, family_id)
+    return num_pages * UF2_PAYLOAD_SIZE, written
+
+
+def convert_file_to_uf2(input_file, output, start_addr=0x10000000, family_id=RP2040_FAMILY_ID):
+    """Convertit un fichier binaire en UF2 en flux (mmap en entree).
+
+    `output` est un chemin ou un objet fichier deja ouvert en ecriture.
+    Retourne le couple (taille binaire, taille UF2).
+    """
+    with open(input_file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        # mmap refuse les fichiers vides
+        source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            if hasattr(output, "write"):
+                written = write_uf2(source, output, start_addr, family_id)
+            else:
+                with open(output, 'wb') as out:
+                    written = write_uf2(source, out, start_addr, family_id)
+        finally:
+            if size:
+                source.close()
+    return size, written
+
+
+def page_hashes(pages):
+    """Retourne l'empreinte de chaque page : {adresse: hash hexadecimal}."""
+    return {addr: hashlib.blake2b(payload, digest_size=8).hexdigest() for addr, payload in pages}
+
+
+def select_delta_pages(pages, previous_hashes, sector_size=FLASH_SECTOR_SIZE):
+    """Selectionne les pages a reecrire par rapport a une image precedente.
+
+    Une page differente ou absente de `previous_hashes` rend son secteur
+    d'effacement "sale" ; toutes les pages de l'image dans ce secteur sont
+    alors conservees pour que l'effacement ne perde aucune donnee.
+    Retourne le couple (pages a ecrire, empreintes de l'image complete).
+    """
+    hashes = page_hashes(pages)
+    dirty_sectors = {addr - addr % sector_size
+                     for addr, digest in hashes.items() if previous_hashes.get(addr) != digest}
+    delta = [(addr, payload) for addr, payload in pages if addr - addr % sector_size in dirty_sectors]
+    return delta, hashes
+
+
+def elf_page_hashes(elf_file):
+    """Retourne les empreintes des pages UF2 d'un ELF."""
+    with ElfFile(elf_file) as elf:
+        return page_hashes(segment_pages(elf.load_segments()))
+
+
+def _write_elf_uf2_delta(elf, sink, previous_hashes, family_id):
+    pages = segment_pages(elf.load_segments())
+    delta, hashes = select_delta_pages(pages, previous_hashes)
+    if delta:
+        write_uf2_payloads(delta, len(delta), sink, family_id)
+    return len(delta), len(pages), hashes
+
+
+def convert_elf_to_uf2_delta(elf_file, output, previous_hashes, family_id=RP2040_FAMILY_ID):
+    """Genere un UF2 ne contenant que les secteurs modifies depuis `previous_hashes`.
+
+    Les blocs retenus sont renumerotes de 0 a n-1 avec un total de n, comme
+    un UF2 complet, pour que le bootloader les accepte et redemarre apres le
+    dernier. Rien n'est ecrit si aucune page n'a change.
+    Retourne (pages ecrites, pages de l'image, empreintes de l'image).
+    """
+    with ElfFile(elf_file) as elf:
+        if hasattr(output, "write"):
+            return _write_elf_uf2_delta(elf, output, previous_hashes, family_id)
+        with open(output, 'wb') as out:
+            return _write_elf_uf2_delta(elf, out, previous_hashes, family_id)
+
+
 def convert_to_uf2(data, start_addr=0x10000000, family_id=RP2040_FAMILY_ID):
     """Convertit des données binaires en format UF2."""
-    chunks = [data[i:i+256] for i in range(0, len(data), 256)]
-    uf2_blocks = []
-    
-    for block_no, chunk in enumerate(chunks):
-        # Pad le chunk à 256 bytes si nécessaire
-        if len(chunk) < 256:
-            chunk += b'\x00' * (256 - len(chunk))
-        
-        # Créer le header UF2
-        header = struct.pack("<8I",
-            UF2_MAGIC_START0,          # magic start 0
-            UF2_MAGIC_START1,          # magic start 1  
-            0x2000,                    # flags (family ID présent)
-            start_addr + block_no * 256, # adresse target
-            256,                       # payload size
-            block_no,                  # block number
-            len(chunks),               # nombre total de blocks
-            family_id                  # family ID (RP2040)
-        )
-        
-        # Créer le footer
-        footer = struct.pack("<I", UF2_MAGIC_END)
-        
-        # Padding pour arriver à 512 bytes
-        padding = b'\x00' * (512 - len(header) - len(chunk) - len(footer))
-        
-        block = header + chunk + padding + footer
-        uf2_blocks.append(block)
-    
-    return b''.join(uf2_blocks)
+    sink = io.BytesIO()
+    write_uf2(data, sink, start_addr, family_id)
+    return sink.getvalue()
+
+
+def is_uf2_data(data):
+    """Indique si `data` commence par un bloc UF2."""
+    return len(data) >= _UF2_ADDR_AND_NO.size and _UF2_ADDR_AND_NO.unpack_from(data, 0)[:2] == (UF2_MAGIC_START0, UF2_MAGIC_START1)
+
+
+def uf2_columns(data):
+    """Decode les champs de tous les blocs UF2 de `data`, colonne par colonne.
+
+    Chaque champ est copie d'un coup depuis une vue a pas de 512 octets sur
+    `data` (bytes, mmap ou memoryview) vers un array('I'), sans boucle
+    Python ni copie des payloads ; struct.iter_unpack prend le relais sur
+    une machine big-endian. Les octets apres le dernier bloc complet sont
+    ignores. Retourne les colonnes (magic0, magic1, flags, adresses,
+    tailles, numeros, totaux, familles, magics de fin), le bloc i commencant
+    a l'offset i * 512.
+    """
+    view = memoryview(data).cast("B")
+    view = view[:len(view) - len(view) % UF2_BLOCK_SIZE]
+    if sys.byteorder == "little":
+        words = view.cast("I")
+        stride = UF2_BLOCK_SIZE // 4
+        return [array.array("I", bytes(words[field::stride])) for field in (*range(8), stride - 1)]
+    blocks = list(_UF2_BLOCK_FIELDS.iter_unpack(view))
+    return [array.array("I", column) for column in zip(*blocks)] if blocks else [array.array("I") for _ in range(9)]
+
+
+def _all_equal(column, value):
+    """Toutes les valeurs de la colonne valent `value` (comparaison de tampons, sans boucle Python)."""
+    return column == array.array("I", [value]) * len(column)
+
+
+def _is_contiguous(addrs, size):
+    """Adresses qui se suivent exactement de `size` en `size` octets (jamais pour des blocs vides)."""
+    if size <= 0:
+        return False
+    end = addrs[0] + len(addrs) * size if addrs else 0
+    return end <= 0x100000000 and addrs == array.array("I", range(addrs[0], end, size))
+
+
+def _renumber_uf2(buf, num_blocks):
+    """Reecrit numero et total de chaque bloc de `buf` (0..n-1 sur n)."""
+    if sys.byteorder == "little":
+        words = memoryview(buf).cast("I")
+        stride = UF2_BLOCK_SIZE // 4
+        words[_UF2_NO_OFFSET // 4::stride] = array.array("I", range(num_blocks))
+        words[_UF2_NO_OFFSET // 4 + 1::stride] = array.array("I", [num_blocks]) * num_blocks
+        words.release()
+        return
+    for block_no in range(num_blocks):
+        _UF2_NO_AND_TOTAL.pack_into(buf, block_no * UF2_BLOCK_SIZE + _UF2_NO_OFFSET, block_no, num_blocks)
+
+
+def family_name(family_id):
+    """Nom lisible d'une family ID UF2 (None: bloc sans family ID)."""
+    if family_id is None:
+        return "sans family"
+    return UF2_FAMILIES.get(family_id, f"{family_id:#010x}")
+
+
+def parse_family(text):
+    """Family ID depuis un nom (`rp2040`) ou un nombre (`0xe48bff56`)."""
+    for family_id, name in UF2_FAMILIES.items():
+        if name == text.lower():
+            return family_id
+    return int(text, 0)
+
+
+def _merge_ranges(spans):
+    """Fusionne des intervalles [debut, fin) contigus ou qui se chevauchent."""
+    ranges = []
+    for start, end in sorted(spans):
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    return [tuple(item) for item in ranges]
+
+
+def uf2_info(data):
+    """Resume d'une image UF2 : blocs, familles, plages d'adresses et payload."""
+    _, _, flags, addrs, sizes, _, _, families, _ = uf2_columns(data)
+    count = len(flags)
+    if count and _all_equal(flags, UF2_FLAG_FAMILY_ID_PRESENT) and _all_equal(families, families[0]):
+        # Cas courant: une seule famille, blocs tous en flash principale
+        spans = {families[0]: None}
+        if _all_equal(sizes, sizes[0]) and _is_contiguous(addrs, sizes[0]):
+            spans[families[0]] = [(addrs[0], addrs[0] + count * sizes[0])]
+        else:
+            spans[families[0]] = _merge_ranges(zip(addrs, map(operator.add, addrs, sizes)))
+        counts = {families[0]: count}
+        payload = sum(sizes)
+        not_main_flash = 0
+    else:
+        main_flash = [not flag & UF2_FLAG_NOT_MAIN_FLASH for flag in flags]
+        blocks = collections.defaultdict(list)
+        for family, flag, addr, size in itertools.compress(zip(families, flags, addrs, sizes), main_flash):
+            blocks[family if flag & UF2_FLAG_FAMILY_ID_PRESENT else None].append((addr, addr + size))
+        spans = {family: _merge_ranges(family_spans) for family, family_spans in blocks.items()}
+        counts = {family: len(family_spans) for family, family_spans in blocks.items()}
+        payload = sum(itertools.compress(sizes, main_flash))
+        not_main_flash = main_flash.count(False)
+    return {
+        "size": len(data),
+        "blocks": count,
+        "not_main_flash": not_main_flash,
+        "payload": payload,
+        "families": {family_name(family): {"blocks": counts[family], "ranges": spans[family]}
+                     for family in spans},
+    }
+
+
+def _uf2_is_clean(columns, family_id):
+    """Controle rapide, colonne par colonne, du cas courant : une seule section et une seule famille,
+    blocs de meme taille ranges par adresses croissantes. False : il faut le diagnostic detaille."""
+    magic0, magic1, flags, addrs, sizes, numbers, totals, families, magic_end = columns
+    count = len(flags)
+    if not count:
+        return False
+    family, size = families[0], sizes[0]
+    if not (_all_equal(magic0, UF2_MAGIC_START0) and _all_equal(magic1, UF2_MAGIC_START1)
+            and _all_equal(magic_end, UF2_MAGIC_END) and _all_equal(flags, UF2_FLAG_FAMILY_ID_PRESENT)
+            and _all_equal(families, family) and _all_equal(sizes, size) and _all_equal(totals, count)
+            and numbers == array.array("I", range(count))):
+        return False
+    if (family_id is not None and family != family_id) or not 0 < size <= UF2_MAX_PAYLOAD_SIZE:
+        return False
+    if family in UF2_PAGED_FAMILIES and (size != UF2_PAYLOAD_SIZE or any(map(operator.mod, addrs,
+                                                                              itertools.repeat(size)))):
+        return False
+    if _is_contiguous(addrs, size):
+        return True
+    # Adresses croissantes et ecart d'au moins une taille de bloc : ni doublon ni chevauchement
+    gaps = map(operator.sub, itertools.islice(addrs, 1, None), addrs)
+    return not any(map(operator.lt, gaps, itertools.repeat(size)))
+
+
+def verify_uf2(data, family_id=None):
+    """Controle une image UF2 ; retourne (nombre de blocs, erreurs, avertissements).
+
+    Sont verifies la taille du fichier, les magics, la taille des payloads,
+    la numerotation de chaque section (0..total-1, une section par image
+    concatenee), la family attendue, l'alignement exige par le bootrom
+    RP2040 et les blocs dupliques ou qui se chevauchent. Erreurs et
+    avertissements sont des dicts {type de probleme: [blocs concernes]}.
+    """
+    errors = collections.defaultdict(list)
+    warnings = collections.defaultdict(list)
+    if not data:
+        errors["fichier vide"].append(0)
+    elif len(data) % UF2_BLOCK_SIZE:
+        errors[f"{len(data) % UF2_BLOCK_SIZE} octets apres le dernier bloc"].append(len(data) // UF2_BLOCK_SIZE)
+
+    columns = uf2_columns(data)
+    if _uf2_is_clean(columns, family_id):
+        return len(columns[0]), dict(errors), {}
+
+    expected = total = 0
+    last_addr = {}
+    placed = collections.defaultdict(list)
+    for index, (magic0, magic1, flags, addr, size, block_no, num_blocks, family, magic_end) in enumerate(zip(*columns)):
+        # Numerotation suivie par position: un bloc corrompu ne decale pas les suivants
+        if block_no == 0 and expected:
+            # Un numero 0 ouvre une nouvelle section (images concatenees)
+            if expected != total:
+                errors["section incomplete"].append(index)
+            expected = 0
+        if expected == 0:
+            total = num_blocks
+        expected += 1
+
+        if magic0 != UF2_MAGIC_START0 or magic1 != UF2_MAGIC_START1 or magic_end != UF2_MAGIC_END:
+            errors["magic invalide"].append(index)
+            continue
+        if size > UF2_MAX_PAYLOAD_SIZE:
+            errors["payload de plus de 476 octets"].append(index)
+            continue
+        if not size:
+            errors["payload vide"].append(index)
+            continue
+        if block_no != expected - 1 or num_blocks != total:
+            errors["numerotation incorrecte"].append(index)
+
+        if flags & UF2_FLAG_NOT_MAIN_FLASH:
+            continue
+        if not flags & UF2_FLAG_FAMILY_ID_PRESENT:
+            family = None
+            warnings["bloc sans family ID"].append(index)
+        elif family_id is not None and family != family_id:
+            errors[f"family {family_name(family)} au lieu de {family_name(family_id)}"].append(index)
+        if family in UF2_PAGED_FAMILIES and (size != UF2_PAYLOAD_SIZE or addr % UF2_PAYLOAD_SIZE):
+            errors["page non alignee sur 256 octets (ignoree par le bootrom)"].append(index)
+        if addr < last_addr.get(family, 0):
+            warnings["adresses non croissantes"].append(index)
+        last_addr[family] = addr
+        placed[family].append((addr, addr + size, index))
+    if expected and expected != total:
+        errors["section incomplete"].append(len(columns[0]))
+
+    for spans in placed.values():
+        spans.sort()
+        prev_addr = prev_end = None
+        for addr, end, index in spans:
+            if prev_end is not None and addr < prev_end:
+                kind = "bloc duplique" if (addr, end) == (prev_addr, prev_end) else "blocs qui se chevauchent"
+                errors[kind].append(index)
+            if prev_end is None or end > prev_end:
+                prev_addr, prev_end = addr, end
+    return len(columns[0]), dict(errors), dict(warnings)
+
+
+def format_uf2_issues(issues):
+    """Lignes de rapport : un type de probleme par ligne, premiers blocs concernes."""
+    lines = []
+    for kind, indexes in issues.items():
+        shown = ", ".join(str(index) for index in indexes[:UF2_REPORT_LIMIT])
+        more = f" (+{len(indexes) - UF2_REPORT_LIMIT})" if len(indexes) > UF2_REPORT_LIMIT else ""
+        lines.append(f"{kind}: {len(indexes)} bloc(s) [{shown}{more}]")
+    return lines
+
+
+def merge_uf2(images, output, family_id=RP2040_FAMILY_ID):
+    """Fusionne plusieurs images en un seul UF2 renumerote.
+
+    `images` est une liste de (donnees, adresse) : un UF2 garde ses blocs
+    tels quels (adresse, drapeaux, family, payload), un binaire (adresse
+    renseignee) est converti avec `family_id`. Les blocs sont concatenes
+    dans l'ordre puis renumerotes de 0 a n-1 sur un total de n. Leve
+    ValueError si une image est invalide ou si deux images se chevauchent.
+    Retourne le nombre de blocs ecrits.
+    """
+    parts = []
+    for position, (data, address) in enumerate(images, 1):
+        if address is not None:
+            data = convert_to_uf2(data, address, family_id)
+        elif not is_uf2_data(data):
+            raise ValueError(f"image {position}: ni UF2 ni binaire avec une adresse (chemin@adresse)")
+        _, errors, _ = verify_uf2(data)
+        if errors:
+            raise ValueError(f"image {position} invalide: {'; '.join(format_uf2_issues(errors))}")
+        parts.append(data)
+
+    merged = bytearray(b"".join(parts))
+    num_blocks = len(merged) // UF2_BLOCK_SIZE
+    _renumber_uf2(merged, num_blocks)
+    _, errors, _ = verify_uf2(merged)
+    if errors:
+        raise ValueError(f"images incompatibles: {'; '.join(format_uf2_issues(errors))}")
+
+    if hasattr(output, "write"):
+        output.write(merged)
+    else:
+        with open(output, 'wb') as out:
+            out.write(merged)
+    return num_blocks
+
+
+def extract_uf2(data, output, family_id=None, base=None):
+    """Reconstruit le binaire d'une image UF2, blocs ranges par adresse.
+
+    Le fichier commence a `base` (par defaut la plus petite adresse) ; les
+    trous entre blocs restent des trous du fichier (sparse, relus comme des
+    zeros). Avec plusieurs familles, `family_id` choisit celle a extraire.
+    Retourne (adresse de base, taille du binaire, octets de payload).
+    """
+    magic0, _, flags, addrs, sizes, _, _, block_families, magic_end = uf2_columns(data)
+    if (len(flags) and _all_equal(magic0, UF2_MAGIC_START0) and _all_equal(magic_end, UF2_MAGIC_END)
+            and _all_equal(flags, UF2_FLAG_FAMILY_ID_PRESENT) and _all_equal(block_families, block_families[0])
+            and 0 < min(sizes) and max(sizes) <= UF2_MAX_PAYLOAD_SIZE):
+        # Cas courant: tous les blocs sont a extraire
+        families = {block_families[0]}
+        selected = range(len(flags)) if family_id in (None, block_families[0]) else []
+    else:
+        selected = []
+        families = set()
+        for index, (start, flag, size, family, end) in enumerate(zip(magic0, flags, sizes,
+                                                                     block_families, magic_end)):
+            if (start != UF2_MAGIC_START0 or end != UF2_MAGIC_END
+                    or flag & UF2_FLAG_NOT_MAIN_FLASH or not 0 < size <= UF2_MAX_PAYLOAD_SIZE):
+                continue
+            if not flag & UF2_FLAG_FAMILY_ID_PRESENT:
+                family = None
+            families.add(family)
+            if family_id is None or family == family_id:
+                selected.append(index)
+    if family_id is None and len(families) > 1:
+        names = ", ".join(sorted(family_name(family) for family in families))
+        raise ValueError(f"plusieurs familles dans l'image ({names}): choisissez-en une")
+    if not selected:
+        raise ValueError("aucun bloc a extraire")
+
+    contiguous = isinstance(selected, range) and _all_equal(sizes, sizes[0]) and _is_contiguous(addrs, sizes[0])
+    if not contiguous:
+        selected = sorted(selected, key=addrs.__getitem__)
+    first = addrs[selected[0]]
+    base = first if base is None else base
+    if first < base:
+        raise ValueError(f"bloc a {first:#x}, avant l'adresse de base {base:#x}")
+    view = memoryview(data).cast("B")
+    end = base
+    payload = 0
+    with open(output, 'wb') as out:
+        if contiguous:
+            # Image d'un seul tenant: les payloads sont ecrits a la suite
+            size = sizes[0]
+            out.seek(first - base)
+            out.writelines(view[offset:offset + size]
+                           for offset in range(_UF2_DATA_OFFSET, len(selected) * UF2_BLOCK_SIZE, UF2_BLOCK_SIZE))
+            return base, first - base + len(selected) * size, len(selected) * size
+        # Blocs contigus ecrits d'un seul writelines, un seek par trou
+        run_start, run = base, []
+        for index in selected:
+            addr, size = addrs[index], sizes[index]
+            if addr != end and run:
+                out.seek(run_start - base)
+                out.writelines(run)
+                run = []
+            if not run:
+                run_start = addr
+            offset = index * UF2_BLOCK_SIZE + _UF2_DATA_OFFSET
+            run.append(view[offset:offset + size])
+            end = max(end, addr + size) if addr < end else addr + size
+            payload += size
+        out.seek(run_start - base)
+        out.writelines(run)
+        run = []
+        out.truncate(end - base)
+    return base, end - base, payload
+
+
+@contextlib.contextmanager
+def _open_image(path):
+    """Projette un fichier en memoire (bytes vides pour un fichier vide)."""
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def _format_kib(size):
+    return f"{size / 1024:.1f} KiB"
+
+
+def _command_info(args):
+    with _open_image(args.file) as data:
+        info = uf2_info(data)
+    if args.json:
+        print(json.dumps(info, indent=2))
+        return 0
+    print(f"📦 {args.file}: {info['blocks']} blocs, {_format_kib(info['payload'])} de payload")
+    if info["not_main_flash"]:
+        print(f"   {info['not_main_flash']} bloc(s) hors flash principale (ignorés)")
+    for name, family in info["families"].items():
+        ranges = ", ".join(f"{start:#010x}-{end:#010x}" for start, end in family["ranges"])
+        print(f"   {name}: {family['blocks']} blocs, {ranges}")
+    return 0
+
+
+def _command_verify(args):
+    with _open_image(args.file) as data:
+        count, errors, warnings = verify_uf2(data, args.family)
+    for line in format_uf2_issues(warnings):
+        print(f"⚠️  {line}")
+    for line in format_uf2_issues(errors):
+        print(f"❌ {line}")
+    if errors:
+        print(f"❌ {args.file}: {count} blocs, image invalide")
+        return 1
+    print(f"✅ {args.file}: {count} blocs valides")
+    return 0
+
+
+def _command_merge(args):
+    try:
+        with contextlib.ExitStack() as stack:
+            images = []
+            for spec in args.inputs:
+                path, _, address = spec.rpartition("@") if "@" in spec else (spec, "", None)
+                images.append((stack.enter_context(_open_image(path)),
+                               int(address, 0) if address is not None else None))
+            num_blocks = merge_uf2(images, args.output, args.family)
+    except ValueError as e:
+        print(f"❌ Fusion impossible: {e}")
+        return 1
+    print(f"✅ {len(images)} images fusionnées: {args.output} ({num_blocks} blocs)")
+    return 0
+
+
+def _command_extract(args):
+    try:
+        with _open_image(args.file) as data:
+            base, size, payload = extract_uf2(data, args.output, args.family, args.base)
+    except ValueError as e:
+        print(f"❌ Extraction impossible: {e}")
+        return 1
+    print(f"✅ {args.output}: {_format_kib(size)} depuis {base:#010x} ({_format_kib(payload)} de payload)")
+    return 0
+
+
+UF2_COMMANDS = {"info": _command_info, "verify": _command_verify, "merge": _command_merge,
+                "extract": _command_extract}
+
+
+def run_uf2_command(argv):
+    """Sous-commandes d'inspection: info, verify, merge, extract."""
+    parser = argparse.ArgumentParser(prog="uf2conv.py", description="Inspection et fusion d'images UF2.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="Blocs, familles et plages d'adresses d'un UF2.")
+    info.add_argument("file")
+    info.add_argument("--json", action="store_true", help="Sortie au format JSON.")
+    verify = commands.add_parser("verify", help="Controle magics, numerotation, familles et chevauchements.")
+    verify.add_argument("file")
+    verify.add_argument("--family", type=parse_family, help="Family attendue (nom ou nombre).")
+    merge = commands.add_parser("merge", help="Fusionne des images en un UF2 renumerote.")
+    merge.add_argument("inputs", nargs="+", metavar="IMAGE",
+                       help="Image UF2, ou binaire sous la forme chemin@adresse.")
+    merge.add_argument("-o", "--output", required=True, help="UF2 fusionne a ecrire.")
+    merge.add_argument("--family", type=parse_family, default=RP2040_FAMILY_ID,
+                       help="Family des binaires convertis (defaut: rp2040).")
+    extract = commands.add_parser("extract", help="Reconstruit le binaire (sparse) d'un UF2.")
+    extract.add_argument("file")
+    extract.add_argument("output")
+    extract.add_argument("--family", type=parse_family, help="Family a extraire (image multi-familles).")
+    extract.add_argument("--base", type=lambda text: int(text, 0),
+                         help="Adresse du debut du binaire (defaut: premier bloc).")
+    args = parser.parse_args(argv)
+    try:
+        return UF2_COMMANDS[args.command](args)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in UF2_COMMANDS:
+        sys.exit(run_uf2_command(sys.argv[1:]))
     if len(sys.argv) != 3:
-        print("Usage: uf2conv.py <input.bin> <output.uf2>")
+        print("Usage: uf2conv.py <input.bin|input.elf> <output.uf2>")
+        print("       uf2conv.py info|verify|merge|extract ... (--help pour le détail)")
         sys.exit(1)
-    
+
     input_file = sys.argv[1]
     output_file = sys.argv[2]
-    
+
     if not os.path.exists(input_file):
         print(f"❌ Fichier d'entrée non trouvé: {input_file}")
         sys.exit(1)
-    
+
     try:
-        with open(input_file, 'rb') as f:
-            data = f.read()
-        
-        # Convertir en UF2
-        uf2_data = convert_to_uf2(data)
-        
-        with open(output_file, 'wb') as f:
-            f.write(uf2_data)
-        
+        # Convertir en UF2 (lecture mmap et ecriture en flux)
+        if is_elf_file(input_file):
+            data_size, uf2_size = convert_elf_to_uf2(input_file, output_file)
+        else:
+            data_size, uf2_size = convert_file_to_uf2(input_file, output_file)
+
         print(f"✅ Conversion réussie: {input_file} → {output_file}")
-        print(f"📊 {len(data)} bytes → {len(uf2_data)} bytes UF2")
-        
+        print(f"📊 {data_size} bytes → {uf2_size} bytes UF2")
+
     except Exception as e:
         print(f"❌ Erreur lors de la conversion: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()